@@ -0,0 +1,2 @@
+# Benchmarks de desempenho. Rodar da raiz do repositório, ex.:
+#   python -m benchmarks.bench_status
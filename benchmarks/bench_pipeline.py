@@ -0,0 +1,98 @@
+import json
+import os
+import sys
+import time
+
+from benchmarks.gerador_rd import gerar_export
+from core.esquema import para_planilha, tipar
+from core.funil import etapas_da_marca
+from core.ingestao import load_csv, processar
+from core.painel import agregar_painel, comparar_fontes, comparar_funil
+from core.resumo import montar_resumo
+
+# Tempo de cada etapa do pipeline da Home/Comparativo sobre exports sintéticos,
+# comparado com uma base gravada antes. Uso:
+#   python -m benchmarks.bench_pipeline [10000 100000 ...] [--salvar-base] [--limiar 0.25] [--base arquivo.json]
+# Sai com código 1 se alguma etapa ficar mais lenta que base * (1 + limiar).
+TAMANHOS = (10_000, 100_000, 1_000_000)
+LIMIAR = 0.25
+CAMINHO_BASE = os.path.join(".cache", "bench_pipeline.json")
+# (nome, opções do gerador): cobre "sep=", ";" e ",", latin-1 e mojibake
+VARIANTES = {
+    "rd_padrao": {"sep": ";", "com_sep": True, "encoding": "utf-8-sig"},
+    "virgula": {"sep": ",", "com_sep": False, "encoding": "utf-8"},
+    "latin1": {"sep": ";", "com_sep": False, "encoding": "latin-1"},
+    "mojibake": {"sep": ";", "com_sep": True, "encoding": "mojibake"},
+}
+
+
+def medir(func, repeticoes=3):
+    melhor, resultado = float("inf"), None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def _ler(arquivo):
+    arquivo.seek(0)
+    return load_csv(arquivo)
+
+
+def medir_variante(n, opcoes, repeticoes):
+    arquivo = gerar_export(n, **opcoes)
+    tempos = {}
+    tempos["load_csv"], bruto = medir(lambda: _ler(arquivo), repeticoes)
+    tempos["processar"], df = medir(lambda: processar(bruto.copy()), repeticoes)
+    tempos["painel"], _ = medir(lambda: agregar_painel(df, "Microlins"), repeticoes)
+
+    # Comparativo: dois snapshots resumidos (como vêm do db_resumo) e os merges da página
+    metade = len(df) // 2
+    res_a = tipar(para_planilha(montar_resumo(df.iloc[:metade], "20240108_100000", "Microlins", "Semana 2", "08/01/2024 10:00")))
+    res_b = tipar(para_planilha(montar_resumo(df.iloc[metade:], "20240101_100000", "Microlins", "Semana 1", "01/01/2024 10:00")))
+    etapas = etapas_da_marca("Microlins")
+    tempos["comparativo"], _ = medir(lambda: (comparar_funil(res_a, res_b, etapas), comparar_fontes(res_a, res_b)), repeticoes)
+    return tempos
+
+
+def main(tamanhos=TAMANHOS, salvar_base=False, limiar=LIMIAR, caminho_base=CAMINHO_BASE, repeticoes=3):
+    base = {}
+    if os.path.exists(caminho_base) and not salvar_base:
+        with open(caminho_base, encoding="utf-8") as f:
+            base = json.load(f)
+
+    resultados, regressoes = {}, []
+    print(f"{'variante':<12} {'linhas':>10} {'etapa':<12} {'tempo (s)':>10} {'base (s)':>10}")
+    for n in tamanhos:
+        for nome, opcoes in VARIANTES.items():
+            for etapa, tempo in medir_variante(n, opcoes, repeticoes).items():
+                chave = f"{nome}/{n}/{etapa}"
+                resultados[chave] = tempo
+                ref = base.get(chave)
+                alerta = ""
+                if ref is not None and tempo > ref * (1 + limiar):
+                    alerta = f" <-- regressão de {tempo / ref - 1:.0%}"
+                    regressoes.append(chave)
+                ref_txt = f"{ref:10.4f}" if ref is not None else f"{'-':>10}"
+                print(f"{nome:<12} {n:>10,} {etapa:<12} {tempo:10.4f} {ref_txt}{alerta}")
+
+    if salvar_base:
+        pasta = os.path.dirname(caminho_base)
+        if pasta: os.makedirs(pasta, exist_ok=True)
+        with open(caminho_base, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+        print(f"Base gravada em {caminho_base}")
+    if regressoes:
+        print(f"{len(regressoes)} etapa(s) acima do limiar de {limiar:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    opcao = lambda nome, padrao: args[args.index(nome) + 1] if nome in args else padrao
+    valores = {opcao("--limiar", None), opcao("--base", None)}
+    tamanhos = tuple(int(a) for a in args if a.isdigit() and a not in valores) or TAMANHOS
+    sys.exit(main(tamanhos, salvar_base="--salvar-base" in args, limiar=float(opcao("--limiar", LIMIAR)),
+                  caminho_base=opcao("--base", CAMINHO_BASE)))
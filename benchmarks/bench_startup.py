@@ -0,0 +1,54 @@
+import glob
+import json
+import os
+import subprocess
+import sys
+
+# Tempo até a primeira renderização de cada script, medido em processo novo
+# (imports frios) com o AppTest do Streamlit. Uso:
+#   python -m benchmarks.bench_startup [--orcamento-ms 2500]
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORCAMENTO_MS = 2500
+
+_MEDIR = r"""
+import json, sys, time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t_import = time.perf_counter() - inicio
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+antes = set(sys.modules)
+inicio_run = time.perf_counter()
+at.run()
+fim = time.perf_counter()
+# Dependências pesadas que o próprio script importou nesta renderização
+pesados = [m for m in ("plotly", "gspread", "oauth2client") if m in sys.modules and m not in antes]
+print(json.dumps({"streamlit_ms": t_import * 1000, "render_ms": (fim - inicio_run) * 1000,
+                  "total_ms": (fim - inicio) * 1000, "erros": len(at.exception), "importados": pesados}))
+"""
+
+
+def scripts():
+    return ["home.py"] + sorted(os.path.relpath(p, RAIZ) for p in glob.glob(os.path.join(RAIZ, "pages", "*.py")))
+
+
+def medir(script):
+    saida = subprocess.run([sys.executable, "-c", _MEDIR, script], cwd=RAIZ, capture_output=True, text=True, check=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def main(orcamento_ms=ORCAMENTO_MS):
+    estourou = False
+    print(f"{'script':<32} {'render (ms)':>12} {'total (ms)':>11}  importados no render")
+    for script in scripts():
+        r = medir(script)
+        alerta = " <-- acima do orçamento" if r["render_ms"] > orcamento_ms else ""
+        if r["erros"]: alerta += " <-- exceção no script"
+        estourou |= bool(alerta)
+        print(f"{script:<32} {r['render_ms']:12.0f} {r['total_ms']:11.0f}  {', '.join(r['importados']) or '-'}{alerta}")
+    return 1 if estourou else 0
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    orcamento = float(args[args.index("--orcamento-ms") + 1]) if "--orcamento-ms" in args else ORCAMENTO_MS
+    sys.exit(main(orcamento))
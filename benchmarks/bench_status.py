@@ -0,0 +1,54 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.status import classificar_status
+
+ETAPAS = ["Sem contato", "Aguardando Resposta", "Confirmou Interesse", "Qualificado", "Reunião Agendada",
+          "Reunião Realizada", "Follow-up", "negociação", "em aprovação", "faturado"]
+MOTIVOS = ["", "nan", "Sem Resposta", "Sem Capital", "Fora de Perfil", "Lead Duplicado", "N/A"]
+ESTADOS = ["Em andamento", "Perdida", "Vendida"]
+
+
+def status_linha(row):
+    # Regra original (df.apply linha a linha), usada como referência
+    estado = str(row.get("Estado", "")).lower()
+    if estado == "perdida": return "Perdido"
+    etapa = str(row.get("Etapa", "")).lower()
+    if any(x in etapa for x in ["faturado", "ganho", "venda"]): return "Ganho"
+    motivo = str(row.get("Motivo de Perda", "")).strip().lower()
+    if motivo not in ["", "nan", "none", "-", "0", "nada", "n/a"]: return "Perdido"
+    return "Em Andamento"
+
+
+def gerar(n, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Etapa": rng.choice(ETAPAS, n),
+        "Motivo de Perda": rng.choice(MOTIVOS, n),
+        "Estado": rng.choice(ESTADOS, n),
+    })
+
+
+def medir(func, repeticoes=1):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def main(tamanhos=(100_000, 1_000_000)):
+    for n in tamanhos:
+        df = gerar(n)
+        t_apply, ref = medir(lambda: df.apply(status_linha, axis=1))
+        t_vet, novo = medir(lambda: classificar_status(df), repeticoes=3)
+        assert (ref == novo).all(), "classificar_status diverge da regra linha a linha"
+        print(f"{n:>10,} linhas | apply: {t_apply:8.3f}s | vetorizado: {t_vet:8.4f}s | {t_apply / t_vet:7.1f}x")
+
+
+if __name__ == "__main__":
+    main(tuple(int(a) for a in sys.argv[1:]) or (100_000, 1_000_000))
@@ -0,0 +1,106 @@
+import io
+import sys
+
+import numpy as np
+import pandas as pd
+
+from core.funil import ETAPAS_PADRAO
+
+# Gera exports sintéticos do RD Station CRM (10k a 5M linhas) para os benchmarks.
+# Uso:
+#   python -m benchmarks.gerador_rd 1000000 saida.csv [--sep ,] [--sem-sep] [--encoding latin-1|mojibake]
+LINHAS_POR_BLOCO = 250_000
+
+# Etapas do funil com pesos decrescentes (a maioria dos leads para no topo). Os nomes
+# são exatamente os do app (core.funil, com a caixa de lá), senão o funil da Home não
+# casa nenhuma etapa e o benchmark não passa pelo caminho que deveria medir
+ETAPAS = dict(zip(ETAPAS_PADRAO, [0.22, 0.20, 0.15, 0.12, 0.09, 0.07, 0.06, 0.04, 0.03, 0.02]))
+ETAPA_VENDIDA = "faturado"
+MOTIVOS = {"Sem Resposta": 0.38, "Sem Capital": 0.16, "Desistiu do Negócio": 0.10, "Outro Investimento": 0.08,
+           "Fora de Perfil": 0.08, "Não tem interesse em franquia": 0.07, "Lead Duplicado": 0.05,
+           "Dados Inválidos": 0.04, "Região Indisponível": 0.02, "Sócio não aprovou": 0.02}
+FONTES = {"Facebook Ads": 0.35, "Google Ads": 0.25, "Orgânico": 0.15, "Indicação": 0.10, "Site": 0.10, "Evento": 0.05}
+CAMPANHAS = ["Expansão Nordeste", "Franquia Digital", "Feira ABF", "Black Friday Franquias", "Remarketing",
+             "Lançamento PreparaIA", "Microlins 30 Anos", "Ensina Mais Verão"]
+RESPONSAVEIS = ["Ana Conceição", "João Gonçalves", "Márcia Araújo", "Luís Câmara", "Sérgio Brandão", "Fábio Lúcio"]
+EQUIPES = ["Expansão Microlins", "Expansão PreparaIA", "Expansão Ensina Mais"]
+CIDADES = ["São Paulo", "Belém", "Maceió", "Florianópolis", "Goiânia", "Ribeirão Preto", "Brasília", "Niterói"]
+# Cabeçalhos como saem do RD: o processar mapeia Responsável, Equipes do responsável,
+# Data de criação, Motivo de perda, Fonte (não UTM), Etapa, Campanha e Estado
+COLUNAS = ["Nome", "Email", "Telefone", "Responsável", "Equipes do responsável", "Data de criação", "Etapa",
+           "Estado", "Motivo de perda", "Fonte", "UTM Source", "Campanha", "Cidade", "Valor"]
+
+
+def _escolher(rng, opcoes, n):
+    if isinstance(opcoes, dict):
+        pesos = np.array(list(opcoes.values()))
+        return rng.choice(list(opcoes), n, p=pesos / pesos.sum())
+    return rng.choice(opcoes, n)
+
+
+def gerar_bloco(n, rng, inicio=0):
+    """DataFrame com n leads; Estado e Motivo de perda coerentes com a Etapa."""
+    etapa = _escolher(rng, ETAPAS, n)
+    vendida = etapa == ETAPA_VENDIDA
+    perdida = ~vendida & (rng.random(n) < 0.45)
+    estado = np.where(vendida, "Vendida", np.where(perdida, "Perdida", "Em andamento"))
+    motivo = np.where(perdida, _escolher(rng, MOTIVOS, n), "")
+    # Alguns perdidos sem Estado preenchido, só com motivo (o status sai do motivo)
+    estado = np.where(perdida & (rng.random(n) < 0.1), "", estado)
+    datas = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, n), unit="s")
+    ids = np.arange(inicio, inicio + n)
+    return pd.DataFrame({
+        "Nome": pd.Series(ids).map("Lead {}".format),
+        "Email": pd.Series(ids).map("lead{}@exemplo.com.br".format),
+        "Telefone": rng.integers(11_900_000_000, 99_999_999_999, n).astype(str),
+        "Responsável": _escolher(rng, RESPONSAVEIS, n),
+        "Equipes do responsável": _escolher(rng, EQUIPES, n),
+        "Data de criação": datas.strftime("%d/%m/%Y %H:%M:%S"),
+        "Etapa": etapa,
+        "Estado": estado,
+        "Motivo de perda": motivo,
+        "Fonte": _escolher(rng, FONTES, n),
+        "UTM Source": _escolher(rng, ["facebook", "google", "instagram", ""], n),
+        "Campanha": _escolher(rng, CAMPANHAS, n),
+        "Cidade": _escolher(rng, CIDADES, n),
+        "Valor": rng.integers(0, 200_000, n).astype(str),
+    }, columns=COLUNAS)
+
+
+def _codificar(texto, encoding):
+    if encoding == "mojibake":
+        # Texto UTF-8 lido como latin-1 e regravado em UTF-8 ("ExpansÃ£o")
+        return texto.encode("utf-8").decode("latin-1").encode("utf-8")
+    return texto.encode(encoding)
+
+
+def escrever_export(destino, n, sep=";", com_sep=True, encoding="utf-8-sig", seed=42, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Escreve o export em `destino` (arquivo binário) em blocos, com memória limitada.
+
+    encoding: "utf-8-sig" (padrão do RD), "utf-8", "latin-1" ou "mojibake".
+    com_sep: inclui a primeira linha "sep=;" que o Excel/RD às vezes gravam.
+    """
+    rng = np.random.default_rng(seed)
+    if encoding == "utf-8-sig": destino.write(b"\xef\xbb\xbf")
+    codificacao = "utf-8" if encoding == "utf-8-sig" else encoding
+    if com_sep: destino.write(_codificar(f"sep={sep}\n", codificacao))
+    for inicio in range(0, n, linhas_por_bloco):
+        bloco = gerar_bloco(min(linhas_por_bloco, n - inicio), rng, inicio)
+        texto = bloco.to_csv(sep=sep, index=False, header=inicio == 0, lineterminator="\n")
+        destino.write(_codificar(texto, codificacao))
+
+
+def gerar_export(n, **kwargs):
+    """Export em memória (BytesIO posicionado no início), como o file_uploader entrega."""
+    buffer = io.BytesIO()
+    escrever_export(buffer, n, **kwargs)
+    buffer.seek(0)
+    return buffer
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    opcao = lambda nome, padrao: args[args.index(nome) + 1] if nome in args else padrao
+    with open(args[1], "wb") as f:
+        escrever_export(f, int(args[0]), sep=opcao("--sep", ";"), com_sep="--sem-sep" not in args,
+                        encoding=opcao("--encoding", "utf-8-sig"))
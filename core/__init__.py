@@ -0,0 +1 @@
+# Módulos compartilhados entre home.py e as páginas em pages/.
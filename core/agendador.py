@@ -0,0 +1,179 @@
+import os
+import random
+import threading
+import time
+
+from core.medicao import registrar_limitacao
+
+# =========================
+# AGENDADOR DE REQUISIÇÕES AO GOOGLE SHEETS
+# =========================
+# Toda chamada do gspread passa por executar() (via sheets.com_retry):
+#  - um balde de fichas por tipo (leitura/escrita) do tamanho da cota por minuto,
+#    compartilhado por todas as sessões do processo: acima da cota a chamada
+#    espera a vez em vez de levar 429;
+#  - leituras idênticas em voo viram uma só (as outras sessões esperam o resultado);
+#  - 429/5xx/rede: backoff exponencial com jitter; 429 esvazia o balde para as
+#    outras threads também segurarem. Escritas que não são idempotentes (append)
+#    só repetem em 429; em 5xx/timeout o erro sobe para quem chamou conferir.
+# Cada espera é registrada na medição do rerun, e as páginas avisam em vez de
+# mostrar "vazio" quando a cota acaba.
+COTA_LEITURA = int(os.environ.get("BI_CRM_COTA_LEITURA", "60"))  # requisições/minuto
+COTA_ESCRITA = int(os.environ.get("BI_CRM_COTA_ESCRITA", "60"))
+STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+# Métodos do gspread que só leem (podem ser coalescidos e gastam a cota de leitura)
+LEITURAS = frozenset({"get", "get_all_values", "get_all_records", "get_values", "batch_get", "row_values",
+                      "col_values", "open", "open_by_key", "worksheet", "worksheets", "fetch_sheet_metadata"})
+# Escritas num intervalo fixo: repetir regrava o mesmo conteúdo, sem efeito dobrado.
+# As outras (append_rows, append_row, insert_row, add_worksheet...) só são repetidas
+# em 429: em 5xx/timeout o servidor pode ter aplicado e a repetição duplicaria.
+ESCRITAS_IDEMPOTENTES = frozenset({"update", "batch_update", "values_batch_update"})
+CONTADORES = {"chamadas": 0, "esperas_cota": 0, "segundos_cota": 0.0, "erros_429": 0,
+              "repeticoes": 0, "coalescidas": 0, "cota_esgotada": 0}
+
+
+class CotaEsgotada(RuntimeError):
+    """A cota do Sheets continuou estourada (429) depois de todas as tentativas."""
+
+
+def status_http(e):
+    return getattr(getattr(e, "response", None), "status_code", None)
+
+
+def erro_transitorio(e):
+    """True para cota estourada (429), 5xx e falhas de rede: vale tentar de novo."""
+    status = status_http(e)
+    if status is not None:
+        return status in STATUS_TRANSITORIOS
+    try:
+        import requests
+        return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+    except ImportError:
+        return False
+
+
+class BaldeDeFichas:
+    """Token bucket: `por_minuto` fichas/minuto, rajada de até `capacidade`.
+
+    Quem chega sem ficha reserva a próxima (o saldo fica negativo) e dorme até
+    ela existir, então a fila é atendida na ordem de chegada.
+    """
+
+    def __init__(self, por_minuto, capacidade=None):
+        self.taxa = por_minuto / 60.0
+        self.capacidade = capacidade or por_minuto
+        self.fichas = float(self.capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self.fichas = min(self.capacidade, self.fichas + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def retirar(self):
+        """Consome uma ficha; devolve quantos segundos precisou esperar por ela."""
+        with self._lock:
+            self._repor()
+            self.fichas -= 1
+            espera = -self.fichas / self.taxa if self.fichas < 0 else 0.0
+        if espera: time.sleep(espera)
+        return espera
+
+    def esvaziar(self):
+        # O servidor disse que passamos da cota (outro processo/usuário também gasta)
+        with self._lock:
+            self._repor()
+            self.fichas = min(self.fichas, 0.0)
+
+
+_baldes = {"leitura": BaldeDeFichas(COTA_LEITURA), "escrita": BaldeDeFichas(COTA_ESCRITA)}
+_lock = threading.Lock()
+_em_voo = {}
+
+
+class _Voo:
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+def _nome(func):
+    return getattr(func, "__name__", "")
+
+
+def _chave_leitura(func, args, kwargs):
+    # Mesmo método no mesmo objeto (handles de aba são compartilhados pelo pool) e mesmos argumentos
+    if _nome(func) not in LEITURAS: return None
+    dono = getattr(func, "__self__", None)
+    return (id(dono), _nome(func), repr(args), repr(sorted(kwargs.items())))
+
+
+def _coalescer(chave, chamar):
+    with _lock:
+        voo = _em_voo.get(chave)
+        lider = voo is None
+        if lider: voo = _em_voo[chave] = _Voo()
+    if not lider:
+        # Alguém já está buscando exatamente isso: espera e usa o mesmo resultado
+        CONTADORES["coalescidas"] += 1
+        inicio = time.monotonic()
+        voo.pronto.wait()
+        registrar_limitacao("coalescida", time.monotonic() - inicio)
+        if voo.erro is not None: raise voo.erro
+        return voo.resultado
+    try:
+        voo.resultado = chamar()
+        return voo.resultado
+    except BaseException as e:
+        voo.erro = e
+        raise
+    finally:
+        with _lock:
+            _em_voo.pop(chave, None)
+        voo.pronto.set()
+
+
+def repetivel(func, e):
+    """Vale repetir func depois do erro transitório e? Leituras e escritas idempotentes
+    sempre; as demais escritas só se a API recusou por cota (429: nada foi gravado)."""
+    if _nome(func) in LEITURAS or _nome(func) in ESCRITAS_IDEMPOTENTES: return True
+    return status_http(e) == 429
+
+
+def _chamar(func, args, kwargs, balde, tentativas, espera_base, espera_max):
+    for tentativa in range(tentativas):
+        espera = balde.retirar()
+        if espera:
+            CONTADORES["esperas_cota"] += 1
+            CONTADORES["segundos_cota"] += espera
+            registrar_limitacao("cota", espera)
+        CONTADORES["chamadas"] += 1
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if not erro_transitorio(e):
+                raise
+            if status_http(e) == 429:
+                CONTADORES["erros_429"] += 1
+                balde.esvaziar()
+            if tentativa == tentativas - 1 or not repetivel(func, e):
+                if status_http(e) == 429:
+                    CONTADORES["cota_esgotada"] += 1
+                    raise CotaEsgotada(f"Cota do Google Sheets esgotada em {_nome(func) or 'chamada'}") from e
+                raise
+            CONTADORES["repeticoes"] += 1
+            pausa = min(espera_max, espera_base * 2 ** tentativa) * (0.5 + random.random())
+            registrar_limitacao("backoff", pausa)
+            time.sleep(pausa)
+
+
+def executar(func, *args, tentativas=5, espera_base=1.0, espera_max=32.0, **kwargs):
+    """Chama func(*args, **kwargs) respeitando a cota, coalescendo leituras iguais e
+    repetindo erros transitórios. Leituras coalescidas devolvem o mesmo objeto a
+    todos os que esperavam: não alterar o resultado no lugar."""
+    chave = _chave_leitura(func, args, kwargs)
+    balde = _baldes["leitura" if chave is not None else "escrita"]
+    chamar = lambda: _chamar(func, args, kwargs, balde, tentativas, espera_base, espera_max)
+    return chamar() if chave is None else _coalescer(chave, chamar)
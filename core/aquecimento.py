@@ -0,0 +1,146 @@
+import json
+import os
+import sys
+import threading
+import time
+
+from core.medicao import etapa, iniciar
+
+# =========================
+# AQUECIMENTO NA SUBIDA DO SERVIDOR
+# =========================
+# Depois de um deploy/restart, quem chegava primeiro esperava a autenticação, a
+# abertura da planilha e os downloads inteiros de db_snapshots e das abas de
+# previsão. Com BI_CRM_AQUECER=1, o primeiro script que roda no processo dispara
+# (uma vez) uma thread que autentica, sincroniza o cache local (db_catalogo,
+# db_resumo, db_snapshots) e já deixa no cache compartilhado as abas de previsão
+# e os resumos que o Histórico e o Tendências abrem por padrão. As páginas leem
+# pelas mesmas chaves (core.carregadores), então pegam o que estiver pronto ou
+# esperam a mesma carga em vez de repeti-la.
+#
+# O Streamlit não tem gancho de "servidor subiu", então no deploy também dá para
+# rodar antes do `streamlit run`:
+#   python -m core.aquecimento            # aquece o cache em disco e valida as credenciais
+#   python -m core.aquecimento --status   # health check: sai 0 só com o aquecimento pronto
+# O progresso fica em estado() e no arquivo CAMINHO_ESTADO (JSON), lido pelo --status.
+AQUECER = os.environ.get("BI_CRM_AQUECER", "") not in ("", "0")
+CAMINHO_ESTADO = os.environ.get("BI_CRM_AQUECIMENTO_PATH", os.path.join(".cache", "aquecimento.json"))
+
+_lock = threading.Lock()
+_thread = None
+_estado = {"estado": "parado", "inicio": None, "fim": None, "etapas": {}}
+
+
+def estado():
+    """Cópia do progresso: estado parado|aquecendo|pronto|falhou e, por etapa, estado/ms/erro."""
+    with _lock:
+        return json.loads(json.dumps(_estado))
+
+
+def _gravar():
+    # Chamado com _lock; troca atômica para o --status nunca ler um arquivo pela metade
+    pasta = os.path.dirname(CAMINHO_ESTADO)
+    if pasta: os.makedirs(pasta, exist_ok=True)
+    temporario = f"{CAMINHO_ESTADO}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump({**_estado, "pid": os.getpid()}, f, ensure_ascii=False, default=str)
+    os.replace(temporario, CAMINHO_ESTADO)
+
+
+def _atualizar(**campos):
+    with _lock:
+        _estado.update(campos)
+        _gravar()
+
+
+def _marcar(nome, **campos):
+    with _lock:
+        _estado["etapas"].setdefault(nome, {}).update(campos)
+        _gravar()
+
+
+def _agregados_historico():
+    # Catálogo (seletores) e o resumo da primeira semana de cada marca, que é o
+    # que o Histórico mostra assim que a marca é escolhida
+    from core import carregadores
+    selecao = carregadores.selecao_padrao(carregadores.catalogo())
+    for ids in selecao.values():
+        carregadores.resumo({"snapshot_id": ids})
+    return len(selecao)
+
+
+def _etapas():
+    from core import carregadores
+    from core.armazenamento import obter_armazenamento
+    etapas = []
+    if obter_armazenamento().nome == "sheets":
+        from core.cache_snapshots import ABA_RESUMO, ABA_SNAPSHOTS, sincronizar
+        from core.catalogo import ABA_CATALOGO
+        from core.sheets import abrir_planilha
+        etapas.append(("autenticacao", abrir_planilha))
+        for aba in (ABA_CATALOGO, ABA_RESUMO, ABA_SNAPSHOTS):
+            etapas.append((aba, lambda aba=aba: sincronizar(aba)))
+    for nome_aba in carregadores.ABAS_PREVISAO:
+        etapas.append((nome_aba, lambda nome_aba=nome_aba: carregadores.aba_previsao(nome_aba)))
+    etapas.append(("historico", _agregados_historico))
+    etapas.append(("resumo", carregadores.resumo))  # Tendências lê o resumo inteiro
+    return etapas
+
+
+def aquecer():
+    """Roda todas as etapas em sequência (uma que falha não impede as outras).
+    Devolve True se todas deram certo."""
+    iniciar("aquecimento")
+    with _lock:
+        _estado.update(estado="aquecendo", inicio=time.time(), fim=None, etapas={})
+        _gravar()
+    try:
+        etapas = _etapas()
+    except Exception as e:
+        _atualizar(estado="falhou", fim=time.time(), erro=repr(e))
+        return False
+    for nome, _ in etapas:
+        _marcar(nome, estado="pendente")
+    ok = True
+    for nome, executar in etapas:
+        _marcar(nome, estado="aquecendo")
+        inicio = time.perf_counter()
+        try:
+            with etapa(f"aquecer {nome}"):
+                executar()
+            _marcar(nome, estado="pronto", ms=round((time.perf_counter() - inicio) * 1000, 1))
+        except Exception as e:
+            # As páginas tentam de novo sob demanda (e avisam se falhar)
+            ok = False
+            _marcar(nome, estado="falhou", ms=round((time.perf_counter() - inicio) * 1000, 1), erro=repr(e))
+    _atualizar(estado="pronto" if ok else "falhou", fim=time.time())
+    return ok
+
+
+def iniciar_aquecimento():
+    """Dispara o aquecimento em segundo plano, uma vez por processo (só com BI_CRM_AQUECER=1)."""
+    global _thread
+    if not AQUECER: return
+    with _lock:
+        if _thread is not None: return
+        _thread = threading.Thread(target=aquecer, name="bi_crm-aquecimento", daemon=True)
+    _thread.start()
+
+
+def ler_estado():
+    """Progresso gravado em CAMINHO_ESTADO (pode ser de outro processo); None se não existe."""
+    try:
+        with open(CAMINHO_ESTADO, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    if "--status" in sys.argv[1:]:
+        atual = ler_estado() or {"estado": "parado"}
+        print(json.dumps(atual, ensure_ascii=False, indent=2))
+        sys.exit(0 if atual.get("estado") == "pronto" else 1)
+    ok = aquecer()
+    print(json.dumps(estado(), ensure_ascii=False, indent=2))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,325 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+from core.cache_snapshots import (ABA_RESUMO, ABA_SNAPSHOTS, cache_valido, carregar_aba_cacheada, colunas_tabela,
+                                  completar_linhas, filtro_sql, indexar_tabela, invalidar_aba, normalizar_filtros)
+from core.catalogo import ABA_CATALOGO, COLUNAS_CATALOGO, REFERENCIAS, faixas, montar_catalogo
+from core.compartilhado import invalidar
+from core.esquema import tipar
+from core.medicao import etapa
+from core.previsao import linhas_para_planilha, planejar_escrita
+from core.sheets import PLANILHA_NOME, abrir_aba, com_retry, gravar_em_lote
+
+# =========================
+# ARMAZENAMENTO PLUGÁVEL (Google Sheets ou SQLite local)
+# =========================
+# Páginas leem e gravam por aqui, sem saber onde os dados moram. BI_CRM_BACKEND
+# escolhe o motor: "sheets" (padrão) ou "sqlite" (arquivo em BI_CRM_DB_PATH).
+# Filtros {coluna: valores} viram WHERE no SQLite (no Sheets, no cache local).
+# Toda gravação invalida as abas tocadas no cache compartilhado entre sessões.
+BACKEND = os.environ.get("BI_CRM_BACKEND", "sheets").strip().lower()
+CAMINHO_BANCO = os.environ.get("BI_CRM_DB_PATH", os.path.join(".cache", "bi_crm_dados.sqlite"))
+LINHAS_POR_ENVIO = 5000
+
+
+def _para_planilha(cabecalho, linhas):
+    # Mesmo texto gravado nos dois backends (Valor "1500,00", resto str), como o gravar_abas
+    return linhas_para_planilha(pd.DataFrame(linhas, columns=list(cabecalho)))
+
+
+def _filtrar(df, filtros):
+    # Para leituras que não passam por SQL (abas baixadas inteiras da planilha)
+    for coluna, valores in normalizar_filtros(filtros).items():
+        if coluna not in df.columns: return df.iloc[:0]
+        df = df[df[coluna].astype(str).isin(valores)]
+    return df
+
+
+class ArmazenamentoPlanilha:
+    """Google Sheets: leituras de db_snapshots/db_resumo pelo cache SQLite com TTL,
+    abas de previsão por diff de linhas num único values_batch_update."""
+
+    nome = "sheets"
+
+    def ler(self, aba, filtros=None, ttl=None):
+        if aba == ABA_SNAPSHOTS and (filtros or {}).get("snapshot_id") is not None and not cache_valido(aba, ttl):
+            # Cache vencido: em vez de sincronizar a aba, busca só as faixas dos snapshots pedidos
+            return _filtrar(self._ler_faixas(filtros["snapshot_id"]), filtros)
+        if aba in (ABA_SNAPSHOTS, ABA_RESUMO, ABA_CATALOGO):
+            return carregar_aba_cacheada(aba, ttl, filtros)
+        dados = com_retry(abrir_aba(aba, PLANILHA_NOME).get_all_values)
+        if not dados: return pd.DataFrame()
+        return _filtrar(pd.DataFrame(dados[1:], columns=[h.strip() for h in dados[0]]), filtros)
+
+    def _ler_faixas(self, ids):
+        ids = normalizar_filtros({"snapshot_id": ids})["snapshot_id"]
+        catalogo = self.ler(ABA_CATALOGO, {"snapshot_id": ids})
+        por_id = faixas(catalogo)
+        esperado = dict(zip(catalogo["snapshot_id"].astype(str), catalogo["linhas"].astype(str))) if not catalogo.empty else {}
+        alvo = [i for i in ids if i in por_id]
+        partes, encontrados = [], []
+        if alvo:
+            # Cabeçalho + uma faixa por snapshot, num único batch_get
+            ws = abrir_aba(ABA_SNAPSHOTS, PLANILHA_NOME)
+            with etapa("batch_get faixas") as registro:
+                blocos = com_retry(ws.batch_get, ["1:1"] + [f"{por_id[i][0]}:{por_id[i][1]}" for i in alvo])
+                registro["linhas"] = sum(len(b) for b in blocos[1:])
+            header = [h.strip() for h in (blocos[0][0] if blocos and blocos[0] else [])]
+            if "snapshot_id" in header:
+                for sid, bloco in zip(alvo, blocos[1:]):
+                    df = pd.DataFrame(completar_linhas(bloco, len(header)), columns=header)
+                    df = df[df["snapshot_id"] == sid]
+                    # Faixa desatualizada (linhas apagadas/movidas na planilha): cai no cache
+                    if str(len(df)) == esperado.get(sid):
+                        partes.append(df)
+                        encontrados.append(sid)
+        faltando = [i for i in ids if i not in encontrados]
+        if faltando:
+            # Snapshots fora do catálogo: lidos pelo cache (sincroniza se preciso)
+            partes.append(carregar_aba_cacheada(ABA_SNAPSHOTS, None, {"snapshot_id": faltando}))
+        partes = [p for p in partes if len(p.columns)]
+        return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+    def ler_grade(self, aba, cabecalho):
+        ws = abrir_aba(aba, PLANILHA_NOME, criar=(1000, 20), cabecalho=cabecalho)
+        with etapa(f"get_all_values {aba}") as registro:
+            dados = com_retry(ws.get_all_values)
+            registro["linhas"] = len(dados)
+        return dados
+
+    def gravar_abas(self, abas, anteriores=None):
+        """Grava {aba: frame} a partir de anteriores ({aba: (frame carregado, cabeçalho ok?)}).
+        Retorna o novo estado de cada aba no mesmo formato, indexado pela linha em que
+        cada linha do frame ficou na planilha (base para a próxima escrita)."""
+        operacoes, estados = {}, {}
+        for nome_aba, df in abas.items():
+            estado = (anteriores or {}).get(nome_aba)
+            if estado is None:
+                # Sem referência do que está na aba: regrava tudo e limpa até o fim da grade
+                ws = abrir_aba(nome_aba, PLANILHA_NOME, criar=(1000, 20))
+                fim = max(ws.row_count, len(df) + 1)
+                estado = (pd.DataFrame(columns=df.columns, index=range(2, fim + 1)), False)
+            anterior, cabecalho_ok = estado
+            operacoes[nome_aba], linhas = planejar_escrita(anterior, df, cabecalho_ok)
+            estados[nome_aba] = (df.set_axis(linhas).sort_index(), True)
+        gravar_em_lote(operacoes, PLANILHA_NOME)
+        invalidar(*abas)
+        return estados
+
+    def acrescentar(self, aba, cabecalho, linhas):
+        ws = abrir_aba(aba, PLANILHA_NOME, criar=(1000, 20))
+        header = com_retry(ws.row_values, 1)
+        if not header: com_retry(ws.append_row, cabecalho)
+        elif header[0] != cabecalho[0]: com_retry(ws.insert_row, cabecalho, 1)
+        elif [c for c in cabecalho if c not in header]:
+            com_retry(ws.update, values=[header + [c for c in cabecalho if c not in header]], range_name="A1")
+        com_retry(ws.append_rows, _para_planilha(cabecalho, linhas), value_input_option="RAW")
+        invalidar(aba)
+
+    def salvar_snapshot(self, df_save, snapshot_id, progresso=None):
+        return self.salvar_snapshots({snapshot_id: df_save}, progresso)
+
+    def salvar_snapshots(self, lotes, progresso=None):
+        from core.snapshots import salvar_snapshots
+        ws = abrir_aba(ABA_SNAPSHOTS, PLANILHA_NOME, criar=(1000, 20))
+        enviadas = salvar_snapshots(ws, lotes, progresso=progresso)
+        # Save retomado (parte já estava na planilha): o cache local pode ter guardado
+        # o snapshot pela metade, então rebaixa a aba em vez de só vencer o TTL
+        retomado = enviadas < sum(len(df) for df in lotes.values())
+        invalidar_aba(ABA_SNAPSHOTS, completo=retomado)
+        invalidar(ABA_SNAPSHOTS)
+        self.catalogar()
+        return enviadas
+
+    def catalogar(self):
+        """Acrescenta ao db_catalogo os snapshots que faltam, lendo só as colunas de referência."""
+        from gspread.utils import rowcol_to_a1
+        ws = abrir_aba(ABA_SNAPSHOTS, PLANILHA_NOME, criar=(1000, 20))
+        header = [h.strip() for h in com_retry(ws.row_values, 1)]
+        if "snapshot_id" not in header: return 0
+        colunas = [c for c in REFERENCIAS if c in header]
+        letras = [rowcol_to_a1(1, header.index(c) + 1).rstrip("0123456789") for c in colunas]
+        valores = com_retry(ws.batch_get, [f"{l}2:{l}" for l in letras])
+        n = max(map(len, valores), default=0)
+        chaves = pd.DataFrame({c: [v[0] if v else "" for v in col] + [""] * (n - len(col)) for c, col in zip(colunas, valores)})
+        # Snapshot já catalogado pela metade (save retomado) tem a faixa e a contagem corrigidas
+        return self.acrescentar_novos(ABA_CATALOGO, montar_catalogo(chaves), COLUNAS_CATALOGO, atualizar=True)
+
+    def acrescentar_novos(self, aba, df, cabecalho, atualizar=False):
+        """Acrescenta as linhas cuja chave (1ª coluna) ainda não está na aba; com
+        atualizar=True, reescreve no lugar as já existentes que mudaram."""
+        from gspread.utils import rowcol_to_a1
+        ws = abrir_aba(aba, PLANILHA_NOME, criar=(1000, len(cabecalho)), cabecalho=cabecalho)
+        regravar = []
+        if atualizar:
+            dados = com_retry(ws.get_all_values)
+            header = [h.strip() for h in dados[0]] if dados and dados[0] else list(cabecalho)
+            atuais = {l[0]: (n, l) for n, l in enumerate(completar_linhas(dados[1:], len(header)), start=2) if l[0]}
+            existentes = set(atuais)
+            for linha in df.reindex(columns=header, fill_value="").astype(str).values.tolist():
+                n, atual = atuais.get(linha[0], (None, None))
+                if n is not None and linha != atual:
+                    regravar.append({"range": f"A{n}:{rowcol_to_a1(n, len(header))}", "values": [linha]})
+        else:
+            existentes = set(com_retry(ws.col_values, 1)[1:])
+        novos = df[~df[cabecalho[0]].isin(existentes)]
+        if novos.empty and not regravar: return 0
+        if regravar: com_retry(ws.batch_update, regravar, value_input_option="RAW")
+        if not novos.empty: com_retry(ws.append_rows, novos[cabecalho].values.tolist(), value_input_option="RAW")
+        invalidar_aba(aba, completo=bool(regravar))
+        invalidar(aba)
+        return len(novos)
+
+
+class ArmazenamentoLocal:
+    """Arquivo SQLite com as mesmas abas como tabelas de texto (mesmo formato da
+    planilha, então a tipagem e o parsing das páginas não mudam)."""
+
+    nome = "sqlite"
+
+    def __init__(self, caminho=CAMINHO_BANCO):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _transacao(self):
+        # Commit ao sair sem erro, rollback se algo falhar no meio
+        pasta = os.path.dirname(self.caminho)
+        if pasta: os.makedirs(pasta, exist_ok=True)
+        with self._lock:
+            con = sqlite3.connect(self.caminho, timeout=30)
+            try:
+                with con:
+                    yield con
+            finally:
+                con.close()
+
+    def _garantir_colunas(self, con, aba, colunas):
+        existentes = colunas_tabela(con, aba)
+        if not existentes:
+            definicao = ", ".join(f'"{c}" TEXT' for c in colunas)
+            con.execute(f'CREATE TABLE "{aba}" ({definicao})')
+            indexar_tabela(con, aba)
+            return
+        for coluna in [c for c in colunas if c not in existentes]:
+            con.execute(f'ALTER TABLE "{aba}" ADD COLUMN "{coluna}" TEXT')
+        indexar_tabela(con, aba)
+
+    def _inserir(self, con, aba, colunas, linhas):
+        if not linhas: return
+        self._garantir_colunas(con, aba, colunas)
+        nomes = ", ".join(f'"{c}"' for c in colunas)
+        con.executemany(f'INSERT INTO "{aba}" ({nomes}) VALUES ({", ".join("?" * len(colunas))})',
+                        [[str(v) for v in l] for l in linhas])
+
+    def ler(self, aba, filtros=None, ttl=None):
+        with self._transacao() as con:
+            colunas = colunas_tabela(con, aba)
+            if not colunas: return pd.DataFrame()
+            where, params = filtro_sql(filtros, colunas)
+            return pd.read_sql_query(f'SELECT * FROM "{aba}"{where} ORDER BY rowid', con, params=params).fillna("")
+
+    def ler_grade(self, aba, cabecalho):
+        df = self.ler(aba)
+        if not len(df.columns): return [list(cabecalho)]
+        return [df.columns.tolist()] + df.values.tolist()
+
+    def gravar_abas(self, abas, anteriores=None):
+        # Uma transação: ou todas as abas mudam, ou nenhuma
+        with self._transacao() as con:
+            for nome_aba, df in abas.items():
+                con.execute(f'DROP TABLE IF EXISTS "{nome_aba}"')
+                self._garantir_colunas(con, nome_aba, list(df.columns))
+                self._inserir(con, nome_aba, list(df.columns), linhas_para_planilha(df))
+        invalidar(*abas)
+        # Tabela regravada na ordem do frame
+        return {nome_aba: (df.set_axis(range(2, 2 + len(df))), True) for nome_aba, df in abas.items()}
+
+    def acrescentar(self, aba, cabecalho, linhas):
+        with self._transacao() as con:
+            self._inserir(con, aba, list(cabecalho), _para_planilha(cabecalho, linhas))
+        invalidar(aba)
+
+    def salvar_snapshot(self, df_save, snapshot_id, progresso=None):
+        return self.salvar_snapshots({snapshot_id: df_save}, progresso)
+
+    def salvar_snapshots(self, lotes, progresso=None):
+        # Idempotente como o da planilha: pula as linhas já gravadas com cada snapshot_id.
+        # Uma transação para o lote todo: ou todos os snapshots entram, ou nenhum
+        total = sum(len(df) for df in lotes.values())
+        feito = enviadas = 0
+        with self._transacao() as con:
+            for snapshot_id, df_save in lotes.items():
+                colunas = df_save.columns.tolist()
+                linhas = df_save.astype(str).values.tolist()
+                self._garantir_colunas(con, ABA_SNAPSHOTS, colunas)
+                inicio = con.execute(f'SELECT COUNT(*) FROM "{ABA_SNAPSHOTS}" WHERE "snapshot_id" = ?',
+                                     (str(snapshot_id),)).fetchone()[0]
+                for i in range(inicio, len(linhas), LINHAS_POR_ENVIO):
+                    self._inserir(con, ABA_SNAPSHOTS, colunas, linhas[i:i + LINHAS_POR_ENVIO])
+                    if progresso: progresso(feito + min(i + LINHAS_POR_ENVIO, len(linhas)), total)
+                feito += len(linhas)
+                enviadas += max(len(linhas) - inicio, 0)
+        invalidar(ABA_SNAPSHOTS)
+        self.catalogar()
+        return enviadas
+
+    def catalogar(self):
+        with self._transacao() as con:
+            colunas = colunas_tabela(con, ABA_SNAPSHOTS)
+            if "snapshot_id" not in colunas: return 0
+            refs = ", ".join(f'MIN("{c}")' if c in colunas else "''" for c in REFERENCIAS[1:])
+            catalogo = pd.read_sql_query(
+                f'SELECT "snapshot_id", {refs}, COUNT(*), MIN(rowid), MAX(rowid) FROM "{ABA_SNAPSHOTS}" '
+                f'WHERE "snapshot_id" <> \'\' GROUP BY "snapshot_id" ORDER BY MIN(rowid)', con)
+        catalogo.columns = COLUNAS_CATALOGO
+        return self.acrescentar_novos(ABA_CATALOGO, catalogo.astype(str), COLUNAS_CATALOGO, atualizar=True)
+
+    def acrescentar_novos(self, aba, df, cabecalho, atualizar=False):
+        with self._transacao() as con:
+            self._garantir_colunas(con, aba, list(cabecalho))
+            existentes = {r[0] for r in con.execute(f'SELECT DISTINCT "{cabecalho[0]}" FROM "{aba}"')}
+            novos = df[~df[cabecalho[0]].isin(existentes)]
+            antes = con.total_changes
+            if atualizar:
+                # Só as linhas existentes que mudaram contam (o IS NOT evita reescrever iguais)
+                chave, resto = cabecalho[0], list(cabecalho[1:])
+                mudou = " OR ".join(f'"{c}" IS NOT ?' for c in resto)
+                sets = ", ".join(f'"{c}" = ?' for c in resto)
+                linhas = df[df[chave].isin(existentes)][[chave] + resto].astype(str).values.tolist()
+                con.executemany(f'UPDATE "{aba}" SET {sets} WHERE "{chave}" = ? AND ({mudou})',
+                                [l[1:] + l[:1] + l[1:] for l in linhas])
+            self._inserir(con, aba, list(cabecalho), novos[cabecalho].values.tolist())
+            mudancas = con.total_changes - antes
+        if mudancas: invalidar(aba)
+        return len(novos)
+
+
+_BACKENDS = {"sheets": ArmazenamentoPlanilha, "sqlite": ArmazenamentoLocal}
+_instancia = {}
+
+
+def obter_armazenamento(nome=None):
+    """Backend configurado (um por processo)."""
+    nome = nome or BACKEND
+    if nome not in _BACKENDS:
+        raise ValueError(f"BI_CRM_BACKEND desconhecido: {nome!r} (use {', '.join(_BACKENDS)})")
+    if nome not in _instancia:
+        _instancia[nome] = _BACKENDS[nome]()
+    return _instancia[nome]
+
+
+def carregar_historico(filtros=None):
+    """db_snapshots tipado, com os filtros ({coluna: valores}) aplicados na origem."""
+    return tipar(obter_armazenamento().ler(ABA_SNAPSHOTS, filtros))
+
+
+def carregar_catalogo():
+    """db_catalogo tipado: uma linha por snapshot salvo."""
+    df = obter_armazenamento().ler(ABA_CATALOGO)
+    if df.empty: return pd.DataFrame(columns=COLUNAS_CATALOGO)
+    return tipar(df)
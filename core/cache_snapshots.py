@@ -0,0 +1,203 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from core.esquema import tipar
+from core.medicao import etapa
+from core.sheets import abrir_aba, com_retry
+
+# =========================
+# CACHE LOCAL DAS ABAS DE SNAPSHOT (SQLite)
+# =========================
+# Evita baixar a aba inteira a cada rerun: dentro do TTL a leitura é 100% local;
+# vencido o TTL, busca só as linhas novas da planilha (o save da Home só faz append).
+# Serve ao db_snapshots e ao db_resumo, ambos chaveados por snapshot_id.
+CAMINHO_CACHE = os.environ.get("BI_CRM_CACHE_PATH", os.path.join(".cache", "bi_crm.sqlite"))
+TTL_SEGUNDOS = int(os.environ.get("BI_CRM_CACHE_TTL", "300"))
+
+ABA_SNAPSHOTS = "db_snapshots"
+ABA_RESUMO = "db_resumo"
+
+_lock = threading.Lock()
+
+
+def _abrir():
+    pasta = os.path.dirname(CAMINHO_CACHE)
+    if pasta: os.makedirs(pasta, exist_ok=True)
+    con = sqlite3.connect(CAMINHO_CACHE, timeout=30)
+    con.execute("CREATE TABLE IF NOT EXISTS cache_meta (tabela TEXT PRIMARY KEY, meta TEXT)")
+    return con
+
+
+def _ler_meta(con, tabela):
+    row = con.execute("SELECT meta FROM cache_meta WHERE tabela = ?", (tabela,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _gravar_meta(con, tabela, meta):
+    con.execute("INSERT OR REPLACE INTO cache_meta (tabela, meta) VALUES (?, ?)", (tabela, json.dumps(meta)))
+
+
+COLUNAS_FILTRO = ["snapshot_id", "marca_ref", "semana_ref", "Marca"]
+
+
+def normalizar_filtros(filtros):
+    """{coluna: valor ou lista} -> {coluna: [texto, ...]}, no formato gravado na planilha."""
+    normalizados = {}
+    for coluna, valores in (filtros or {}).items():
+        if valores is None: continue
+        serie = pd.Series(list(valores) if pd.api.types.is_list_like(valores) else [valores])
+        normalizados[coluna] = serie.astype(str).drop_duplicates().tolist()
+    return normalizados
+
+
+def filtro_sql(filtros, colunas):
+    """Cláusula WHERE (e parâmetros) para os filtros; colunas ausentes na tabela não casam nada."""
+    partes, params = [], []
+    for coluna, valores in normalizar_filtros(filtros).items():
+        if coluna not in colunas or not valores:
+            return " WHERE 0", []
+        partes.append(f'"{coluna}" IN ({", ".join("?" * len(valores))})')
+        params += valores
+    return (" WHERE " + " AND ".join(partes) if partes else ""), params
+
+
+def colunas_tabela(con, tabela):
+    return [r[1] for r in con.execute(f'PRAGMA table_info("{tabela}")')]
+
+
+def indexar_tabela(con, tabela):
+    # Índices nas colunas de filtro: o WHERE lê só as linhas pedidas
+    for coluna in set(COLUNAS_FILTRO) & set(colunas_tabela(con, tabela)):
+        con.execute(f'CREATE INDEX IF NOT EXISTS "ix_{tabela}_{coluna}" ON "{tabela}" ("{coluna}")')
+
+
+def _ler_tabela(con, tabela, filtros=None):
+    colunas = colunas_tabela(con, tabela)
+    if not colunas: return pd.DataFrame()
+    where, params = filtro_sql(filtros, colunas)
+    return pd.read_sql_query(f'SELECT * FROM "{tabela}"{where}', con, params=params)
+
+
+def _coluna_final(n_colunas):
+    from gspread.utils import rowcol_to_a1
+    return rowcol_to_a1(1, n_colunas).rstrip("0123456789")
+
+
+def completar_linhas(linhas, n_colunas):
+    # A API corta células vazias no fim da linha; completamos até o tamanho do cabeçalho
+    return [(l + [""] * n_colunas)[:n_colunas] for l in linhas]
+
+
+def _sincronizar(con, ws, tabela, meta):
+    header = [h.strip() for h in com_retry(ws.row_values, 1)]
+    if not header:
+        con.execute(f'DROP TABLE IF EXISTS "{tabela}"')
+        return {"header": [], "linhas": 0, "sincronizado_em": time.time()}
+
+    if meta is None or meta.get("header") != header:
+        # Primeira carga (ou cabeçalho mudou): baixa tudo uma vez
+        dados = com_retry(ws.get_all_values)[1:]
+        df = pd.DataFrame(completar_linhas(dados, len(header)), columns=header)
+        df.to_sql(tabela, con, if_exists="replace", index=False)
+        indexar_tabela(con, tabela)
+        return {"header": header, "linhas": len(dados), "sincronizado_em": time.time()}
+
+    # Incremental: só o que veio depois da última linha conhecida. meta["linhas"] marca
+    # a posição na planilha até onde o cache vai, então tudo daqui para baixo é novo,
+    # inclusive o resto de um snapshot cujo save foi sincronizado pela metade.
+    inicio = meta["linhas"] + 2
+    bloco = com_retry(ws.get, f"A{inicio}:{_coluna_final(len(header))}") or []
+    novas = [l for l in bloco if any(str(c).strip() for c in l)]
+    if novas:
+        df_novo = pd.DataFrame(completar_linhas(novas, len(header)), columns=header)
+        df_novo.to_sql(tabela, con, if_exists="append", index=False)
+    return {"header": header, "linhas": meta["linhas"] + len(bloco), "sincronizado_em": time.time()}
+
+
+def _sincronizar_se_vencido(con, aba, ttl):
+    meta = _ler_meta(con, aba)
+    if meta is None or time.time() - meta.get("sincronizado_em", 0) >= ttl:
+        try:
+            with etapa(f"sincronizar {aba}"):
+                meta = _sincronizar(con, abrir_aba(aba), aba, meta)
+            _gravar_meta(con, aba, meta)
+            con.commit()
+        except Exception:
+            con.rollback()
+            if _ler_meta(con, aba) is None: raise
+
+
+def sincronizar(aba, ttl=None):
+    """Só atualiza a cópia local da aba (se o TTL venceu), sem ler nada para o pandas."""
+    ttl = TTL_SEGUNDOS if ttl is None else ttl
+    with _lock:
+        con = _abrir()
+        try:
+            _sincronizar_se_vencido(con, aba, ttl)
+        finally:
+            con.close()
+
+
+def carregar_aba_cacheada(aba, ttl=None, filtros=None):
+    """Retorna a aba a partir do cache local, sincronizando se o TTL venceu.
+
+    A conexão só é usada quando há sincronização, então reruns dentro do TTL
+    não fazem nenhuma chamada à API. Se a planilha estiver inacessível,
+    devolve a última cópia local (sem cópia, o erro sobe para a página
+    avisar em vez de mostrar a aba vazia). `filtros` ({coluna: valores}) vira WHERE na
+    consulta ao cache, então só as linhas pedidas chegam ao pandas.
+    """
+    ttl = TTL_SEGUNDOS if ttl is None else ttl
+    with _lock:
+        con = _abrir()
+        try:
+            _sincronizar_se_vencido(con, aba, ttl)
+            with etapa(f"cache {aba}") as registro:
+                df = _ler_tabela(con, aba, filtros)
+                registro["linhas"] = len(df)
+            return df
+        finally:
+            con.close()
+
+
+def cache_valido(aba, ttl=None):
+    """True se a cópia local da aba existe e ainda está dentro do TTL."""
+    ttl = TTL_SEGUNDOS if ttl is None else ttl
+    with _lock:
+        con = _abrir()
+        try:
+            meta = _ler_meta(con, aba)
+        finally:
+            con.close()
+    return meta is not None and time.time() - meta.get("sincronizado_em", 0) < ttl
+
+
+def invalidar_aba(aba, completo=False):
+    """Força sincronização no próximo acesso (completo=True rebaixa a aba inteira)."""
+    with _lock:
+        con = _abrir()
+        try:
+            if completo:
+                con.execute("DELETE FROM cache_meta WHERE tabela = ?", (aba,))
+            else:
+                meta = _ler_meta(con, aba)
+                if meta:
+                    meta["sincronizado_em"] = 0
+                    _gravar_meta(con, aba, meta)
+            con.commit()
+        finally:
+            con.close()
+
+
+def carregar_snapshots(ttl=None, filtros=None):
+    # Tipos compactos (category/datetime/int) aplicados na carga, ver core.esquema
+    return tipar(carregar_aba_cacheada(ABA_SNAPSHOTS, ttl, filtros))
+
+
+def invalidar_snapshots(completo=False):
+    invalidar_aba(ABA_SNAPSHOTS, completo)
@@ -0,0 +1,89 @@
+import pandas as pd
+
+from core.armazenamento import carregar_catalogo, carregar_historico, obter_armazenamento
+from core.cache_snapshots import ABA_RESUMO, ABA_SNAPSHOTS, normalizar_filtros
+from core.catalogo import ABA_CATALOGO
+from core.compartilhado import dados_compartilhados
+from core.medicao import etapa
+from core.previsao import COLUNAS_PADRAO
+from core.resumo import carregar_resumo
+from core.status import classificar_status
+
+# =========================
+# LEITURAS COMPARTILHADAS DAS PÁGINAS
+# =========================
+# As páginas e o aquecimento (core.aquecimento) leem pelas mesmas funções, então
+# o que o aquecimento deixou pronto cai nas mesmas chaves do cache compartilhado.
+# Nada de st.* aqui: os carregadores rodam em qualquer thread. Os frames
+# devolvidos são os mesmos para todas as sessões: não alterar no lugar.
+ABAS_PREVISAO = ("previsao_ativa", "prorrogacao", "desistencia")
+
+
+def _ler_historico(filtros):
+    df = carregar_historico(filtros)
+    if df.empty: return pd.DataFrame()
+    df.columns = df.columns.str.strip()
+    if "Status" not in df.columns:
+        with etapa("classificar_status", linhas=len(df)):
+            df["Status"] = classificar_status(df)
+    return df
+
+
+def historico(filtros=None):
+    """Leads do db_snapshots com Status; filtros ({coluna: valores}) vão para o WHERE do backend."""
+    return dados_compartilhados(("historico", repr(normalizar_filtros(filtros))),
+                                lambda: _ler_historico(filtros), abas=(ABA_SNAPSHOTS,))
+
+
+def resumo(filtros=None):
+    """Resumo pré-agregado gravado pela Home (db_resumo)."""
+    return dados_compartilhados(("resumo", repr(normalizar_filtros(filtros))),
+                                lambda: carregar_resumo(filtros=filtros), abas=(ABA_RESUMO,))
+
+
+def catalogo():
+    """Uma linha por snapshot (db_catalogo)."""
+    return dados_compartilhados(("catalogo",), carregar_catalogo, abas=(ABA_CATALOGO,))
+
+
+def selecao_padrao(df_catalogo):
+    """{marca: ids da primeira semana}: o que o Histórico mostra ao escolher cada marca."""
+    selecao = {}
+    for marca in df_catalogo["marca_ref"].unique():
+        df_marca = df_catalogo[df_catalogo["marca_ref"] == marca]
+        semana = df_marca["semana_ref"].iloc[0]
+        selecao[marca] = df_marca.loc[df_marca["semana_ref"] == semana, "snapshot_id"].unique()
+    return selecao
+
+
+def _ler_aba_previsao(nome_aba):
+    # Planilha (pool compartilhado, sem reautenticar) ou SQLite local, conforme o backend
+    dados = obter_armazenamento().ler_grade(nome_aba, COLUNAS_PADRAO)
+    if not dados: return None
+
+    header = [h.strip() for h in dados[0]]
+    primeira_linha, cabecalho_ok = 2, True
+    if "Consultor" in header and "Valor" in header:
+        df = pd.DataFrame(dados[1:], columns=header)
+    else:
+        cabecalho_ok = False
+        if len(dados[0]) >= len(COLUNAS_PADRAO):
+             if dados[0][0] == "Consultor":
+                 df = pd.DataFrame(dados[1:], columns=COLUNAS_PADRAO)
+             else:
+                 df = pd.DataFrame(dados, columns=COLUNAS_PADRAO)
+                 primeira_linha = 1
+        else:
+             return None
+
+    if 'Valor' in df.columns:
+        df['Valor'] = df['Valor'].astype(str).str.replace('R$', '', regex=False).str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+        df['Valor'] = pd.to_numeric(df['Valor'], errors='coerce').fillna(0.0)
+    return df, primeira_linha, cabecalho_ok
+
+
+def aba_previsao(nome_aba):
+    """(frame, linha da planilha da 1ª linha, cabeçalho ok?) da aba de previsão, ou None
+    se não há o que ler. Um download por aba para todas as sessões; cadastrar/mover
+    invalida a aba gravada."""
+    return dados_compartilhados(("previsao", nome_aba), lambda: _ler_aba_previsao(nome_aba), abas=(nome_aba,))
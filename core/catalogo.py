@@ -0,0 +1,38 @@
+import pandas as pd
+
+# =========================
+# CATÁLOGO DE SNAPSHOTS (db_catalogo)
+# =========================
+# Uma linha por snapshot com as referências e a faixa de linhas que ele ocupa no
+# db_snapshots. Os seletores das páginas saem daqui, e os leads de um snapshot
+# são buscados com um get da faixa em vez de baixar a aba inteira.
+ABA_CATALOGO = "db_catalogo"
+REFERENCIAS = ["snapshot_id", "marca_ref", "semana_ref", "data_salvamento"]
+COLUNAS_CATALOGO = REFERENCIAS + ["linhas", "linha_inicio", "linha_fim"]
+
+
+def montar_catalogo(chaves, linha_inicial=2):
+    """Catálogo a partir das colunas de referência do db_snapshots, na ordem da aba.
+
+    `chaves` tem uma linha por linha da aba (a primeira é `linha_inicial`).
+    Se as linhas de um snapshot não forem contíguas (saves simultâneos), a faixa
+    cobre de ponta a ponta e a leitura filtra pelo snapshot_id.
+    """
+    chaves = chaves.reindex(columns=REFERENCIAS).fillna("").astype(str)
+    chaves = chaves.assign(linha=range(linha_inicial, linha_inicial + len(chaves)))
+    chaves = chaves[chaves["snapshot_id"].str.strip() != ""]
+    if chaves.empty: return pd.DataFrame(columns=COLUNAS_CATALOGO)
+    grupos = chaves.groupby("snapshot_id", sort=False)
+    catalogo = grupos[REFERENCIAS[1:]].first()
+    catalogo["linhas"] = grupos.size()
+    catalogo["linha_inicio"] = grupos["linha"].min()
+    catalogo["linha_fim"] = grupos["linha"].max()
+    return catalogo.reset_index()[COLUNAS_CATALOGO].astype(str)
+
+
+def faixas(catalogo):
+    """snapshot_id (texto) -> (linha_inicio, linha_fim)."""
+    ini = pd.to_numeric(catalogo["linha_inicio"], errors="coerce")
+    fim = pd.to_numeric(catalogo["linha_fim"], errors="coerce")
+    ok = ini.notna() & fim.notna()
+    return dict(zip(catalogo.loc[ok, "snapshot_id"].astype(str), zip(ini[ok].astype(int), fim[ok].astype(int))))
@@ -0,0 +1,189 @@
+import logging
+import os
+import threading
+import time
+
+from core.medicao import iniciar
+
+# =========================
+# CACHE DE DADOS COMPARTILHADO ENTRE SESSÕES
+# =========================
+# Um por processo: N pessoas abrindo Histórico/Comparativo/Previsão leem o mesmo
+# frame já carregado, em vez de N downloads iguais.
+#  - single-flight: faltas simultâneas da mesma chave disparam um carregamento só;
+#  - uma thread em segundo plano renova as entradas em uso antes de vencerem, então
+#    quem chega depois do TTL não espera a planilha;
+#  - cada entrada diz de quais abas depende, e as gravações do armazenamento
+#    invalidam essas abas (save da Home, mover/cadastrar na Previsão, backfill);
+#    caches fora daqui (ex.: o LRU do Comparativo) se inscrevem com ao_invalidar.
+# Os carregadores rodam em qualquer thread: não podem usar st.* nem session_state.
+TTL_SEGUNDOS = int(os.environ.get("BI_CRM_COMPARTILHADO_TTL", "60"))
+ANTECEDENCIA = 0.25  # renova quando falta este tanto do TTL
+OCIOSO_SEGUNDOS = 600  # sem acesso há mais que isso: não renova e descarta ao vencer
+INTERVALO_RENOVACAO = 5
+
+log = logging.getLogger("bi_crm.compartilhado")
+
+
+class _Entrada:
+    def __init__(self, carregar, ttl, abas):
+        self.carregar = carregar
+        self.ttl = ttl
+        self.abas = frozenset(abas)
+        self.valor = None
+        self.tem_valor = False
+        self.erro = None
+        self.carregado_em = float("-inf")
+        self.acessado_em = time.monotonic()
+        self.geracao = 0  # muda a cada invalidação: carga iniciada antes dela não conta como fresca
+        self.voo = None
+        self.falhou_em = float("-inf")
+
+    def fresca(self, agora):
+        return self.tem_valor and agora - self.carregado_em < self.ttl
+
+
+class CacheCompartilhado:
+    def __init__(self, ttl=TTL_SEGUNDOS, intervalo=INTERVALO_RENOVACAO):
+        self.ttl = ttl
+        self.intervalo = intervalo
+        self._entradas = {}
+        self._lock = threading.Lock()
+        self._renovador = None
+        self._ouvintes = []  # (abas, callback) de ao_invalidar
+        self.contadores = {"acertos": 0, "faltas": 0, "esperas": 0, "renovacoes": 0,
+                           "falhas_renovacao": 0, "invalidacoes": 0}
+
+    def obter(self, chave, carregar, ttl=None, abas=()):
+        """Valor de `chave`; vencido ou ausente, carrega uma vez só (os demais esperam)."""
+        with self._lock:
+            agora = time.monotonic()
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                entrada = self._entradas[chave] = _Entrada(carregar, self.ttl if ttl is None else ttl, abas)
+            entrada.carregar, entrada.acessado_em = carregar, agora
+            if entrada.fresca(agora):
+                self.contadores["acertos"] += 1
+                self._iniciar_renovador()
+                return entrada.valor
+            lider = entrada.voo is None
+            if lider:
+                entrada.voo = threading.Event()
+                self.contadores["faltas"] += 1
+            else:
+                self.contadores["esperas"] += 1
+            voo = entrada.voo
+        if lider:
+            self._carregar(entrada)
+        else:
+            voo.wait()
+        self._iniciar_renovador()
+        with self._lock:
+            if entrada.erro is not None: raise entrada.erro
+            return entrada.valor
+
+    def _carregar(self, entrada):
+        # Só quem abriu o voo chama; o resultado fica para todos os que esperavam
+        geracao = entrada.geracao
+        try:
+            valor, erro = entrada.carregar(), None
+        except Exception as e:
+            valor, erro = None, e
+        with self._lock:
+            if erro is None:
+                entrada.valor, entrada.tem_valor = valor, True
+                # Invalidada no meio da carga: serve quem esperava, mas a próxima leitura recarrega
+                entrada.carregado_em = time.monotonic() if entrada.geracao == geracao else float("-inf")
+            entrada.erro = erro
+            voo, entrada.voo = entrada.voo, None
+        voo.set()
+        return erro is None
+
+    def invalidar(self, *abas):
+        """Entradas que dependem de alguma das abas (todas, sem argumentos) recarregam no próximo acesso."""
+        alvo = set(abas)
+        with self._lock:
+            for entrada in self._entradas.values():
+                if not alvo or entrada.abas & alvo:
+                    entrada.geracao += 1
+                    entrada.carregado_em = float("-inf")
+                    self.contadores["invalidacoes"] += 1
+            ouvintes = [callback for abas_ouvinte, callback in self._ouvintes if not alvo or abas_ouvinte & alvo]
+        # Fora do lock: o callback pode usar locks próprios
+        for callback in ouvintes:
+            callback()
+
+    def ao_invalidar(self, callback, *abas):
+        """Chama callback() sempre que alguma das abas for invalidada (gravada)."""
+        with self._lock:
+            self._ouvintes.append((frozenset(abas), callback))
+
+    def _iniciar_renovador(self):
+        if self._renovador is None or not self._renovador.is_alive():
+            self._renovador = threading.Thread(target=self._renovar_sempre, name="bi_crm-renovador", daemon=True)
+            self._renovador.start()
+
+    def renovar(self):
+        """Uma passada: recarrega as entradas em uso perto de vencer e descarta as ociosas vencidas."""
+        agora = time.monotonic()
+        alvo = []
+        with self._lock:
+            for chave, entrada in list(self._entradas.items()):
+                ociosa = agora - entrada.acessado_em > OCIOSO_SEGUNDOS
+                if ociosa:
+                    if not entrada.fresca(agora) and entrada.voo is None: del self._entradas[chave]
+                    continue
+                # Renovação que falhou só é tentada de novo depois de um novo acesso
+                if (entrada.voo is None and entrada.falhou_em < entrada.acessado_em
+                        and agora - entrada.carregado_em > entrada.ttl * (1 - ANTECEDENCIA)):
+                    entrada.voo = threading.Event()
+                    alvo.append((chave, entrada))
+        for chave, entrada in alvo:
+            if self._carregar(entrada):
+                self.contadores["renovacoes"] += 1
+            else:
+                # Mantém o valor anterior; a próxima leitura vencida tenta de novo (e mostra o erro)
+                entrada.falhou_em = time.monotonic()
+                self.contadores["falhas_renovacao"] += 1
+                log.warning("Falha ao renovar %r: %r", chave, entrada.erro)
+
+    def _renovar_sempre(self):
+        while True:
+            time.sleep(self.intervalo)
+            # Rodada de medição nova a cada passada: a desta thread nunca é fechada por
+            # um painel_debug, e as etapas acumulariam pela vida do processo
+            iniciar("renovador")
+            try:
+                self.renovar()
+            except Exception:
+                log.exception("Renovador do cache compartilhado")
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+_cache = CacheCompartilhado()
+
+
+def dados_compartilhados(chave, carregar, abas=(), ttl=None):
+    """carregar() compartilhado entre sessões por `chave` (ver CacheCompartilhado).
+
+    O valor devolvido é o mesmo objeto para todas as sessões: não alterar no lugar.
+    """
+    return _cache.obter(chave, carregar, ttl, abas)
+
+
+def invalidar(*abas):
+    _cache.invalidar(*abas)
+
+
+def ao_invalidar(callback, *abas):
+    _cache.ao_invalidar(callback, *abas)
+
+
+def cache_compartilhado():
+    return _cache
@@ -0,0 +1,68 @@
+import pandas as pd
+
+# =========================
+# ESQUEMA DO db_snapshots / db_resumo
+# =========================
+# A planilha devolve tudo como texto; aplicamos tipos compactos na carga.
+COLUNAS_CATEGORIA = ["marca_ref", "semana_ref", "Responsável", "Equipe", "Etapa", "Motivo de Perda",
+                     "Fonte", "Campanha", "Estado", "Status", "dimensao"]
+COLUNAS_DATA = {"data_salvamento": "%d/%m/%Y %H:%M", "Data de Criação": "ISO8601"}
+COLUNAS_INTEIRAS = ["qtd", "linhas", "linha_inicio", "linha_fim"]
+FORMATO_SNAPSHOT_ID = "%Y%m%d_%H%M%S"
+# Colunas fora do esquema viram category quando repetem muito (ex.: cidade, UF)
+LIMITE_CARDINALIDADE = 0.5
+
+
+def _ordem_snapshot(snapshot_id):
+    # "20240201_101500_10" -> (20240201, 101500, 10): o sufixo da carga em lote ordena como número
+    return tuple((0, int(p)) if p.isdigit() else (1, p) for p in str(snapshot_id).split("_"))
+
+
+def snapshot_id_para_categoria(serie):
+    """Category ordenada por data/hora (e sufixo de lote): o mesmo dtype para qualquer
+    conjunto de ids, com códigos inteiros pequenos para comparar, ordenar e agrupar."""
+    texto = serie.astype(str)
+    ids = sorted((i for i in texto.unique() if i.strip()), key=_ordem_snapshot)
+    return pd.Series(pd.Categorical(texto.where(texto.str.strip() != ""), categories=ids, ordered=True),
+                     index=serie.index, name=serie.name)
+
+
+def tipar(df):
+    """Converte um frame lido da planilha (só strings) para os tipos do esquema."""
+    if df.empty: return df
+    antes = int(df.memory_usage(deep=True).sum())
+    df = df.copy()
+    for col in df.columns:
+        serie = df[col]
+        if col == "snapshot_id":
+            df[col] = snapshot_id_para_categoria(serie)
+        elif col in COLUNAS_DATA:
+            formato = COLUNAS_DATA[col]
+            df[col] = pd.to_datetime(serie.replace({"": None, "NaT": None, "nan": None}), format=formato, errors="coerce")
+        elif col in COLUNAS_INTEIRAS:
+            df[col] = pd.to_numeric(serie, errors="coerce").fillna(0).astype("int64")
+        elif col in COLUNAS_CATEGORIA or serie.nunique() <= LIMITE_CARDINALIDADE * len(serie):
+            df[col] = serie.astype("category")
+    df.attrs["memoria_texto_bytes"] = antes
+    return df
+
+
+def para_planilha(df):
+    """Inverso de `tipar` para as colunas-chave, antes de gravar de volta na planilha."""
+    df = df.copy()
+    if "snapshot_id" in df.columns:
+        df["snapshot_id"] = df["snapshot_id"].astype(object).fillna("")
+    for col, formato in COLUNAS_DATA.items():
+        if col in df.columns and pd.api.types.is_datetime64_any_dtype(df[col]):
+            fmt = "%Y-%m-%d %H:%M:%S" if formato == "ISO8601" else formato
+            df[col] = df[col].dt.strftime(fmt).fillna("")
+    return df.astype(str)
+
+
+def relatorio_memoria(df):
+    """Memória por coluna (MB) e total comparado com o frame todo em texto."""
+    por_coluna = df.memory_usage(deep=True, index=False) / 1e6
+    rel = pd.DataFrame({"tipo": df.dtypes.astype(str), "MB": por_coluna.round(2)}).sort_values("MB", ascending=False)
+    total = por_coluna.sum()
+    texto = df.attrs.get("memoria_texto_bytes", 0) / 1e6
+    return rel, total, texto
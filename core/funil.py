@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+# =========================
+# DEFINIÇÃO DE FUNIL POR MARCA
+# =========================
+# Etapas do funil acumulado (da mais alta para a mais baixa conversão)
+FUNIL_PADRAO = ["Confirmou Interesse", "Qualificado", "Reunião Agendada", "Reunião Realizada", "negociação", "em aprovação", "faturado"]
+# Pipeline completo, usado nos comparativos etapa a etapa
+ETAPAS_PADRAO = ["Sem contato", "Aguardando Resposta", "Confirmou Interesse", "Qualificado", "Reunião Agendada", "Reunião Realizada", "Follow-up", "negociação", "em aprovação", "faturado"]
+
+# Sobrescreva por marca quando o CRM dela tiver etapas diferentes
+FUNIL_POR_MARCA = {}
+ETAPAS_POR_MARCA = {}
+
+# Nomes alternativos de uma mesma etapa, mapeados para o nome canônico acima.
+# Ex.: {"negociação": ["Negociação", "negociacao"]}
+ALIASES_ETAPA = {}
+
+
+def funil_da_marca(marca=None):
+    return FUNIL_POR_MARCA.get(marca, FUNIL_PADRAO)
+
+
+def etapas_da_marca(marca=None):
+    return ETAPAS_POR_MARCA.get(marca, ETAPAS_PADRAO)
+
+
+def _canonicas(nomes, ordem, ignorar_caixa):
+    # Nome de etapa -> etapa canônica da ordem (NaN para as que não entram no funil)
+    mapa = {}
+    for etapa in ordem:
+        for nome in [etapa] + ALIASES_ETAPA.get(etapa, []):
+            mapa.setdefault(nome.lower() if ignorar_caixa else nome, etapa)
+    nomes = pd.Index(nomes).astype(str)
+    if ignorar_caixa: nomes = nomes.str.lower()
+    return np.asarray(nomes.map(mapa), dtype=object)
+
+
+def contar_por_etapa(contagem, ordem, ignorar_caixa=False):
+    """Qtd por etapa canônica, na ordem dada, a partir de um value_counts de "Etapa".
+
+    Etapas fora da ordem (e sem alias) são descartadas; as ausentes viram 0.
+    """
+    por_etapa = contagem.groupby(_canonicas(contagem.index, ordem, ignorar_caixa)).sum()
+    return por_etapa.reindex(ordem, fill_value=0).astype(int)
+
+
+def funil_acumulado(contagem, ordem, ignorar_caixa=False):
+    """Funil "daqui pra frente": cada etapa soma ela e todas as seguintes.
+
+    Um único value_counts + soma acumulada reversa, em vez de um filtro por etapa.
+    """
+    por_etapa = contar_por_etapa(contagem, ordem, ignorar_caixa)
+    return por_etapa[::-1].cumsum()[::-1]
+
+
+def funil_acumulado_em_lote(contagens, ordem, ignorar_caixa=False):
+    """`funil_acumulado` para vários snapshots de uma vez.
+
+    `contagens` tem uma linha por snapshot e uma coluna por valor de "Etapa";
+    devolve uma coluna por etapa da ordem, já acumulada.
+    """
+    por_etapa = contagens.T.groupby(_canonicas(contagens.columns, ordem, ignorar_caixa)).sum().T
+    por_etapa = por_etapa.reindex(columns=ordem, fill_value=0).astype(int)
+    return por_etapa.iloc[:, ::-1].cumsum(axis=1).iloc[:, ::-1]
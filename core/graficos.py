@@ -0,0 +1,62 @@
+import hashlib
+import os
+
+import pandas as pd
+
+from core.lru import CacheLRU
+
+# =========================
+# CACHE DE FIGURAS (PLOTLY)
+# =========================
+# Cada widget dispara um rerun que refazia todos os px.pie/px.bar/go.Figure.
+# A figura fica guardada pela impressão digital dos dados agregados + opções do
+# gráfico; rerun sem mudança nos dados só reenvia a figura pronta.
+LIMITE_MB = float(os.environ.get("BI_CRM_GRAFICOS_MB", "32"))
+# Categorias além disso viram uma só ("Outros") antes de ir para o navegador
+MAX_CATEGORIAS = int(os.environ.get("BI_CRM_MAX_CATEGORIAS", "12"))
+
+
+def impressao(*partes):
+    """Hash estável do conteúdo (frames/séries pelos valores, índice, colunas e tipos)."""
+    h = hashlib.blake2b(digest_size=16)
+    for parte in partes:
+        if isinstance(parte, (pd.DataFrame, pd.Series)):
+            colunas = parte.dtypes.items() if isinstance(parte, pd.DataFrame) else [(parte.name, parte.dtype)]
+            h.update(repr(list(colunas)).encode())
+            h.update(pd.util.hash_pandas_object(parte, index=True).values.tobytes())
+        elif isinstance(parte, dict):
+            h.update(repr(sorted(parte.items(), key=lambda item: str(item[0]))).encode())
+        else:
+            h.update(repr(parte).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def aparar_cauda(df, categoria, valor, maximo=MAX_CATEGORIAS, rotulo="Outros"):
+    """Mantém as maximo-1 maiores categorias e soma o resto numa linha `rotulo`."""
+    if len(df) <= maximo:
+        return df
+    ordenado = df.sort_values(valor, ascending=False, kind="stable")
+    cabeca, cauda = ordenado.iloc[:maximo - 1], ordenado.iloc[maximo - 1:]
+    outros = pd.DataFrame({categoria: [rotulo], valor: [cauda[valor].sum()]})
+    return pd.concat([cabeca[[categoria, valor]], outros], ignore_index=True)
+
+
+def _tamanho_figura(fig):
+    # Conta o que de fato vai para o navegador (só na hora de guardar)
+    import plotly.io as pio
+    return len(pio.to_json(fig, validate=False))
+
+
+_figuras = CacheLRU(LIMITE_MB * 1e6, medir=_tamanho_figura)
+
+
+def figura(construir, *dados, **opcoes):
+    """construir(*dados, **opcoes) memoizado pela impressão dos dados e das opções.
+
+    `construir` deve depender só dos argumentos; a figura devolvida é compartilhada
+    (o st.plotly_chart serializa uma cópia, então não alterar depois).
+    """
+    # Páginas rodam todas como __main__: o arquivo do construtor separa as de mesmo nome
+    chave = (construir.__code__.co_filename, construir.__qualname__, impressao(*dados, opcoes))
+    return _figuras.obter(chave, lambda: construir(*dados, **opcoes))
@@ -0,0 +1,212 @@
+import codecs
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.status import classificar_status
+
+# =========================
+# LEITURA DO CSV DO RD STATION
+# =========================
+TAMANHO_AMOSTRA = 64 * 1024
+LINHAS_POR_BLOCO = 100_000
+FORMATOS_DATA = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y")
+
+COLUNAS_TEXTO = ["Responsável", "Equipe", "Etapa", "Motivo de Perda", "Fonte", "Campanha", "Estado"]
+STATUS_POSSIVEIS = ["Em Andamento", "Ganho", "Perdido"]
+# Outras colunas de texto viram category no bloco quando repetem muito (ex.: cidade, UF)
+LIMITE_CARDINALIDADE = 0.5
+
+BOM_UTF8 = codecs.BOM_UTF8
+
+
+def detectar_encoding(file, tamanho_bloco=1 << 20):
+    """"utf-8-sig" se o arquivo inteiro é UTF-8 válido, senão "latin-1".
+
+    Valida em blocos (memória constante): uma amostra só pode enganar quando os
+    acentos aparecem depois dela, e aí o latin-1 viraria mojibake ("ExpansÃ£o").
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        while True:
+            dados = file.read(tamanho_bloco)
+            if not dados:
+                decoder.decode(b"", final=True)
+                return "utf-8-sig"
+            decoder.decode(dados)
+    except UnicodeDecodeError:
+        return "latin-1"
+    finally:
+        file.seek(0)
+
+
+def detectar_formato(amostra, encoding):
+    """Descobre separador e se há a linha "sep=" a partir dos primeiros bytes."""
+    if amostra.startswith(BOM_UTF8):
+        amostra = amostra[len(BOM_UTF8):]
+    # final=False tolera um caractere multibyte cortado no fim da amostra
+    texto = codecs.getincrementaldecoder(encoding)(errors="replace").decode(amostra, final=False)
+
+    pular = 0
+    inicio = texto.lstrip()
+    if inicio.startswith("sep="):
+        primeira, _, resto = inicio.partition("\n")
+        sep = primeira[4:].strip()[:1]
+        pular = 1
+        texto = resto
+    else:
+        sep = ""
+    if not sep:
+        sep = ";" if texto.count(";") > texto.count(",") else ","
+    return sep, pular
+
+
+def escolher_formato_data(serie):
+    # Testa os formatos fixos numa amostra; o parse com formato fixo é várias vezes
+    # mais rápido que a inferência de dayfirst=True
+    amostra = serie.dropna().astype(str).str.strip()
+    amostra = amostra[amostra != ""].head(200)
+    if amostra.empty: return None
+    for formato in FORMATOS_DATA:
+        if pd.to_datetime(amostra, format=formato, errors="coerce").notna().all():
+            return formato
+    return None
+
+
+def converter_data(serie, formato=None):
+    formato = formato or escolher_formato_data(serie)
+    if formato:
+        return pd.to_datetime(serie, format=formato, errors="coerce")
+    return pd.to_datetime(serie, dayfirst=True, errors="coerce")
+
+
+def _colunas_categoricas(bloco):
+    # Decidido no primeiro bloco e mantido nos demais: um dtype por coluna no concat
+    # (as do app entram mesmo vazias neste bloco, ex.: Motivo de Perda só preenchido mais adiante)
+    mapa = mapear_colunas(bloco.columns)
+    return [c for c in bloco.columns
+            if mapa.get(c) in COLUNAS_TEXTO or (pd.api.types.is_string_dtype(bloco[c])
+                                                 and bloco[c].nunique() <= LIMITE_CARDINALIDADE * len(bloco))]
+
+
+def _concatenar(blocos, categoricas):
+    # Mesmas categorias em todos os blocos: o concat mantém category em vez de voltar a object.
+    # União como object: um bloco pode ter lido a coluna como número ou toda vazia
+    for col in categoricas:
+        uniao = pd.Index(pd.unique(np.concatenate(
+            [np.asarray(b[col].cat.categories, dtype=object) for b in blocos])), dtype=object)
+        for b in blocos:
+            b[col] = b[col].cat.set_categories(uniao)
+    return pd.concat(blocos, ignore_index=True)
+
+
+def ler_csv_em_blocos(file, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Lê o export em blocos com o parser C, sem materializar o arquivo como string.
+
+    Cada bloco já sai compacto (datas convertidas, texto repetido como category), então
+    o pico de memória é o dos blocos compactos, não o do arquivo inteiro em object.
+    """
+    encoding = detectar_encoding(file)
+    amostra = file.read(TAMANHO_AMOSTRA)
+    file.seek(0)
+    sep, pular = detectar_formato(amostra, encoding)
+
+    leitor = pd.read_csv(
+        file, sep=sep, encoding=encoding, encoding_errors="replace", skiprows=pular,
+        engine="c", on_bad_lines="skip", chunksize=linhas_por_bloco, low_memory=True,
+    )
+    blocos = []
+    col_data, formato, categoricas = None, None, []
+    for bloco in leitor:
+        if col_data is None:
+            col_data = next((c for c in bloco.columns if "data de cri" in str(c).strip().lower()), "")
+            if col_data: formato = escolher_formato_data(bloco[col_data])
+            categoricas = [c for c in _colunas_categoricas(bloco) if c != col_data]
+        if col_data:
+            # Converte por bloco: as strings de data não se acumulam na memória
+            bloco[col_data] = converter_data(bloco[col_data], formato)
+        for col in categoricas:
+            bloco[col] = bloco[col].astype("category")
+        blocos.append(bloco)
+    if not blocos: return pd.DataFrame()
+    return _concatenar(blocos, categoricas)
+
+
+def load_csv(file):
+    # Encoding, separador e "sep=" detectados antes; o parse é em blocos (engine C)
+    return ler_csv_em_blocos(file)
+
+
+def _categoria_limpa(serie, vazio="N/A"):
+    # strip e preenchimento feitos só nos valores distintos; o resultado já sai
+    # como category (códigos inteiros + poucas strings) em vez de object
+    codigos, unicos = pd.factorize(serie)
+    limpos = pd.Index(np.asarray(unicos, dtype=object)).astype(str).str.strip()
+    novos, categorias = pd.factorize(limpos)
+    categorias = list(categorias)
+    if (codigos < 0).any():
+        if vazio not in categorias: categorias.append(vazio)
+        novos = np.append(novos, categorias.index(vazio))
+    return pd.Categorical.from_codes(novos[codigos], categorias)
+
+
+def mapear_colunas(colunas):
+    """Cabeçalho do RD -> nome usado no app (só as colunas reconhecidas)."""
+    cols_map = {}
+    for c in colunas:
+        c_lower = str(c).strip().lower()
+        if "fonte" in c_lower and "utm" not in c_lower: cols_map[c] = "Fonte"
+        elif "data de cri" in c_lower: cols_map[c] = "Data de Criação"
+        elif "respons" in c_lower and "equipe" not in c_lower: cols_map[c] = "Responsável"
+        elif "equipes do respons" in c_lower or "equipe" in c_lower: cols_map[c] = "Equipe"
+        elif "motivo de perda" in c_lower: cols_map[c] = "Motivo de Perda"
+        elif "etapa" in c_lower: cols_map[c] = "Etapa"
+        elif "campanha" in c_lower: cols_map[c] = "Campanha"
+        elif c_lower == "estado": cols_map[c] = "Estado"
+    return cols_map
+
+
+def processar(df):
+    df.columns = df.columns.str.strip()
+    df = df.loc[:, ~df.columns.duplicated()]
+    df = df.rename(columns=mapear_colunas(df.columns))
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    # O encoding já foi resolvido na leitura, então não há mojibake para consertar aqui
+    for col in COLUNAS_TEXTO:
+        if col in df.columns:
+            df[col] = _categoria_limpa(df[col])
+        else:
+            df[col] = pd.Categorical(["N/A"] * len(df))
+
+    if "Data de Criação" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["Data de Criação"]):
+        df["Data de Criação"] = converter_data(df["Data de Criação"])
+
+    df["Status"] = pd.Categorical(classificar_status(df), categories=STATUS_POSSIVEIS)
+    return df
+
+
+# =========================
+# CARGA EM LOTE (VÁRIOS EXPORTS DE UMA VEZ)
+# =========================
+def ler_e_processar(conteudo):
+    """load_csv + processar a partir dos bytes do arquivo (função de topo, serializável para o pool)."""
+    return processar(load_csv(io.BytesIO(conteudo)))
+
+
+def processar_em_lote(conteudos, max_processos=None):
+    """Lista de frames processados, na ordem de `conteudos`, um processo por arquivo.
+
+    O parse é CPU puro (o GIL não deixa threads ajudarem). Com um arquivo só, ou uma
+    CPU só, roda aqui mesmo sem pagar a subida dos processos.
+    """
+    processos = min(len(conteudos), max_processos or os.cpu_count() or 1)
+    if processos <= 1:
+        return [ler_e_processar(c) for c in conteudos]
+    # spawn: o servidor do Streamlit tem várias threads, e fork com threads não é seguro
+    with ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(ler_e_processar, conteudos))
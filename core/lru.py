@@ -0,0 +1,67 @@
+import os
+import threading
+from collections import OrderedDict
+
+# =========================
+# CACHE LRU LIMITADO POR MEMÓRIA
+# =========================
+# Guarda frames por chave (ex.: snapshot_id) e, quando o total passa do limite,
+# descarta os usados há mais tempo. Voltar a um período recente não vai à origem.
+# `medir` dá o tamanho de cada valor (por padrão, a memória do frame).
+LIMITE_MB = float(os.environ.get("BI_CRM_LRU_MB", "64"))
+
+
+def tamanho_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+class CacheLRU:
+    def __init__(self, limite_bytes=LIMITE_MB * 1e6, medir=tamanho_bytes):
+        self.limite_bytes = limite_bytes
+        self.medir = medir
+        self._itens = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._geracao = 0  # muda a cada limpar(): carga iniciada antes não é guardada
+        self.contadores = {"acertos": 0, "faltas": 0, "descartes": 0}
+
+    def obter(self, chave, carregar):
+        """Valor de `chave`; na falta, chama carregar() e guarda (frames vazios não são guardados)."""
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.contadores["acertos"] += 1
+                return self._itens[chave][0]
+            self.contadores["faltas"] += 1
+            geracao = self._geracao
+        valor = carregar()
+        if getattr(valor, "empty", False): return valor
+        with self._lock:
+            # Limpo no meio da carga (houve gravação): o valor pode já estar velho
+            if self._geracao != geracao: return valor
+            if chave not in self._itens:
+                tamanho = self.medir(valor)
+                self._itens[chave] = (valor, tamanho)
+                self._bytes += tamanho
+                # O item recém-carregado fica mesmo se sozinho passar do limite
+                while self._bytes > self.limite_bytes and len(self._itens) > 1:
+                    _, (_, liberado) = self._itens.popitem(last=False)
+                    self._bytes -= liberado
+                    self.contadores["descartes"] += 1
+            return self._itens[chave][0]
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+            self._geracao += 1
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, chave):
+        return chave in self._itens
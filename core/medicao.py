@@ -0,0 +1,143 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# =========================
+# MEDIÇÃO POR ETAPA (TEMPO, LINHAS, BYTES, CHAMADAS AO SHEETS)
+# =========================
+# Cada rerun de uma página vira uma "rodada": iniciar() no topo, etapa()/medido()
+# nos trechos quentes e painel_debug() no fim. Cada etapa sai como uma linha JSON
+# no logger "bi_crm.medicao"; o painel na sidebar é opcional (BI_CRM_DEBUG=1 liga por padrão).
+DEBUG_PADRAO = os.environ.get("BI_CRM_DEBUG", "") not in ("", "0")
+
+log = logging.getLogger("bi_crm.medicao")
+if not log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(os.environ.get("BI_CRM_LOG_NIVEL", "INFO").upper())
+    log.propagate = False
+
+# O Streamlit roda cada sessão na sua própria thread, então a rodada é por thread
+_local = threading.local()
+
+
+def _nova(pagina):
+    return {"pagina": pagina, "inicio": time.perf_counter(), "etapas": [], "chamadas": 0, "bytes": 0, "nivel": 0,
+            "limitacoes": {}, "falhas": set()}
+
+
+def _atual():
+    rodada = getattr(_local, "rodada", None)
+    if rodada is None:
+        rodada = _local.rodada = _nova("-")
+    return rodada
+
+
+def _emitir(dados):
+    log.info(json.dumps(dados, ensure_ascii=False, default=str))
+
+
+def iniciar(pagina):
+    """Começa a medição de um rerun (chamar no topo do script)."""
+    _local.rodada = _nova(pagina)
+
+
+@contextmanager
+def etapa(nome, linhas=None, bytes=None):
+    """Mede o bloco. O dict devolvido aceita `linhas`/`bytes` preenchidos depois."""
+    rodada = _atual()
+    registro = {"etapa": nome, "nivel": rodada["nivel"], "linhas": linhas, "bytes": bytes}
+    rodada["etapas"].append(registro)
+    chamadas_antes, bytes_antes = rodada["chamadas"], rodada["bytes"]
+    rodada["nivel"] += 1
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro["ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+        rodada["nivel"] -= 1
+        registro["chamadas"] = rodada["chamadas"] - chamadas_antes
+        if registro["bytes"] is None and rodada["bytes"] > bytes_antes:
+            registro["bytes"] = rodada["bytes"] - bytes_antes
+        _emitir({"pagina": rodada["pagina"], **registro})
+
+
+def medido(nome):
+    """Decorator: cada chamada da função vira uma etapa; conta as linhas se o retorno for um frame."""
+    def decorador(func):
+        @functools.wraps(func)
+        def envoltorio(*args, **kwargs):
+            with etapa(nome) as registro:
+                resultado = func(*args, **kwargs)
+                if registro["linhas"] is None and hasattr(resultado, "shape"):
+                    registro["linhas"] = len(resultado)
+                return resultado
+        return envoltorio
+    return decorador
+
+
+def registrar_chamada(tamanho=0):
+    """Uma requisição HTTP ao Google (chamado pelo hook de resposta da sessão do gspread)."""
+    rodada = _atual()
+    rodada["chamadas"] += 1
+    rodada["bytes"] += tamanho
+
+
+def registrar_limitacao(motivo, segundos):
+    """Tempo segurado pelo agendador do Sheets ("cota", "backoff" ou "coalescida")."""
+    limitacoes = _atual()["limitacoes"]
+    qtd, total = limitacoes.get(motivo, (0, 0.0))
+    limitacoes[motivo] = (qtd + 1, total + segundos)
+
+
+def avisar_falha(e, contexto):
+    """Carga que falhou: loga e avisa na página (uma vez por rerun), em vez de
+    deixar a página parecer vazia."""
+    import streamlit as st
+    from core.agendador import CotaEsgotada
+    rodada = _atual()
+    _emitir({"pagina": rodada["pagina"], "etapa": "falha", "contexto": contexto, "erro": repr(e)})
+    cota = isinstance(e, CotaEsgotada)
+    if cota in rodada["falhas"]: return
+    rodada["falhas"].add(cota)
+    if cota:
+        st.warning("⏳ A cota de leitura do Google Sheets está esgotada neste minuto; os dados podem estar "
+                   "incompletos. Recarregue a página em instantes.")
+    else:
+        st.warning(f"⚠️ Falha ao carregar {contexto}: {e}")
+
+
+def falhou():
+    """True se alguma carga deste rerun falhou (e já foi avisada)."""
+    return bool(_atual()["falhas"])
+
+
+def painel_debug():
+    """Fecha a rodada (linha de log com o total) e mostra o painel na sidebar, se ligado."""
+    import pandas as pd
+    import streamlit as st
+    rodada = _atual()
+    total_ms = round((time.perf_counter() - rodada["inicio"]) * 1000, 1)
+    limitacoes = {motivo: round(seg, 2) for motivo, (_, seg) in rodada["limitacoes"].items()}
+    _emitir({"pagina": rodada["pagina"], "etapa": "rerun", "ms": total_ms,
+             "chamadas": rodada["chamadas"], "bytes": rodada["bytes"], "limitacoes": limitacoes})
+    segurado = limitacoes.get("cota", 0) + limitacoes.get("backoff", 0)
+    if segurado >= 1:
+        # Aviso mesmo sem o painel: a página ficou lenta por causa da cota, não travou
+        st.toast(f"⏳ Cota do Google Sheets: requisições seguradas por {segurado:.0f}s neste carregamento.")
+    if not st.sidebar.toggle("🛠️ Debug de desempenho", value=DEBUG_PADRAO, key="debug_desempenho"):
+        return
+    with st.sidebar.expander("⏱️ Tempo por etapa", expanded=True):
+        st.caption(f"Rerun: {total_ms:.0f} ms · {rodada['chamadas']} chamadas ao Sheets · {rodada['bytes'] / 1e3:.1f} KB")
+        if rodada["limitacoes"]:
+            st.caption("Agendador: " + " · ".join(f"{motivo} {qtd}× ({seg:.1f}s)"
+                                                   for motivo, (qtd, seg) in rodada["limitacoes"].items()))
+        if rodada["etapas"]:
+            df = pd.DataFrame(rodada["etapas"])
+            df["etapa"] = ["  " * n + e for n, e in zip(df["nivel"], df["etapa"])]
+            st.dataframe(df[["etapa", "ms", "linhas", "bytes", "chamadas"]], hide_index=True, use_container_width=True)
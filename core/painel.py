@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from core.funil import contar_por_etapa, funil_acumulado, funil_da_marca
+from core.resumo import contagens
+
+# =========================
+# AGREGAÇÕES DOS PAINÉIS
+# =========================
+# Só pandas, sem Streamlit/Plotly: as páginas desenham o resultado e os
+# benchmarks medem exatamente o mesmo cálculo.
+
+
+def agregar_painel(df, marca, motivos_mestrados=()):
+    """Tudo o que o dashboard da Home exibe, a partir dos leads já processados."""
+    total = len(df)
+    perdidos = df[df["Status"] == "Perdido"]
+    em_andamento = int((df["Status"] == "Em Andamento").sum())
+
+    fontes = None
+    if "Fonte" in df.columns:
+        fontes = df["Fonte"].value_counts().reset_index()
+        fontes.columns = ["Fonte", "Qtd"]
+
+    top_campanhas = None
+    if "Campanha" in df.columns:
+        camp = df[df["Campanha"] != "N/A"]["Campanha"].value_counts()
+        top_campanhas = camp[camp > 0].reset_index().head(3)  # category lista também as vazias
+
+    ordem_funil = funil_da_marca(marca)
+    funil = funil_acumulado(df["Etapa"].value_counts(), ordem_funil)
+    funil_labels = ["TOTAL DE LEADS"] + [e.upper() for e in ordem_funil]
+    df_funil = pd.DataFrame({"Etapa": funil_labels, "Quantidade": [total] + funil.tolist()})
+    df_funil["Percentual"] = (df_funil["Quantidade"] / total * 100).round(1) if total > 0 else 0
+    df_funil["Label"] = df_funil["Quantidade"].astype(int).astype(str) + " (" + df_funil["Percentual"].astype(str) + "%)"
+
+    sem_contato = int(((perdidos["Etapa"] == "Aguardando Resposta")
+                       & perdidos["Motivo de Perda"].str.lower().str.contains("sem resposta", na=False)).sum())
+
+    motivos = list(set(perdidos["Motivo de Perda"].unique()) | set(motivos_mestrados))
+    df_loss = perdidos["Motivo de Perda"].value_counts().reindex(motivos, fill_value=0).reset_index()
+    df_loss.columns = ["Motivo", "Qtd"]
+    df_loss = df_loss.sort_values(by="Qtd", ascending=False)
+    df_loss["Perc"] = (df_loss["Qtd"] / total * 100).round(1) if total > 0 else 0
+    df_loss["Label_Text"] = df_loss["Qtd"].astype(int).astype(str) + " (" + df_loss["Perc"].astype(str) + "%)"
+    sem_resposta = df_loss["Motivo"].astype(str).str.contains("sem resposta", case=False, regex=False)
+    df_loss["color"] = np.where(sem_resposta, '#10b981', '#334155')
+
+    return {
+        "total": total, "em_andamento": em_andamento, "perdidos": len(perdidos), "fontes": fontes,
+        "top_campanhas": top_campanhas, "funil": df_funil, "funil_labels": funil_labels,
+        "reuniao_realizada": int(funil.get("Reunião Realizada", 0)), "sem_contato": sem_contato, "perdas": df_loss,
+    }
+
+
+def comparar_funil(res_a, res_b, etapas):
+    """Qtd por etapa dos dois resumos lado a lado (Qtd_A, Qtd_B)."""
+    funil_a = contar_por_etapa(contagens(res_a, "Etapa"), etapas).rename_axis("Etapa").reset_index(name="Qtd_A")
+    funil_b = contar_por_etapa(contagens(res_b, "Etapa"), etapas).rename_axis("Etapa").reset_index(name="Qtd_B")
+    return pd.merge(funil_a, funil_b, on="Etapa")
+
+
+def comparar_fontes(res_a, res_b, top=5):
+    """Top fontes do período A comparadas com o B, com o delta entre eles."""
+    fontes_a, fontes_b = contagens(res_a, "Fonte"), contagens(res_b, "Fonte")
+    top_fontes = fontes_a.head(top).index.tolist()
+    df_a = fontes_a[fontes_a.index.isin(top_fontes)].sort_index().rename_axis('Fonte').reset_index(name='Qtd_A')
+    df_b = fontes_b[fontes_b.index.isin(top_fontes)].sort_index().rename_axis('Fonte').reset_index(name='Qtd_B')
+    comp = pd.merge(df_a, df_b, on="Fonte", how='outer').fillna(0)
+    comp['Delta'] = comp['Qtd_A'] - comp['Qtd_B']
+    comp['Status'] = comp['Delta'].map(lambda x: "🟢 Cresceu" if x > 0 else ("🔴 Caiu" if x < 0 else "🟡 Igual"))
+    return comp
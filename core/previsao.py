@@ -0,0 +1,194 @@
+import hashlib
+import uuid
+from collections import defaultdict, deque
+
+import pandas as pd
+
+# =========================
+# ESCRITA INCREMENTAL DAS ABAS DE PREVISÃO
+# =========================
+# Em vez de ws.clear() + reenviar a aba inteira, comparamos o frame editado com o
+# que foi carregado e enviamos só as linhas que mudaram, num único batch_update.
+
+
+def valor_para_planilha(valor):
+    # "1500,00": o carregar_aba remove "." de milhar e troca "," por ".", então
+    # gravar "1500.0" voltava como 15000
+    try:
+        return f"{float(valor):.2f}".replace(".", ",")
+    except (TypeError, ValueError):
+        return str(valor)
+
+
+def _texto(valor):
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)): return ""
+    if isinstance(valor, float): return f"{valor:.2f}"
+    return str(valor).strip()
+
+
+def _chaves(df, colunas):
+    # Forma normalizada da linha, usada só para comparar conteúdo
+    return [tuple(_texto(v) for v in linha) for linha in df.reindex(columns=colunas).itertuples(index=False, name=None)]
+
+
+def linhas_para_planilha(df):
+    df = df.copy()
+    if "Valor" in df.columns:
+        df["Valor"] = df["Valor"].map(valor_para_planilha)
+    return df.fillna("").astype(str).values.tolist()
+
+
+def _coluna(n):
+    from gspread.utils import rowcol_to_a1
+    return rowcol_to_a1(1, max(n, 1)).rstrip("0123456789")
+
+
+def _agrupar(escritas, largura):
+    # Linhas consecutivas viram um único range ("A5:H9") no batch
+    ops, bloco = [], []
+    for linha, valores in sorted(escritas.items()):
+        if bloco and linha != bloco[-1][0] + 1:
+            ops.append(bloco); bloco = []
+        bloco.append((linha, valores))
+    if bloco: ops.append(bloco)
+    fim = _coluna(largura)
+    return [{"range": f"A{b[0][0]}:{fim}{b[-1][0]}", "values": [v for _, v in b]} for b in ops]
+
+
+def planejar_escrita(anterior, novo, cabecalho_ok=True, linha_inicial=2):
+    """(operações para ws.batch_update, linha de cada linha de `novo`) que levam a aba
+    de `anterior` a `novo`.
+
+    `anterior` é o frame carregado, indexado pelo número da linha na planilha.
+    Linhas com o mesmo conteúdo ficam onde estão; inserções ocupam as vagas das
+    removidas, linhas além do novo tamanho são movidas para dentro e o resto do
+    fim da aba é limpo. Como as linhas mantidas não mudam de lugar, a ordem na
+    planilha pode diferir da do frame: a próxima escrita deve partir de
+    `novo.set_axis(linhas)`, não de range(2, ...). Operações vazias quando não há
+    nada a gravar.
+    """
+    colunas = list(novo.columns)
+    largura = max(len(colunas), len(anterior.columns))
+    ultima = max(anterior.index, default=linha_inicial - 1)
+    valores_novos = [(v + [""] * largura)[:largura] for v in linhas_para_planilha(novo)]
+
+    if not cabecalho_ok or list(anterior.columns) != colunas:
+        # Cabeçalho mudou: reescreve tudo de uma vez (ainda sem clear) e limpa o excedente
+        escritas = {1: (colunas + [""] * largura)[:largura]}
+        for i, valores in enumerate(valores_novos):
+            escritas[2 + i] = valores
+        for linha in range(2 + len(valores_novos), ultima + 1):
+            escritas[linha] = [""] * largura
+        return _agrupar(escritas, largura), list(range(2, 2 + len(valores_novos)))
+
+    livres_por_conteudo = defaultdict(deque)
+    for linha, chave in zip(anterior.index, _chaves(anterior, colunas)):
+        livres_por_conteudo[chave].append(linha)
+
+    n = len(novo)
+    alvo = range(linha_inicial, linha_inicial + n)
+    linhas, a_posicionar = [None] * n, []
+    for i, chave in enumerate(_chaves(novo, colunas)):
+        fila = livres_por_conteudo.get(chave)
+        if fila:
+            linha = fila.popleft()
+            if linha in alvo:
+                linhas[i] = linha
+                continue
+        a_posicionar.append(i)
+
+    escritas = {}
+    fixas = set(linhas)
+    vagas = (linha for linha in alvo if linha not in fixas)
+    for i, linha in zip(a_posicionar, vagas):
+        escritas[linha] = valores_novos[i]
+        linhas[i] = linha
+    for linha in range(linha_inicial + n, ultima + 1):
+        escritas[linha] = [""] * largura
+    return _agrupar(escritas, largura), linhas
+
+
+# =========================
+# ID ESTÁVEL DO LEAD E MOVIMENTOS ENTRE ABAS
+# =========================
+COLUNA_ID = "ID"
+# Colunas das abas de previsão (as de movimento ainda levam Data_Movimento, e todas o ID)
+COLUNAS_PADRAO = ["Consultor", "Lead", "Cidade", "Campanha", "Marca", "Valor", "Data_Registro"]
+
+
+def novo_id():
+    return uuid.uuid4().hex[:12]
+
+
+def garantir_ids(df):
+    """Preenche ID onde estiver vazio.
+
+    Linhas antigas (sem ID gravado) recebem um hash do conteúdo + ordem de
+    ocorrência, então todas as sessões enxergam o mesmo ID até ele ser gravado.
+    """
+    df = df.copy()
+    if COLUNA_ID not in df.columns: df[COLUNA_ID] = ""
+    ids = df[COLUNA_ID].fillna("").astype(str).str.strip()
+    faltando = ids == ""
+    if faltando.any():
+        conteudo = df.loc[faltando, [c for c in df.columns if c != COLUNA_ID]].astype(str).agg("|".join, axis=1)
+        ocorrencia = conteudo.groupby(conteudo).cumcount().astype(str)
+        ids[faltando] = (conteudo + "#" + ocorrencia).map(lambda t: hashlib.sha1(t.encode("utf-8")).hexdigest()[:12])
+    df[COLUNA_ID] = ids
+    return df
+
+
+def completar_ids(df):
+    # Linhas criadas agora (ex.: adicionadas no data_editor) ganham ID aleatório
+    df = df.copy()
+    if COLUNA_ID not in df.columns: df[COLUNA_ID] = None
+    vazios = df[COLUNA_ID].isna() | (df[COLUNA_ID].astype(str).str.strip().isin(["", "None", "nan"]))
+    df.loc[vazios, COLUNA_ID] = [novo_id() for _ in range(int(vazios.sum()))]
+    return df
+
+
+def indexar(df):
+    """Frame da aba indexado por ID (a coluna continua no frame para ser gravada)."""
+    df = garantir_ids(df)
+    return df.set_index(df[COLUNA_ID].rename(None), drop=False)
+
+
+def mover(loja, linhas, origem, destino, colunas):
+    """Tira `linhas` (por ID) de loja[origem] e acrescenta em loja[destino].
+
+    Só move o que ainda está na origem; os IDs que sumiram de lá (já movidos ou
+    removidos por outra sessão) são devolvidos como conflito e ignorados.
+    """
+    ids = pd.Index(linhas[COLUNA_ID].astype(str))
+    presentes = ids[ids.isin(loja[origem].index)]
+    conflitos = ids[~ids.isin(loja[origem].index)].tolist()
+    if len(presentes):
+        novas = linhas.set_index(ids, drop=False).loc[presentes].reindex(columns=colunas)
+        loja[origem] = loja[origem].drop(presentes)
+        loja[destino] = pd.concat([loja[destino].reindex(columns=colunas), novas])
+    return conflitos
+
+
+def atualizar(loja, aba, editadas, novas, colunas):
+    """Grava em loja[aba] as linhas editadas (por ID) e acrescenta as novas.
+
+    Editadas cujo ID já saiu da aba (movidas por outra sessão) não voltam:
+    são devolvidas como conflito.
+    """
+    atual = loja[aba].reindex(columns=colunas)
+    editadas = editadas.set_index(editadas[COLUNA_ID].astype(str).rename(None), drop=False).reindex(columns=colunas)
+    existe = editadas.index.isin(atual.index)
+    if existe.any():
+        atual.loc[editadas.index[existe]] = editadas[existe].to_numpy()
+    novas = novas.set_index(novas[COLUNA_ID].astype(str).rename(None), drop=False).reindex(columns=colunas)
+    loja[aba] = pd.concat([atual, novas]) if len(novas) else atual
+    return editadas.index[~existe].tolist()
+
+
+def linhas_alteradas(editado, original, colunas):
+    """Máscara das linhas de `editado` que diferem de `original` (mesmo ID) ou são novas."""
+    base = original.set_index(original[COLUNA_ID].astype(str))[colunas].map(_texto)
+    ed = editado.set_index(editado[COLUNA_ID].astype(str))[colunas].map(_texto)
+    conhecidas = ed.index.isin(base.index)
+    diferentes = ed.ne(base.reindex(ed.index)).any(axis=1).to_numpy()
+    return ~conhecidas | diferentes
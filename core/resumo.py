@@ -0,0 +1,84 @@
+import pandas as pd
+
+from core.armazenamento import obter_armazenamento
+from core.cache_snapshots import ABA_RESUMO
+from core.esquema import para_planilha, tipar
+
+# =========================
+# RESUMO AGREGADO POR SNAPSHOT (db_resumo)
+# =========================
+# Formato longo: uma linha por (snapshot, dimensão, valor) com a contagem.
+# Histórico e Comparativo leem estas poucas centenas de linhas em vez de
+# reprocessar os leads brutos do db_snapshots.
+CHAVES = ["snapshot_id", "marca_ref", "semana_ref", "data_salvamento"]
+COLUNAS_RESUMO = CHAVES + ["dimensao", "valor", "qtd"]
+DIMENSOES = ["Status", "Etapa", "Fonte", "Campanha"]
+# Motivo de Perda é contado só entre os leads com Status "Perdido", como nos gráficos
+DIM_MOTIVO = "Motivo de Perda"
+DIM_TOTAL = "Total"
+DIM_SEM_CONTATO = "Sem Contato"
+
+
+def _contar(serie):
+    # Em colunas category o value_counts lista também as categorias sem nenhum lead
+    vc = serie.value_counts()
+    return vc[vc > 0]
+
+
+def _leads_sem_contato(perdidos):
+    if "Etapa" not in perdidos.columns or DIM_MOTIVO not in perdidos.columns: return 0
+    sem_resposta = perdidos[DIM_MOTIVO].astype(str).str.lower().str.contains("sem resposta", na=False)
+    return int(((perdidos["Etapa"] == "Aguardando Resposta") & sem_resposta).sum())
+
+
+def montar_resumo(df, snapshot_id, marca_ref, semana_ref, data_salvamento):
+    """Agrega um snapshot (leads brutos, já com Status) no formato do db_resumo."""
+    partes = [pd.DataFrame({"dimensao": [DIM_TOTAL], "valor": [""], "qtd": [len(df)]})]
+    for dim in DIMENSOES:
+        if dim in df.columns:
+            vc = _contar(df[dim])
+            partes.append(pd.DataFrame({"dimensao": dim, "valor": vc.index.astype(str), "qtd": vc.to_numpy()}))
+
+    perdidos = df[df["Status"] == "Perdido"] if "Status" in df.columns else df.iloc[:0]
+    if DIM_MOTIVO in perdidos.columns:
+        vc = _contar(perdidos[DIM_MOTIVO])
+        partes.append(pd.DataFrame({"dimensao": DIM_MOTIVO, "valor": vc.index.astype(str), "qtd": vc.to_numpy()}))
+    partes.append(pd.DataFrame({"dimensao": [DIM_SEM_CONTATO], "valor": [""], "qtd": [_leads_sem_contato(perdidos)]}))
+
+    resumo = pd.concat(partes, ignore_index=True)
+    resumo.insert(0, "snapshot_id", snapshot_id)
+    resumo.insert(1, "marca_ref", marca_ref)
+    resumo.insert(2, "semana_ref", semana_ref)
+    resumo.insert(3, "data_salvamento", data_salvamento)
+    return resumo[COLUNAS_RESUMO]
+
+
+def resumir_historico(df_hist):
+    """Resumo de todos os snapshots de um db_snapshots bruto (fallback/backfill)."""
+    if df_hist.empty or not set(CHAVES) <= set(df_hist.columns): return pd.DataFrame(columns=COLUNAS_RESUMO)
+    partes = []
+    for chave, grupo in df_hist.groupby(CHAVES, sort=False, observed=True):
+        partes.append(montar_resumo(grupo, *chave))
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUNAS_RESUMO)
+
+
+def salvar_resumo(resumo):
+    """Grava no db_resumo apenas os snapshots que ainda não estão lá (idempotente)."""
+    if resumo.empty: return 0
+    return obter_armazenamento().acrescentar_novos(ABA_RESUMO, para_planilha(resumo), COLUNAS_RESUMO)
+
+
+def carregar_resumo(ttl=None, filtros=None):
+    df = obter_armazenamento().ler(ABA_RESUMO, filtros, ttl)
+    if df.empty: return pd.DataFrame(columns=COLUNAS_RESUMO)
+    return tipar(df)
+
+
+def contagens(resumo, dimensao):
+    """Series valor -> qtd da dimensão, somando os snapshots presentes em `resumo`."""
+    sel = resumo[resumo["dimensao"] == dimensao]
+    return sel.groupby(sel["valor"].astype(str), sort=False)["qtd"].sum().sort_values(ascending=False)
+
+
+def total(resumo, dimensao=DIM_TOTAL):
+    return int(resumo.loc[resumo["dimensao"] == dimensao, "qtd"].sum())
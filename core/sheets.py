@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+
+from core.agendador import executar
+from core.medicao import etapa, registrar_chamada
+
+# =========================
+# UTILITÁRIOS DO GOOGLE SHEETS
+# =========================
+PLANILHA_NOME = "BI_Historico"
+ESCOPO = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+
+def com_retry(func, *args, tentativas=5, espera_base=1.0, espera_max=32.0, **kwargs):
+    """Executa func pelo agendador: cota por minuto, leituras iguais coalescidas e
+    backoff exponencial + jitter em erros transitórios (append só repete em 429;
+    ver core.agendador)."""
+    return executar(func, *args, tentativas=tentativas, espera_base=espera_base, espera_max=espera_max, **kwargs)
+
+
+# =========================
+# CONEXÃO COMPARTILHADA (POR PROCESSO)
+# =========================
+# Um único client autorizado e os handles de planilha/aba já abertos são
+# reaproveitados por todas as páginas e sessões do servidor Streamlit.
+_lock = threading.RLock()
+_pool = {"client": None, "creds": None, "planilhas": {}, "abas": {}}
+CONTADORES = {"autenticacoes": 0, "autenticacoes_poupadas": 0, "aberturas": 0, "aberturas_poupadas": 0}
+
+
+def _ler_credenciais():
+    creds_json = os.environ.get("gcp_service_account")
+    if not creds_json:
+        try:
+            import streamlit as st
+            creds_json = st.secrets.get("gcp_service_account")
+        except Exception:
+            creds_json = None
+    return creds_json
+
+
+def _autorizar():
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    creds_json = _ler_credenciais()
+    if creds_json:
+        creds = ServiceAccountCredentials.from_json_keyfile_dict(json.loads(creds_json), ESCOPO)
+    else:
+        creds = ServiceAccountCredentials.from_json_keyfile_name("credentials.json", ESCOPO)
+    return gspread.authorize(creds), creds
+
+
+def _contar_resposta(resposta, *args, **kwargs):
+    # Hook de resposta do requests: toda chamada HTTP ao Google entra na medição do rerun
+    tamanho = resposta.headers.get("Content-Length")
+    registrar_chamada(int(tamanho) if tamanho else len(resposta.content or b""))
+
+
+def _instrumentar(client):
+    # gspread 6 guarda a sessão em client.http_client; o 5, no próprio client
+    sessao = getattr(getattr(client, "http_client", client), "session", None)
+    hooks = getattr(sessao, "hooks", None)
+    if hooks is not None and _contar_resposta not in hooks.setdefault("response", []):
+        hooks["response"].append(_contar_resposta)
+
+
+def _token_expirado(creds):
+    return bool(getattr(creds, "access_token_expired", False))
+
+
+def obter_cliente():
+    """Client gspread compartilhado; reautoriza sozinho quando o token expira. None se falhar."""
+    with _lock:
+        if _pool["client"] is not None and not _token_expirado(_pool["creds"]):
+            CONTADORES["autenticacoes_poupadas"] += 1
+            return _pool["client"]
+        try:
+            with etapa("autenticacao"):
+                client, creds = _autorizar()
+        except Exception:
+            return None
+        _instrumentar(client)
+        _pool.update(client=client, creds=creds, planilhas={}, abas={})
+        CONTADORES["autenticacoes"] += 1
+        return client
+
+
+def abrir_planilha(nome=PLANILHA_NOME):
+    client = obter_cliente()
+    if client is None:
+        raise RuntimeError("Sem conexão com o Google Sheets")
+    with _lock:
+        sh = _pool["planilhas"].get(nome)
+        if sh is not None:
+            CONTADORES["aberturas_poupadas"] += 1
+            return sh
+        sh = com_retry(client.open, nome)
+        _pool["planilhas"][nome] = sh
+        CONTADORES["aberturas"] += 1
+        return sh
+
+
+def abrir_aba(nome_aba, planilha=PLANILHA_NOME, criar=None, cabecalho=None):
+    """Worksheet em cache. Com criar=(linhas, colunas), cria a aba se não existir
+    (e grava `cabecalho` nela, se informado)."""
+    sh = abrir_planilha(planilha)
+    chave = (planilha, nome_aba)
+    with _lock:
+        ws = _pool["abas"].get(chave)
+        if ws is not None:
+            CONTADORES["aberturas_poupadas"] += 1
+            return ws
+        import gspread
+        try:
+            ws = com_retry(sh.worksheet, nome_aba)
+        except gspread.exceptions.WorksheetNotFound:
+            if not criar: raise
+            ws = com_retry(sh.add_worksheet, title=nome_aba, rows=criar[0], cols=criar[1])
+            if cabecalho: com_retry(ws.append_row, cabecalho)
+        _pool["abas"][chave] = ws
+        CONTADORES["aberturas"] += 1
+        return ws
+
+
+def resetar_conexao():
+    """Descarta client e handles (ex.: aba apagada/renomeada na planilha)."""
+    with _lock:
+        _pool.update(client=None, creds=None, planilhas={}, abas={})
+
+
+def _com_aba(nome_aba, intervalo):
+    # "A2:H5" -> "'previsao_ativa'!A2:H5" (aspas simples escapadas dobrando)
+    return "'{}'!{}".format(nome_aba.replace("'", "''"), intervalo)
+
+
+def gravar_em_lote(operacoes_por_aba, planilha=PLANILHA_NOME):
+    """Envia as operações de várias abas ({aba: [{"range", "values"}]}) num único
+    values_batch_update: uma ida à API, e a planilha aplica tudo ou nada."""
+    dados = [{"range": _com_aba(aba, op["range"]), "values": op["values"]}
+             for aba, operacoes in operacoes_por_aba.items() for op in operacoes]
+    if not dados: return None
+    sh = abrir_planilha(planilha)
+    with etapa("values_batch_update", linhas=sum(len(d["values"]) for d in dados)):
+        return com_retry(sh.values_batch_update, {"valueInputOption": "RAW", "data": dados})
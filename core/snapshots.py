@@ -0,0 +1,85 @@
+import time
+from collections import Counter
+
+from core.agendador import CotaEsgotada, erro_transitorio
+from core.sheets import com_retry
+
+# =========================
+# GRAVAÇÃO DE SNAPSHOTS NO db_snapshots
+# =========================
+LINHAS_POR_ENVIO = 5000
+# Falhas seguidas sem nenhuma linha nova na planilha antes de desistir do save
+TENTATIVAS = 5
+ESPERA_BASE = 1.0
+ESPERA_MAX = 32.0
+
+
+def _garantir_cabecalho(ws, colunas):
+    # Lê só a linha 1, em vez da aba inteira, para saber se está vazia
+    header = [h.strip() for h in com_retry(ws.row_values, 1)]
+    if not header:
+        com_retry(ws.append_row, colunas)
+        return list(colunas)
+    extras = [c for c in colunas if c not in header]
+    if extras:
+        # Colunas novas vão para o fim do cabeçalho, sem desalinhar o que já foi salvo
+        header = header + extras
+        if ws.col_count < len(header):
+            com_retry(ws.add_cols, len(header) - ws.col_count)
+        com_retry(ws.update, values=[header], range_name="A1")
+    return header
+
+
+def _linhas_ja_salvas(ws, header):
+    # snapshot_id -> quantas linhas dele já estão na planilha (uma leitura de coluna)
+    if "snapshot_id" not in header: return Counter()
+    coluna = com_retry(ws.col_values, header.index("snapshot_id") + 1)
+    return Counter(coluna[1:])
+
+
+def salvar_snapshots(ws, lotes, linhas_por_envio=LINHAS_POR_ENVIO, progresso=None):
+    """Envia vários snapshots ({snapshot_id: df}) num só fluxo de blocos, de forma idempotente.
+
+    Cabeçalho e contagem das linhas já salvas são lidos uma vez para o lote todo, e
+    os blocos de append_rows misturam snapshots. As linhas que já estão na planilha
+    com o mesmo snapshot_id são puladas, então repetir o save (duplo clique ou
+    retomada após falha) só completa o que faltou.
+    Retorna quantas linhas foram enviadas nesta chamada.
+    """
+    colunas = list(dict.fromkeys(c for df in lotes.values() for c in df.columns))
+    header = _garantir_cabecalho(ws, colunas)
+    linhas = {str(sid): df.reindex(columns=header, fill_value="").astype(str).values.tolist() for sid, df in lotes.items()}
+    total = sum(map(len, linhas.values()))
+    salvas = lambda contagem: sum(min(contagem[sid], len(ls)) for sid, ls in linhas.items())
+    pendentes = lambda contagem: [l for sid, ls in linhas.items() for l in ls[contagem[sid]:]]
+
+    contagem = _linhas_ja_salvas(ws, header)
+    inicio = base = salvas(contagem)
+    fila, i, falhas = pendentes(contagem), 0, 0
+    while i < len(fila):
+        bloco = fila[i:i + linhas_por_envio]
+        try:
+            # Uma tentativa por envio: o bloco pode ter entrado apesar do erro, e reenviá-lo
+            # às cegas duplicaria linhas (e a contagem pularia outras). A retomada abaixo
+            # é o único caminho de repetição.
+            com_retry(ws.append_rows, bloco, value_input_option="RAW", tentativas=1)
+        except Exception as e:
+            contagem = _linhas_ja_salvas(ws, header)
+            if salvas(contagem) == base + i:
+                # Nada entrou: espera e tenta de novo se o erro for passageiro
+                falhas += 1
+                if falhas >= TENTATIVAS or not (erro_transitorio(e) or isinstance(e, CotaEsgotada)): raise
+                time.sleep(min(ESPERA_MAX, ESPERA_BASE * 2 ** (falhas - 1)))
+            else:
+                falhas = 0
+            base, fila, i = salvas(contagem), pendentes(contagem), 0
+            continue
+        falhas = 0
+        i += len(bloco)
+        if progresso: progresso(base + i, total)
+    return base + i - inicio
+
+
+def salvar_snapshot(ws, df_save, snapshot_id, linhas_por_envio=LINHAS_POR_ENVIO, progresso=None):
+    """Um snapshot só (ver salvar_snapshots)."""
+    return salvar_snapshots(ws, {snapshot_id: df_save}, linhas_por_envio, progresso)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+# =========================
+# REGRAS DE STATUS DO LEAD
+# =========================
+ETAPAS_GANHO = ["faturado", "ganho", "venda"]
+
+# Valores de "Motivo de Perda" que significam "sem motivo" (lead não perdido)
+MOTIVOS_VAZIOS = ("", "nan", "none", "-", "0", "nada", "n/a")
+
+
+def _mascara_texto(serie, regra):
+    # Aplica a regra apenas nos valores distintos e expande pelos códigos:
+    # as colunas do RD têm poucas categorias, então o custo vira O(únicos).
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    texto = pd.Series(np.asarray(unicos, dtype=object)).astype(str)
+    return regra(texto).to_numpy(dtype=bool)[codigos]
+
+
+def classificar_status(df, motivos_vazios=MOTIVOS_VAZIOS, usar_estado=True):
+    """Retorna uma Series com "Ganho", "Perdido" ou "Em Andamento" por lead.
+
+    Equivale às antigas funções aplicadas com df.apply(axis=1):
+    Estado "perdida" > Etapa de ganho > Motivo de Perda preenchido.
+    """
+    n = len(df)
+    vazio = np.zeros(n, dtype=bool)
+
+    if usar_estado and "Estado" in df.columns:
+        perdida = _mascara_texto(df["Estado"], lambda s: s.str.lower() == "perdida")
+    else:
+        perdida = vazio
+
+    if "Etapa" in df.columns:
+        ganho = _mascara_texto(df["Etapa"], lambda s: s.str.lower().str.contains("|".join(ETAPAS_GANHO), regex=True))
+    else:
+        ganho = vazio
+
+    if "Motivo de Perda" in df.columns:
+        vazios = set(motivos_vazios)
+        com_motivo = _mascara_texto(df["Motivo de Perda"], lambda s: ~s.str.strip().str.lower().isin(vazios))
+    else:
+        # str(row.get("Motivo de Perda", "")) -> "" -> sem motivo
+        com_motivo = vazio
+
+    status = np.select([perdida, ganho, com_motivo], ["Perdido", "Ganho", "Perdido"], default="Em Andamento")
+    return pd.Series(status, index=df.index, dtype=object)
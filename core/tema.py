@@ -0,0 +1,35 @@
+import functools
+import os
+
+import streamlit as st
+
+# =========================
+# TEMA VISUAL (CSS LOCAL)
+# =========================
+PASTA_CSS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "css")
+PASTA_FONTES = os.path.join(os.path.dirname(PASTA_CSS), "fonts")
+FONTES = ("Orbitron", "Rajdhani")
+# Sem os .woff2 em static/fonts o @font-face local daria 404 (e não cai para outra
+# regra da mesma família): até lá, valem as fontes de sistema de --fonte-* (base.css)
+
+
+def _ler(nome):
+    with open(os.path.join(PASTA_CSS, f"{nome}.css"), encoding="utf-8") as f:
+        return f.read()
+
+
+def _fontes():
+    if all(os.path.exists(os.path.join(PASTA_FONTES, f"{fonte}.woff2")) for fonte in FONTES):
+        return _ler("fontes")
+    return ""
+
+
+@functools.lru_cache(maxsize=None)
+def _bloco_css(pagina):
+    # Lido do disco uma vez por processo; nos reruns só reenviamos a string pronta
+    partes = [_fontes(), _ler("base"), _ler(pagina)]
+    return "<style>\n" + "\n".join(p for p in partes if p) + "</style>"
+
+
+def aplicar_tema(pagina):
+    st.markdown(_bloco_css(pagina), unsafe_allow_html=True)
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from core.funil import funil_acumulado_em_lote, funil_da_marca
+from core.resumo import CHAVES, DIM_TOTAL
+
+# =========================
+# TENDÊNCIAS ENTRE SNAPSHOTS
+# =========================
+# Tudo sai de um único groupby do db_resumo por (snapshot, dimensão, valor):
+# uma linha por snapshot, sem laço por snapshot.
+KPIS = {"Leads Totais": (DIM_TOTAL, ""), "Em Andamento": ("Status", "Em Andamento"),
+        "Perdidos": ("Status", "Perdido"), "Ganhos": ("Status", "Ganho")}
+TOP_FONTES = 5
+
+
+def contagens_por_snapshot(resumo, dimensoes=(DIM_TOTAL, "Status", "Etapa", "Fonte")):
+    """Frame largo: uma linha por snapshot_id, colunas (dimensão, valor) com a qtd."""
+    sel = resumo[resumo["dimensao"].astype(str).isin(dimensoes)]
+    return (sel.groupby(["snapshot_id", sel["dimensao"].astype(str), sel["valor"].astype(str).rename("valor")],
+                        observed=True)["qtd"].sum()
+            .unstack(["dimensao", "valor"], fill_value=0))
+
+
+def _bloco(largo, dimensao):
+    if dimensao in largo.columns.get_level_values(0):
+        return largo[dimensao]
+    return pd.DataFrame(index=largo.index)
+
+
+def tendencias(resumo, top_fontes=TOP_FONTES, ignorar_caixa=True):
+    """KPIs, funil acumulado e fontes de todos os snapshots do resumo.
+
+    Retorna (kpis, funil, fontes), todos indexados por snapshot_id e com as
+    referências (marca_ref, semana_ref, data_salvamento), em ordem de data.
+    O funil usa as etapas de cada marca (um cálculo em lote por marca).
+    """
+    if resumo.empty:
+        vazio = pd.DataFrame(columns=CHAVES[1:])
+        return vazio, vazio, vazio
+    refs = resumo.drop_duplicates("snapshot_id").set_index("snapshot_id")[CHAVES[1:]]
+    largo = contagens_por_snapshot(resumo).reindex(refs.index, fill_value=0)
+
+    kpis = pd.DataFrame({nome: largo[chave] if chave in largo.columns else 0 for nome, chave in KPIS.items()},
+                        index=largo.index).astype(int)
+
+    etapas = _bloco(largo, "Etapa")
+    marcas = refs["marca_ref"].astype(str)
+    funil = pd.concat([funil_acumulado_em_lote(etapas[marcas == marca], funil_da_marca(marca), ignorar_caixa)
+                       for marca in marcas.unique()])
+
+    fontes = _bloco(largo, "Fonte")
+    fontes = fontes[fontes.sum().nlargest(top_fontes).index] if len(fontes.columns) else fontes
+
+    ordem = refs.sort_values(["data_salvamento", "marca_ref"]).index
+    return tuple(refs.loc[ordem].join(df.reindex(ordem)) for df in (kpis, funil, fontes))
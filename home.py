@@ -1,70 +1,28 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import json
-import os
+import hashlib
 from datetime import datetime
-import io
+from core.aquecimento import iniciar_aquecimento
+from core.armazenamento import obter_armazenamento
+from core.graficos import aparar_cauda, figura
+from core.esquema import FORMATO_SNAPSHOT_ID
+from core.ingestao import load_csv, processar, processar_em_lote
+from core.medicao import etapa, iniciar, medido, painel_debug
+from core.resumo import montar_resumo, salvar_resumo
+from core.painel import agregar_painel
+from core.tema import aplicar_tema
 
 # =========================
 # CONFIGURAÇÃO DA PÁGINA
 # =========================
 st.set_page_config(page_title="BI CRM Expansão", layout="wide")
+iniciar("home")
+iniciar_aquecimento()  # só com BI_CRM_AQUECER=1; uma vez por processo
 
 # =========================
-# ESTILIZAÇÃO CSS (COMPLETA)
+# ESTILIZAÇÃO CSS (static/css/home.css)
 # =========================
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@400;500;700;900&family=Rajdhani:wght@500;700&display=swap');
-.stApp { background-color: #0b0f1a; color: #e0e0e0; }
-.futuristic-title {
-    font-family: 'Orbitron', sans-serif; font-size: 56px; font-weight: 900; text-transform: uppercase;
-    background: linear-gradient(90deg, #22d3ee 0%, #818cf8 50%, #c084fc 100%);
-    -webkit-background-clip: text; -webkit-text-fill-color: transparent;
-    letter-spacing: 3px; margin-bottom: 10px; text-shadow: 0 0 30px rgba(34, 211, 238, 0.3);
-}
-.futuristic-sub {
-    font-family: 'Rajdhani', sans-serif; font-size: 24px; font-weight: 700; text-transform: uppercase;
-    color: #e2e8f0; letter-spacing: 2px; border-bottom: 1px solid #1e293b;
-    padding-bottom: 8px; margin-top: 30px; margin-bottom: 20px; display: flex; align-items: center;
-}
-.sub-icon { margin-right: 12px; font-size: 24px; color: #22d3ee; text-shadow: 0 0 10px rgba(34, 211, 238, 0.6); }
-.profile-header {
-    background: linear-gradient(90deg, #1e293b 0%, #0f172a 100%);
-    border-left: 5px solid #6366f1; border-radius: 8px; padding: 20px 30px;
-    margin-bottom: 15px; margin-top: 10px; display: flex; align-items: center; justify-content: space-between;
-    box-shadow: 0 4px 15px rgba(0,0,0,0.3);
-}
-.profile-group { display: flex; flex-direction: column; }
-.profile-label { color: #94a3b8; font-family: 'Rajdhani', sans-serif; font-size: 13px; text-transform: uppercase; letter-spacing: 1.5px; margin-bottom: 4px; }
-.profile-value { color: #f8fafc; font-size: 24px; font-weight: 600; font-family: 'Rajdhani', sans-serif; }
-.profile-divider { width: 1px; height: 40px; background-color: #334155; margin: 0 20px; }
-.card {
-    background: linear-gradient(135deg, #111827, #020617);
-    padding: 24px; border-radius: 16px; border: 1px solid #1e293b; text-align: center;
-    box-shadow: 0 0 15px rgba(56,189,248,0.05); transition: all 0.3s ease; height: 100%;
-}
-.card:hover { box-shadow: 0 0 25px rgba(56,189,248,0.2); border-color: #38bdf8; transform: translateY(-2px); }
-.card-title {
-    font-family: 'Rajdhani', sans-serif; font-size: 14px; font-weight: 600; color: #94a3b8;
-    text-transform: uppercase; letter-spacing: 1.5px; margin-bottom: 8px; min-height: 30px; display: flex; align-items: center; justify-content: center;
-}
-.card-value {
-    font-family: 'Orbitron', sans-serif; font-size: 36px; font-weight: 700;
-    background: -webkit-linear-gradient(45deg, #38bdf8, #818cf8); -webkit-background-clip: text; -webkit-text-fill-color: transparent;
-}
-.top-item {
-    border-left: 3px solid #22d3ee; padding: 12px 15px; margin-bottom: 8px; border-radius: 0 8px 8px 0; display: flex; align-items: center; justify-content: space-between;
-    transition: transform 0.2s; border: 1px solid rgba(34, 211, 238, 0.1); border-left-width: 3px; background: rgba(30, 41, 59, 0.5);
-}
-.top-rank { font-family: 'Orbitron', sans-serif; font-weight: 900; color: #22d3ee; font-size: 16px; margin-right: 12px; }
-.top-name { font-family: 'Rajdhani', sans-serif; color: #f1f5f9; font-weight: 600; font-size: 14px; flex-grow: 1; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
-.top-val-abs { font-family: 'Orbitron', sans-serif; color: #fff; font-weight: bold; font-size: 14px; margin-left: 10px; }
-</style>
-""", unsafe_allow_html=True)
+aplicar_tema("home")
 
 # =========================
 # CONSTANTES & CONEXÃO
@@ -76,149 +34,251 @@ MOTIVOS_PERDA_MESTRADOS = [
     "Dados Inválidos", "Região Indisponível", "Sócio não aprovou"
 ]
 
-def conectar_google():
-    try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds_json = os.environ.get("gcp_service_account") or st.secrets.get("gcp_service_account")
-        if not creds_json:
-             creds = ServiceAccountCredentials.from_json_keyfile_name("credentials.json", scope)
-             return gspread.authorize(creds)
-        creds_dict = json.loads(creds_json)
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        return gspread.authorize(creds)
-    except Exception as e:
-        return None
-
 def card(title, value):
     st.markdown(f'<div class="card"><div class="card-title">{title}</div><div class="card-value">{value}</div></div>', unsafe_allow_html=True)
 
 def subheader_futurista(icon, text):
     st.markdown(f'<div class="futuristic-sub"><span class="sub-icon">{icon}</span>{text}</div>', unsafe_allow_html=True)
 
-def load_csv(file):
-    raw = file.read().decode("latin-1", errors="ignore")
-    if raw.strip().startswith("sep="):
-        raw = "\n".join(raw.splitlines()[1:])
-    sep = ";" if raw.count(";") > raw.count(",") else ","
-    return pd.read_csv(io.StringIO(raw), sep=sep, engine="python", on_bad_lines="skip")
-
-def processar(df):
-    df.columns = df.columns.str.strip()
-    df = df.loc[:, ~df.columns.duplicated()]
-    cols_map = {}
-    for c in df.columns:
-        c_lower = str(c).lower()
-        if "fonte" in c_lower and "utm" not in c_lower: cols_map[c] = "Fonte"
-        elif "data de cri" in c_lower: cols_map[c] = "Data de Criação"
-        elif "respons" in c_lower and "equipe" not in c_lower: cols_map[c] = "Responsável"
-        elif "equipes do respons" in c_lower or "equipe" in c_lower: cols_map[c] = "Equipe"
-        elif "motivo de perda" in c_lower: cols_map[c] = "Motivo de Perda"
-        elif "etapa" in c_lower: cols_map[c] = "Etapa"
-        elif "campanha" in c_lower: cols_map[c] = "Campanha"
-        elif c_lower == "estado": cols_map[c] = "Estado"
-
-    df = df.rename(columns=cols_map)
-    df = df.loc[:, ~df.columns.duplicated()]
-
-    colunas_texto = ["Responsável", "Equipe", "Etapa", "Motivo de Perda", "Fonte", "Campanha", "Estado"]
-    for col in colunas_texto:
-        if col in df.columns:
-            if isinstance(df[col], pd.DataFrame): df[col] = df[col].iloc[:, 0]
-            df[col] = df[col].astype(str).str.replace("ExpansÃ£o", "Expansão").str.replace("responsÃ¡vel", "responsável").fillna("N/A").str.strip()
-        else:
-            df[col] = "N/A"
-
-    if "Data de Criação" in df.columns:
-        df["Data de Criação"] = pd.to_datetime(df["Data de Criação"], dayfirst=True, errors='coerce')
-    
-    def status_func(row):
-        estado_lower = str(row.get("Estado", "")).lower()
-        if estado_lower == "perdida": return "Perdido"
-        etapa_lower = str(row["Etapa"]).lower()
-        if any(x in etapa_lower for x in ["faturado", "ganho", "venda"]): return "Ganho"
-        motivo = str(row["Motivo de Perda"]).strip().lower()
-        if motivo not in ["", "nan", "none", "-", "0", "nada"]: return "Perdido"
-        return "Em Andamento"
-        
-    df["Status"] = df.apply(status_func, axis=1)
-    return df
+# =========================
+# GRÁFICOS (memoizados em core.graficos pela impressão dos dados)
+# =========================
+def grafico_fontes(fontes):
+    import plotly.express as px  # carregado só quando há gráfico para desenhar
+    fig_pie = px.pie(aparar_cauda(fontes, "Fonte", "Qtd"), values='Qtd', names='Fonte', hole=0.6, 
+                     color_discrete_sequence=['#22d3ee', '#06b6d4', '#0891b2', '#1e293b'])
+    fig_pie.update_traces(textposition='inside', textinfo='label+value')
+    fig_pie.update_layout(template="plotly_dark", showlegend=False, paper_bgcolor="rgba(0,0,0,0)")
+    return fig_pie
+
+def grafico_funil(df_funil, funil_labels):
+    import plotly.express as px
+    fig_funil = px.bar(df_funil, y="Etapa", x="Quantidade", text="Label", orientation="h", color="Quantidade", color_continuous_scale="Blues")
+    fig_funil.update_layout(template="plotly_dark", showlegend=False, paper_bgcolor="rgba(0,0,0,0)", yaxis={'categoryorder':'array', 'categoryarray':funil_labels[::-1]})
+    return fig_funil
+
+def grafico_perdas(df_loss):
+    import plotly.express as px
+    fig_loss = px.bar(df_loss, x="Qtd", y="Motivo", text="Label_Text", orientation="h", color="Motivo", color_discrete_map=dict(zip(df_loss['Motivo'], df_loss['color'])))
+    fig_loss.update_layout(template="plotly_dark", showlegend=False, paper_bgcolor="rgba(0,0,0,0)", yaxis=dict(autorange="reversed"))
+    return fig_loss
 
 # =========================
 # DASHBOARD LOGIC
 # =========================
-def render_dashboard(df, marca):
-    total = len(df)
-    perdidos = df[df["Status"] == "Perdido"]
-    em_andamento = df[df["Status"] == "Em Andamento"]
-    
+# Cada seção é um fragmento: um rerun disparado dentro dela (interação com o
+# gráfico, widget da seção) redesenha só a seção, não o script inteiro
+@st.fragment
+def secao_kpis(painel):
     c1, c2 = st.columns(2)
-    with c1: card("Leads Totais", total)
-    with c2: card("Leads em Andamento", len(em_andamento))
+    with c1: card("Leads Totais", painel["total"])
+    with c2: card("Leads em Andamento", painel["em_andamento"])
+
+@st.fragment
+def secao_marketing(painel):
+    subheader_futurista("📡", "MARKETING & FONTES")
+    if painel["fontes"] is not None:
+        st.plotly_chart(figura(grafico_fontes, painel["fontes"]), use_container_width=True)
+
+    if painel["top_campanhas"] is not None:
+        st.markdown('<div class="futuristic-sub" style="font-size:18px; margin-top:20px; border:none;"><span class="sub-icon">🚀</span>TOP 3 CAMPANHAS</div>', unsafe_allow_html=True)
+        top3_c = painel["top_campanhas"]
+        if not top3_c.empty:
+            for i, row in top3_c.iterrows():
+                st.markdown(f"""<div class="top-item"><span class="top-rank">#{i+1}</span><span class="top-name">{row.iloc[0]}</span><span class="top-val-abs">{row.iloc[1]}</span></div>""", unsafe_allow_html=True)
+
+@st.fragment
+def secao_funil(painel):
+    subheader_futurista("📉", "DESCIDA DE FUNIL (ACUMULADO)")
+    st.plotly_chart(figura(grafico_funil, painel["funil"], painel["funil_labels"]), use_container_width=True)
+
+    c_fun1, c_fun2 = st.columns(2)
+    with c_fun1: card("Reunião Realizada (+)", painel["reuniao_realizada"])
+    with c_fun2: card("Leads sem contato", painel["sem_contato"])
+
+@st.fragment
+def secao_perdas(painel):
+    subheader_futurista("🚫", "DETALHE DAS PERDAS (MOTIVOS)")
+    st.plotly_chart(figura(grafico_perdas, painel["perdas"]), use_container_width=True)
+
+    k1, k2 = st.columns(2)
+    with k1: card("Total Perdido", painel["perdidos"])
+    with k2: card("Leads sem contato", painel["sem_contato"])
+
+@medido("dashboard")
+def render_dashboard(df, marca):
+    with etapa("agregacao", linhas=len(df)):
+        painel = agregar_painel(df, marca, MOTIVOS_PERDA_MESTRADOS)
+
+    secao_kpis(painel)
     st.divider()
 
     col_mkt, col_funil = st.columns(2)
-    with col_mkt:
-        subheader_futurista("📡", "MARKETING & FONTES")
-        if "Fonte" in df.columns:
-            df_fonte = df["Fonte"].value_counts().reset_index()
-            df_fonte.columns = ["Fonte", "Qtd"]
-            fig_pie = px.pie(df_fonte, values='Qtd', names='Fonte', hole=0.6, 
-                             color_discrete_sequence=['#22d3ee', '#06b6d4', '#0891b2', '#1e293b'])
-            fig_pie.update_traces(textposition='inside', textinfo='label+value')
-            fig_pie.update_layout(template="plotly_dark", showlegend=False, paper_bgcolor="rgba(0,0,0,0)")
-            st.plotly_chart(fig_pie, use_container_width=True)
-
-        if "Campanha" in df.columns:
-            st.markdown('<div class="futuristic-sub" style="font-size:18px; margin-top:20px; border:none;"><span class="sub-icon">🚀</span>TOP 3 CAMPANHAS</div>', unsafe_allow_html=True)
-            df_camp = df[df["Campanha"] != "N/A"]["Campanha"].value_counts().reset_index()
-            top3_c = df_camp.head(3)
-            if not top3_c.empty:
-                for i, row in top3_c.iterrows():
-                    st.markdown(f"""<div class="top-item"><span class="top-rank">#{i+1}</span><span class="top-name">{row.iloc[0]}</span><span class="top-val-abs">{row.iloc[1]}</span></div>""", unsafe_allow_html=True)
-
-    with col_funil:
-        subheader_futurista("📉", "DESCIDA DE FUNIL (ACUMULADO)")
-        ordem_funil = ["Confirmou Interesse", "Qualificado", "Reunião Agendada", "Reunião Realizada", "negociação", "em aprovação", "faturado"]
-        funil_labels = ["TOTAL DE LEADS"]
-        funil_values = [total]
-        
-        for etapa in ordem_funil:
-            idx = ordem_funil.index(etapa)
-            etapas_alvo = ordem_funil[idx:]
-            qtd = len(df[df["Etapa"].isin(etapas_alvo)])
-            funil_labels.append(etapa.upper())
-            funil_values.append(qtd)
-
-        df_plot = pd.DataFrame({"Etapa": funil_labels, "Quantidade": funil_values})
-        df_plot["Percentual"] = (df_plot["Quantidade"] / total * 100).round(1) if total > 0 else 0
-        df_plot["Label"] = df_plot.apply(lambda x: f"{int(x['Quantidade'])} ({x['Percentual']}%)", axis=1)
-        fig_funil = px.bar(df_plot, y="Etapa", x="Quantidade", text="Label", orientation="h", color="Quantidade", color_continuous_scale="Blues")
-        fig_funil.update_layout(template="plotly_dark", showlegend=False, paper_bgcolor="rgba(0,0,0,0)", yaxis={'categoryorder':'array', 'categoryarray':funil_labels[::-1]})
-        st.plotly_chart(fig_funil, use_container_width=True)
-        
-        c_fun1, c_fun2 = st.columns(2)
-        reuniao_realizada_plus = len(df[df["Etapa"].isin(["Reunião Realizada", "negociação", "em aprovação", "faturado"])])
-        leads_sem_contato_count = len(perdidos[(perdidos["Etapa"] == "Aguardando Resposta") & (perdidos["Motivo de Perda"].str.lower().str.contains("sem resposta", na=False))])
-        with c_fun1: card("Reunião Realizada (+)", reuniao_realizada_plus)
-        with c_fun2: card("Leads sem contato", leads_sem_contato_count)
+    with col_mkt: secao_marketing(painel)
+    with col_funil: secao_funil(painel)
 
     st.divider()
-    subheader_futurista("🚫", "DETALHE DAS PERDAS (MOTIVOS)")
-    motivos_reais = perdidos["Motivo de Perda"].unique()
-    lista_final_grafico = list(set(motivos_reais) | set(MOTIVOS_PERDA_MESTRADOS))
-    df_loss = perdidos["Motivo de Perda"].value_counts().reindex(lista_final_grafico, fill_value=0).reset_index()
-    df_loss.columns = ["Motivo", "Qtd"]
-    df_loss = df_loss.sort_values(by="Qtd", ascending=False)
-    df_loss["Perc"] = (df_loss["Qtd"] / total * 100).round(1) if total > 0 else 0
-    df_loss["Label_Text"] = df_loss.apply(lambda x: f"{int(x['Qtd'])} ({x['Perc']}%)", axis=1)
-    df_loss['color'] = df_loss['Motivo'].apply(lambda x: '#10b981' if 'sem resposta' in str(x).lower() else '#334155')
-    fig_loss = px.bar(df_loss, x="Qtd", y="Motivo", text="Label_Text", orientation="h", color="Motivo", color_discrete_map=dict(zip(df_loss['Motivo'], df_loss['color'])))
-    fig_loss.update_layout(template="plotly_dark", showlegend=False, paper_bgcolor="rgba(0,0,0,0)", yaxis=dict(autorange="reversed"))
-    st.plotly_chart(fig_loss, use_container_width=True)
-    
-    k1, k2 = st.columns(2)
-    with k1: card("Total Perdido", len(perdidos))
-    with k2: card("Leads sem contato", leads_sem_contato_count)
+    secao_perdas(painel)
+
+# =========================
+# UPLOAD E SALVAMENTO
+# =========================
+def carregar_upload(arquivo):
+    """(hash do conteúdo, frame processado), parseado uma vez por upload e guardado na sessão.
+
+    Trocar marca/semana ou clicar em salvar reroda o script, mas não relê o CSV.
+    """
+    cache = st.session_state.get("upload")
+    file_id = getattr(arquivo, "file_id", None)
+    if cache is not None and file_id is not None and cache["file_id"] == file_id:
+        return cache["hash"], cache["df"]
+    hash_arquivo = hashlib.md5(arquivo.getvalue()).hexdigest()
+    if cache is None or cache["hash"] != hash_arquivo:
+        with etapa("load_csv", bytes=arquivo.size) as registro:
+            df = load_csv(arquivo)
+            registro["linhas"] = len(df)
+        with etapa("processar", linhas=len(df)):
+            df = processar(df)
+        # Só um upload por sessão: o anterior sai junto com a troca
+        cache = {"hash": hash_arquivo, "df": df}
+    cache["file_id"] = file_id
+    st.session_state["upload"] = cache
+    return cache["hash"], cache["df"]
+
+@st.fragment
+def painel_salvar(df, marca_sel, semana_sel):
+    # Fragmento: o clique reroda só este bloco, sem redesenhar o dashboard
+    if st.button(f"🚀 SALVAR HISTÓRICO: {semana_sel}"):
+        try:
+            snapshot_id = st.session_state["snapshot_id"]
+            df_save = df.copy()
+            df_save['snapshot_id'] = snapshot_id
+            df_save['data_salvamento'] = st.session_state["snapshot_data"]
+            df_save['semana_ref'] = semana_sel
+            df_save['marca_ref'] = marca_sel
+        
+            # Cabeçalho checado pela linha 1; envio em blocos com retry/backoff
+            barra = st.progress(0.0, text="Enviando snapshot...")
+            with etapa("salvar snapshot", linhas=len(df_save)):
+                enviadas = obter_armazenamento().salvar_snapshot(df_save, snapshot_id, progresso=lambda feito, total: barra.progress(feito / total, text=f"Enviando snapshot... {feito}/{total}"))
+            barra.empty()
+            # Resumo agregado do snapshot para Histórico/Comparativo (poucas linhas)
+            salvar_resumo(montar_resumo(df, snapshot_id, marca_sel, semana_sel, st.session_state["snapshot_data"]))
+            if enviadas:
+                st.success("Snapshot e Cabeçalhos salvos com sucesso!")
+            else:
+                st.info("Este snapshot já estava salvo por completo.")
+        except Exception as e:
+            st.error(f"Erro ao salvar: {e}")
+
+# =========================
+# CARGA EM LOTE (VÁRIOS EXPORTS / MARCAS)
+# =========================
+def hash_upload(arquivo):
+    # Um MD5 por upload (file_id) na sessão: reruns não re-hasheiam arquivos grandes
+    hashes = st.session_state.setdefault("hash_upload", {})
+    file_id = getattr(arquivo, "file_id", None) or arquivo.name
+    if file_id not in hashes:
+        hashes[file_id] = hashlib.md5(arquivo.getvalue()).hexdigest()
+    return hashes[file_id]
+
+def carregar_lote(arquivos):
+    """[(arquivo, hash, frame)] do lote; só os arquivos ainda não vistos vão para o pool de processos."""
+    cache = st.session_state.get("upload_lote", {})
+    por_hash = {hash_upload(a): a for a in arquivos}  # o mesmo conteúdo enviado duas vezes conta uma
+    novos = [h for h in por_hash if h not in cache]
+    if novos:
+        with etapa("processar lote", bytes=sum(por_hash[h].size for h in novos)) as registro:
+            frames = processar_em_lote([por_hash[h].getvalue() for h in novos])
+            registro["linhas"] = sum(map(len, frames))
+        cache.update(zip(novos, frames))
+    # Arquivos tirados do uploader saem da sessão
+    st.session_state["upload_lote"] = {h: cache[h] for h in por_hash}
+    st.session_state["hash_upload"] = {i: h for i, h in st.session_state["hash_upload"].items() if h in por_hash}
+    return [(a, h, cache[h]) for h, a in por_hash.items()]
+
+def marca_do_arquivo(nome, posicao):
+    # Palpite pelo nome do export ("rd_microlins.csv"); sem pista, segue a ordem de MARCAS
+    nome = nome.lower().replace("_", " ").replace("-", " ")
+    for marca in sorted(MARCAS, key=len, reverse=True):
+        if marca.lower() in nome: return marca
+    return MARCAS[posicao % len(MARCAS)]
+
+@st.fragment
+def painel_salvar_lote(itens, semana_sel):
+    # itens: [(marca, frame)] já conferidos; tudo vai num só envio e num só resumo
+    if st.button(f"🚀 SALVAR LOTE: {semana_sel} ({len(itens)} marcas)"):
+        try:
+            lotes, resumos = {}, []
+            for snapshot_id, (marca, df) in zip(st.session_state["lote_ids"], itens):
+                df_save = df.copy()
+                df_save['snapshot_id'] = snapshot_id
+                df_save['data_salvamento'] = st.session_state["lote_data"]
+                df_save['semana_ref'] = semana_sel
+                df_save['marca_ref'] = marca
+                lotes[snapshot_id] = df_save
+                resumos.append(montar_resumo(df, snapshot_id, marca, semana_sel, st.session_state["lote_data"]))
+
+            barra = st.progress(0.0, text="Enviando lote...")
+            with etapa("salvar lote", linhas=sum(map(len, lotes.values()))):
+                enviadas = obter_armazenamento().salvar_snapshots(lotes, progresso=lambda feito, total: barra.progress(feito / total, text=f"Enviando lote... {feito}/{total}"))
+            barra.empty()
+            salvar_resumo(pd.concat(resumos, ignore_index=True))
+            if enviadas:
+                st.success(f"{len(lotes)} snapshots salvos com sucesso!")
+            else:
+                st.info("Este lote já estava salvo por completo.")
+        except Exception as e:
+            st.error(f"Erro ao salvar: {e}")
+
+@st.fragment
+def detalhe_do_lote(opcoes):
+    # Fragmento: trocar a marca detalhada não relê os arquivos nem reagrega o lote todo
+    detalhe = st.selectbox("Detalhar marca", range(len(opcoes)), format_func=lambda i: f"{opcoes[i][0]} · {opcoes[i][1]}")
+    marca, _, df = opcoes[detalhe]
+    render_dashboard(df, marca)
+
+def carga_em_lote(semana_sel):
+    arquivos = st.file_uploader("Upload dos CSVs RD Station (um por marca)", type=["csv"], accept_multiple_files=True)
+    if not arquivos:
+        st.session_state.pop("upload_lote", None)
+        return
+    itens = carregar_lote(arquivos)
+
+    # Marca de cada arquivo (palpite pelo nome, ajustável) e visão geral antes de gravar
+    st.sidebar.subheader("Marca de cada arquivo")
+    visao, escolhidos = [], []
+    for posicao, (arquivo, hash_arquivo, df) in enumerate(itens):
+        marca = st.sidebar.selectbox(arquivo.name, MARCAS, index=MARCAS.index(marca_do_arquivo(arquivo.name, posicao)),
+                                     key=f"marca_lote_{hash_arquivo}")
+        painel = agregar_painel(df, marca, MOTIVOS_PERDA_MESTRADOS)
+        visao.append({"Arquivo": arquivo.name, "Marca": marca, "Leads": painel["total"],
+                      "Em Andamento": painel["em_andamento"], "Perdidos": painel["perdidos"],
+                      "Reunião Realizada (+)": painel["reuniao_realizada"], "Sem contato": painel["sem_contato"],
+                      "Responsável": df["Responsável"].mode()[0] if not df["Responsável"].empty else "N/A"})
+        escolhidos.append((marca, hash_arquivo, df))
+
+    subheader_futurista("📦", "VISÃO GERAL DO LOTE")
+    st.dataframe(pd.DataFrame(visao), hide_index=True, use_container_width=True)
+
+    marcas = [m for m, _, _ in escolhidos]
+    repetidas = sorted({m for m in marcas if marcas.count(m) > 1})
+    if repetidas:
+        st.warning(f"⚠️ Mais de um arquivo para: {', '.join(repetidas)}. Ajuste as marcas na barra lateral antes de salvar.")
+
+    detalhe_do_lote([(m, arquivo.name, df) for (m, _, df), (arquivo, _, _) in zip(escolhidos, itens)])
+
+    if repetidas: return
+    # Ids fixados por lote+semana na sessão (como no envio único): data_hora do lote
+    # com o número do arquivo, sem ocupar os próximos segundos de outros saves
+    chave_lote = (tuple((h, m) for m, h, _ in escolhidos), semana_sel)
+    if st.session_state.get("lote_chave") != chave_lote:
+        agora = datetime.now()
+        st.session_state["lote_chave"] = chave_lote
+        st.session_state["lote_ids"] = [f"{agora.strftime(FORMATO_SNAPSHOT_ID)}_{i}" for i in range(1, len(escolhidos) + 1)]
+        st.session_state["lote_data"] = agora.strftime('%d/%m/%Y %H:%M')
+    with st.sidebar:
+        painel_salvar_lote([(m, df) for m, _, df in escolhidos], semana_sel)
 
 # =========================
 # APP MAIN
@@ -226,40 +286,41 @@ def render_dashboard(df, marca):
 st.markdown('<div class="futuristic-title">💠 BI CRM Expansão</div>', unsafe_allow_html=True)
 
 st.sidebar.header("Painel de Carga")
-marca_sel = st.sidebar.selectbox("Marca", MARCAS)
+modo_lote = st.sidebar.toggle("📦 Carga em lote (várias marcas)")
+marca_sel = None if modo_lote else st.sidebar.selectbox("Marca", MARCAS)
 semana_sel = st.sidebar.selectbox("Semana Ref.", ["Semana 1", "Semana 2", "Semana 3", "Semana 4", "Semana 5", "Fechamento Mês"])
-arquivo = st.file_uploader("Upload CSV RD Station", type=["csv"])
 
-if arquivo:
+if modo_lote:
     try:
-        df = load_csv(arquivo)
-        df = processar(df)
-        resp = df["Responsável"].mode()[0] if not df["Responsável"].empty else "N/A"
-        equipe = f"Expansão {marca_sel}"
-        st.markdown(f"""<div class="profile-header"><div class="profile-group"><span class="profile-label">Responsável</span><span class="profile-value">{resp}</span></div><div class="profile-divider"></div><div class="profile-group"><span class="profile-label">Equipe</span><span class="profile-value">{equipe}</span></div></div>""", unsafe_allow_html=True)
-        render_dashboard(df, marca_sel)
-        
-        # BOTAO COM LÓGICA DE CABEÇALHO PARA PLANILHA VAZIA
-        if st.sidebar.button(f"🚀 SALVAR HISTÓRICO: {semana_sel}"):
-            client = conectar_google()
-            if client:
-                sh = client.open("BI_Historico")
-                try: ws = sh.worksheet("db_snapshots")
-                except: ws = sh.add_worksheet(title="db_snapshots", rows="1000", cols="20")
-                
-                df_save = df.copy()
-                df_save['snapshot_id'] = datetime.now().strftime("%Y%m%d_%H%M%S")
-                df_save['data_salvamento'] = datetime.now().strftime('%d/%m/%Y %H:%M')
-                df_save['semana_ref'] = semana_sel
-                df_save['marca_ref'] = marca_sel
-                
-                # VERIFICA SE ESTÁ VAZIO E GERA CABEÇALHO
-                current_data = ws.get_all_values()
-                if not current_data:
-                    ws.append_row(df_save.columns.tolist())
-                    
-                ws.append_rows(df_save.astype(str).values.tolist())
-                st.sidebar.success("Snapshot e Cabeçalhos salvos com sucesso!")
-                
+        carga_em_lote(semana_sel)
     except Exception as e:
-        st.error(f"Erro no processamento: {e}")
+        st.error(f"Erro no processamento do lote: {e}")
+else:
+    arquivo = st.file_uploader("Upload CSV RD Station", type=["csv"])
+
+    if arquivo:
+        try:
+            hash_arquivo, df = carregar_upload(arquivo)
+            resp = df["Responsável"].mode()[0] if not df["Responsável"].empty else "N/A"
+            equipe = f"Expansão {marca_sel}"
+            st.markdown(f"""<div class="profile-header"><div class="profile-group"><span class="profile-label">Responsável</span><span class="profile-value">{resp}</span></div><div class="profile-divider"></div><div class="profile-group"><span class="profile-label">Equipe</span><span class="profile-value">{equipe}</span></div></div>""", unsafe_allow_html=True)
+            render_dashboard(df, marca_sel)
+        
+            # BOTAO COM LÓGICA DE CABEÇALHO PARA PLANILHA VAZIA
+            # O snapshot_id é fixado por arquivo+marca+semana na sessão: repetir o clique
+            # (ou tentar de novo após falha) retoma o mesmo snapshot em vez de duplicar
+            chave_snapshot = (hash_arquivo, marca_sel, semana_sel)
+            if st.session_state.get("snapshot_chave") != chave_snapshot:
+                st.session_state["snapshot_chave"] = chave_snapshot
+                st.session_state["snapshot_id"] = datetime.now().strftime(FORMATO_SNAPSHOT_ID)
+                st.session_state["snapshot_data"] = datetime.now().strftime('%d/%m/%Y %H:%M')
+
+            with st.sidebar:
+                painel_salvar(df, marca_sel, semana_sel)
+            
+        except Exception as e:
+            st.error(f"Erro no processamento: {e}")
+    else:
+        st.session_state.pop("upload", None)
+
+painel_debug()
@@ -1,60 +1,27 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import json
-import os
-from datetime import datetime
-import io
+import numpy as np
+from core.aquecimento import iniciar_aquecimento
+from core import carregadores
+from core.armazenamento import obter_armazenamento
+from core.esquema import relatorio_memoria
+from core.graficos import aparar_cauda, figura
+from core.medicao import avisar_falha, falhou, iniciar, medido, painel_debug
+from core.funil import funil_acumulado, funil_da_marca
+from core.resumo import CHAVES, contagens, resumir_historico, salvar_resumo, total as resumo_total
+from core.tema import aplicar_tema
 
 # =========================
 # CONFIGURAÇÃO DA PÁGINA
 # =========================
 st.set_page_config(page_title="BI CRM Expansão - Histórico", layout="wide")
+iniciar("historico")
+iniciar_aquecimento()  # só com BI_CRM_AQUECER=1; uma vez por processo
 
 # =========================
-# ESTILIZAÇÃO CSS (COMPLETA)
-# =========================
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@400;500;700;900&family=Rajdhani:wght@500;700&display=swap');
-.stApp { background-color: #0b0f1a; color: #e0e0e0; }
-.futuristic-title {
-    font-family: 'Orbitron', sans-serif; font-size: 56px; font-weight: 900; text-transform: uppercase;
-    background: linear-gradient(90deg, #22d3ee 0%, #818cf8 50%, #c084fc 100%);
-    -webkit-background-clip: text; -webkit-text-fill-color: transparent;
-    letter-spacing: 3px; margin-bottom: 10px; text-shadow: 0 0 30px rgba(34, 211, 238, 0.3);
-}
-.futuristic-sub {
-    font-family: 'Rajdhani', sans-serif; font-size: 24px; font-weight: 700; text-transform: uppercase;
-    color: #e2e8f0; letter-spacing: 2px; border-bottom: 1px solid #1e293b;
-    padding-bottom: 8px; margin-top: 30px; margin-bottom: 20px; display: flex; align-items: center;
-}
-.sub-icon { margin-right: 12px; font-size: 24px; color: #22d3ee; text-shadow: 0 0 10px rgba(34, 211, 238, 0.6); }
-.profile-header {
-    background: linear-gradient(90deg, #1e293b 0%, #0f172a 100%);
-    border-left: 5px solid #6366f1; border-radius: 8px; padding: 20px 30px;
-    margin-bottom: 15px; margin-top: 10px; display: flex; align-items: center; justify-content: space-between;
-}
-.profile-group { display: flex; flex-direction: column; }
-.profile-label { color: #94a3b8; font-family: 'Rajdhani', sans-serif; font-size: 13px; text-transform: uppercase; letter-spacing: 1.5px; margin-bottom: 4px; }
-.profile-value { color: #f8fafc; font-size: 24px; font-weight: 600; font-family: 'Rajdhani', sans-serif; }
-.profile-divider { width: 1px; height: 40px; background-color: #334155; margin: 0 20px; }
-.card {
-    background: linear-gradient(135deg, #111827, #020617);
-    padding: 24px; border-radius: 16px; border: 1px solid #1e293b; text-align: center;
-}
-.card-title {
-    font-family: 'Rajdhani', sans-serif; font-size: 14px; font-weight: 600; color: #94a3b8;
-    text-transform: uppercase; letter-spacing: 1.5px; margin-bottom: 8px; min-height: 30px; display: flex; align-items: center; justify-content: center;
-}
-.card-value {
-    font-family: 'Orbitron', sans-serif; font-size: 36px; font-weight: 700;
-    background: -webkit-linear-gradient(45deg, #38bdf8, #818cf8); -webkit-background-clip: text; -webkit-text-fill-color: transparent;
-}
-</style>
-""", unsafe_allow_html=True)
+# ESTILIZAÇÃO CSS (static/css/historico.css)
+# =========================
+aplicar_tema("historico")
 
 # =========================
 # CONSTANTES & CONEXÃO
@@ -66,15 +33,6 @@ MOTIVOS_PERDA_MESTRADOS = [
     "Dados Inválidos", "Região Indisponível", "Sócio não aprovou"
 ]
 
-def conectar_google():
-    try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds_json = os.environ.get("gcp_service_account") or st.secrets.get("gcp_service_account")
-        creds_dict = json.loads(creds_json)
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        return gspread.authorize(creds)
-    except: return None
-
 # =========================
 # FUNÇÕES DE UI
 # =========================
@@ -87,87 +45,107 @@ def card(title, value):
 # =========================
 # LÓGICA DE DADOS
 # =========================
-def status_logic(row):
-    estado = str(row.get("Estado", "")).lower()
-    if estado == "perdida": return "Perdido"
-    etapa = str(row.get("Etapa", "")).lower()
-    if any(x in etapa for x in ["faturado", "ganho", "venda"]): return "Ganho"
-    motivo = str(row.get("Motivo de Perda", "")).strip().lower()
-    if motivo not in ["", "nan", "none", "-", "0", "nada", "n/a"]: return "Perdido"
-    return "Em Andamento"
-
-def get_historico():
-    client = conectar_google()
-    if not client: return pd.DataFrame()
+@medido("historico")
+def get_historico(filtros=None):
     try:
-        sh = client.open("BI_Historico")
-        ws = sh.worksheet("db_snapshots")
-        lista_dados = ws.get_all_values()
-        if len(lista_dados) < 2: return pd.DataFrame()
-        df = pd.DataFrame(lista_dados[1:], columns=lista_dados[0])
-        df.columns = df.columns.str.strip()
-        if "Status" not in df.columns:
-            df["Status"] = df.apply(status_logic, axis=1)
-        return df
-    except: return pd.DataFrame()
+        # Filtros ({coluna: valores}) vão para o WHERE do backend: só as linhas pedidas são lidas.
+        # Um carregamento por processo, dividido entre as sessões (frames compartilhados: não alterar)
+        return carregadores.historico(filtros)
+    except Exception as e:
+        avisar_falha(e, "o histórico")
+        return pd.DataFrame()
+
+@medido("resumo")
+def get_resumo(filtros=None):
+    # Resumo pré-agregado gravado pela Home; sem ele, agrega o histórico bruto
+    try:
+        df_resumo = carregadores.resumo(filtros)
+    except Exception as e:
+        avisar_falha(e, "o resumo")
+        df_resumo = pd.DataFrame()
+    if df_resumo.empty:
+        df_resumo = resumir_historico(get_historico(filtros))
+    return df_resumo
+
+@medido("catalogo")
+def get_catalogo():
+    # Uma linha por snapshot (gravada no save); sem catálogo ainda, as referências saem do resumo
+    try:
+        df_catalogo = carregadores.catalogo()
+    except Exception as e:
+        avisar_falha(e, "o catálogo")
+        df_catalogo = pd.DataFrame()
+    if df_catalogo.empty:
+        df_resumo = get_resumo()
+        df_catalogo = df_resumo[CHAVES].drop_duplicates("snapshot_id") if not df_resumo.empty else df_resumo
+    return df_catalogo
+
+# =========================
+# GRÁFICOS (memoizados em core.graficos pela impressão dos dados)
+# =========================
+def grafico_fontes(df_fonte):
+    import plotly.express as px  # carregado só quando há gráfico para desenhar
+    # CORREÇÃO: Usando Blues_r para tons de azul/ciano seguros
+    fig_pie = px.pie(aparar_cauda(df_fonte, "Fonte", "count"), values="count", names="Fonte", hole=0.6, 
+                     color_discrete_sequence=px.colors.sequential.Blues_r)
+    fig_pie.update_traces(textposition='inside', textinfo='label+value')
+    fig_pie.update_layout(template="plotly_dark", showlegend=False, paper_bgcolor="rgba(0,0,0,0)")
+    return fig_pie
+
+def grafico_funil(df_plot, funil_labels):
+    import plotly.express as px
+    fig_funil = px.bar(df_plot, y="Etapa", x="Qtd", text="Qtd", orientation="h", color="Qtd", color_continuous_scale="Blues")
+    fig_funil.update_layout(template="plotly_dark", showlegend=False, yaxis={'categoryorder':'array', 'categoryarray':funil_labels[::-1]})
+    return fig_funil
+
+def grafico_perdas(df_loss):
+    import plotly.express as px
+    # CORREÇÃO: Consistência visual (Verde para Sem Resposta, Vermelho para os demais)
+    sem_resposta = df_loss['Motivo'].astype(str).str.contains("sem resposta", case=False, regex=False)
+    cores = dict(zip(df_loss['Motivo'], np.where(sem_resposta, '#10b981', '#ef4444')))
+    fig_loss = px.bar(df_loss, x="Qtd", y="Motivo", text="Qtd", orientation="h", color="Motivo", color_discrete_map=cores)
+    fig_loss.update_layout(template="plotly_dark", showlegend=False, height=500, yaxis=dict(autorange="reversed"))
+    return fig_loss
 
 # =========================
 # RENDERIZAÇÃO DO DASHBOARD
 # =========================
-def render_dashboard(df):
-    total = len(df)
-    if "Status" not in df.columns:
-        df["Status"] = df.apply(status_logic, axis=1)
-        
-    perdidos = df[df["Status"] == "Perdido"]
-    em_andamento = df[df["Status"] == "Em Andamento"]
+@medido("dashboard")
+def render_dashboard(df_resumo, marca=None):
+    total = resumo_total(df_resumo)
+    status = contagens(df_resumo, "Status")
     
     c1, c2 = st.columns(2)
     with c1: card("Leads Totais", total)
-    with c2: card("Leads em Andamento", len(em_andamento))
+    with c2: card("Leads em Andamento", int(status.get("Em Andamento", 0)))
     st.divider()
 
     col_mkt, col_funil = st.columns(2)
     with col_mkt:
         subheader_futurista("📡", "MARKETING & FONTES")
-        if "Fonte" in df.columns:
-            df_fonte = df["Fonte"].value_counts().reset_index()
-            # CORREÇÃO: Usando Blues_r para tons de azul/ciano seguros
-            fig_pie = px.pie(df_fonte, values=df_fonte.columns[1], names=df_fonte.columns[0], hole=0.6, 
-                             color_discrete_sequence=px.colors.sequential.Blues_r)
-            fig_pie.update_traces(textposition='inside', textinfo='label+value')
-            fig_pie.update_layout(template="plotly_dark", showlegend=False, paper_bgcolor="rgba(0,0,0,0)")
-            st.plotly_chart(fig_pie, use_container_width=True)
+        fontes = contagens(df_resumo, "Fonte")
+        if not fontes.empty:
+            df_fonte = fontes.rename_axis("Fonte").reset_index(name="count")
+            st.plotly_chart(figura(grafico_fontes, df_fonte), use_container_width=True)
 
     with col_funil:
         subheader_futurista("📉", "FUNIL DE VENDAS")
-        ordem_funil = ["Confirmou Interesse", "Qualificado", "Reunião Agendada", "Reunião Realizada", "negociação", "em aprovação", "faturado"]
+        ordem_funil = funil_da_marca(marca)
+        funil = funil_acumulado(contagens(df_resumo, "Etapa"), ordem_funil, ignorar_caixa=True)
         funil_labels = ["TOTAL"] + [e.upper() for e in ordem_funil]
-        funil_values = [total]
-        for etapa in ordem_funil:
-            idx = ordem_funil.index(etapa)
-            etapas_futuras = [e.lower() for e in ordem_funil[idx:]]
-            qtd = len(df[df["Etapa"].str.lower().isin(etapas_futuras)])
-            funil_values.append(qtd)
+        funil_values = [total] + funil.tolist()
         
         df_plot = pd.DataFrame({"Etapa": funil_labels, "Qtd": funil_values})
-        fig_funil = px.bar(df_plot, y="Etapa", x="Qtd", text="Qtd", orientation="h", color="Qtd", color_continuous_scale="Blues")
-        fig_funil.update_layout(template="plotly_dark", showlegend=False, yaxis={'categoryorder':'array', 'categoryarray':funil_labels[::-1]})
-        st.plotly_chart(fig_funil, use_container_width=True)
+        st.plotly_chart(figura(grafico_funil, df_plot, funil_labels), use_container_width=True)
 
     st.divider()
     subheader_futurista("🚫", "DETALHE DAS PERDAS (MOTIVOS)")
-    motivos_reais = perdidos["Motivo de Perda"].unique()
-    lista_final = list(set(motivos_reais) | set(MOTIVOS_PERDA_MESTRADOS))
-    df_loss = perdidos["Motivo de Perda"].value_counts().reindex(lista_final, fill_value=0).reset_index()
+    motivos = contagens(df_resumo, "Motivo de Perda")
+    lista_final = list(set(motivos.index) | set(MOTIVOS_PERDA_MESTRADOS))
+    df_loss = motivos.reindex(lista_final, fill_value=0).reset_index()
     df_loss.columns = ["Motivo", "Qtd"]
     df_loss = df_loss.sort_values(by="Qtd", ascending=False)
-    
-    # CORREÇÃO: Consistência visual (Verde para Sem Resposta, Vermelho para os demais)
-    df_loss['color'] = df_loss['Motivo'].apply(lambda x: '#10b981' if 'sem resposta' in str(x).lower() else '#ef4444')
-    fig_loss = px.bar(df_loss, x="Qtd", y="Motivo", text="Qtd", orientation="h", color="Motivo", color_discrete_map=dict(zip(df_loss['Motivo'], df_loss['color'])))
-    fig_loss.update_layout(template="plotly_dark", showlegend=False, height=500, yaxis=dict(autorange="reversed"))
-    st.plotly_chart(fig_loss, use_container_width=True)
+    st.plotly_chart(figura(grafico_perdas, df_loss), use_container_width=True)
 
 # =========================
 # APP MAIN
@@ -176,26 +154,47 @@ st.markdown('<div class="futuristic-title">💠 HISTÓRICO CRM</div>', unsafe_al
 
 
 
-df_hist = get_historico()
+# Seletores montados pelo catálogo; só o resumo da marca/semana escolhida é lido
+df_catalogo = get_catalogo()
 
-if not df_hist.empty and 'marca_ref' in df_hist.columns:
-    marcas_disponiveis = df_hist['marca_ref'].unique()
+if not df_catalogo.empty:
+    marcas_disponiveis = df_catalogo['marca_ref'].unique()
     marca_hist = st.sidebar.selectbox("Filtrar Marca", marcas_disponiveis)
     
-    df_marca = df_hist[df_hist['marca_ref'] == marca_hist]
-    if 'semana_ref' in df_marca.columns:
-        semanas_disponiveis = df_marca['semana_ref'].unique()
-        semana_hist = st.sidebar.selectbox("Escolher Semana Salva", semanas_disponiveis)
-        
-        df_view = df_marca[df_marca['semana_ref'] == semana_hist]
-        
-        st.markdown(f"""
-        <div class="profile-header">
-            <div class="profile-group"><span class="profile-label">Arquivo de Consulta</span><span class="profile-value">{semana_hist}</span></div>
-            <div class="profile-divider"></div>
-            <div class="profile-group"><span class="profile-label">Marca</span><span class="profile-value">{marca_hist}</span></div>
-        </div>""", unsafe_allow_html=True)
-        
-        render_dashboard(df_view)
-else:
+    df_marca = df_catalogo[df_catalogo['marca_ref'] == marca_hist]
+    semanas_disponiveis = df_marca['semana_ref'].unique()
+    semana_hist = st.sidebar.selectbox("Escolher Semana Salva", semanas_disponiveis)
+    
+    ids_view = df_marca.loc[df_marca['semana_ref'] == semana_hist, 'snapshot_id'].unique()
+    df_view = get_resumo({"snapshot_id": ids_view})
+    
+    st.markdown(f"""
+    <div class="profile-header">
+        <div class="profile-group"><span class="profile-label">Arquivo de Consulta</span><span class="profile-value">{semana_hist}</span></div>
+        <div class="profile-divider"></div>
+        <div class="profile-group"><span class="profile-label">Marca</span><span class="profile-value">{marca_hist}</span></div>
+    </div>""", unsafe_allow_html=True)
+    
+    render_dashboard(df_view, marca_hist)
+
+    # Drill-down: só aqui os leads brutos do db_snapshots são carregados
+    with st.expander("🔎 Ver leads deste snapshot"):
+        if st.checkbox("Carregar leads", key="drill_historico"):
+            # Só a faixa de linhas destes snapshots (catálogo), não a aba inteira
+            df_hist = get_historico({"snapshot_id": ids_view})
+            if not df_hist.empty:
+                st.dataframe(df_hist, use_container_width=True, hide_index=True)
+                rel, total_mb, texto_mb = relatorio_memoria(df_hist)
+                st.caption(f"Histórico em memória: {total_mb:.1f} MB tipado (era {texto_mb:.1f} MB como texto)")
+                st.dataframe(rel, use_container_width=True)
+
+    if st.sidebar.button("🔧 Gerar resumo dos snapshots antigos"):
+        # Backfill: agrega o histórico bruto e grava só os snapshots que faltam no db_resumo e no db_catalogo
+        gravadas = salvar_resumo(resumir_historico(get_historico()))
+        catalogados = obter_armazenamento().catalogar()
+        st.sidebar.success(f"{gravadas} linhas de resumo gravadas, {catalogados} snapshots catalogados.")
+elif not falhou():
+    # Falha de carga já foi avisada: não dizer que o histórico está vazio
     st.warning("⚠️ O histórico está vazio ou os dados salvos não possuem as colunas de referência.")
+
+painel_debug()
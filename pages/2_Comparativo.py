@@ -1,80 +1,38 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import json
-import os
+from core.aquecimento import iniciar_aquecimento
+from core.status import classificar_status
+from core.armazenamento import carregar_catalogo, carregar_historico
+from core.cache_snapshots import ABA_RESUMO, ABA_SNAPSHOTS
+from core.catalogo import ABA_CATALOGO
+from core.compartilhado import ao_invalidar, dados_compartilhados
+from core.funil import etapas_da_marca
+from core.graficos import figura
+from core.lru import CacheLRU
+from core.medicao import avisar_falha, etapa, falhou, iniciar, medido, painel_debug
+from core.painel import comparar_fontes, comparar_funil
+from core.resumo import CHAVES, carregar_resumo, contagens, resumir_historico, total as resumo_total
+from core.tema import aplicar_tema
 
 # =========================
 # CONFIGURAÇÃO DA PÁGINA
 # =========================
 st.set_page_config(page_title="Comparativo | Battle Mode", layout="wide")
+iniciar("comparativo")
+iniciar_aquecimento()  # só com BI_CRM_AQUECER=1; uma vez por processo
 
 # =========================
-# ESTILIZAÇÃO CSS (ADAPTADA PARA COMPARATIVO)
+# ESTILIZAÇÃO CSS (static/css/comparativo.css)
 # =========================
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@400;500;700;900&family=Rajdhani:wght@500;700&display=swap');
-.stApp { background-color: #0b0f1a; color: #e0e0e0; }
-
-.futuristic-title {
-    font-family: 'Orbitron', sans-serif; font-size: 42px; font-weight: 900; text-transform: uppercase;
-    background: linear-gradient(90deg, #22d3ee 0%, #818cf8 50%, #c084fc 100%);
-    -webkit-background-clip: text; -webkit-text-fill-color: transparent;
-    margin-bottom: 20px; text-shadow: 0 0 20px rgba(34, 211, 238, 0.3);
-}
-
-.comp-card {
-    background: linear-gradient(135deg, #1e293b, #0f172a);
-    padding: 20px; border-radius: 12px; border: 1px solid #334155; text-align: center;
-    box-shadow: 0 4px 6px rgba(0,0,0,0.3); margin-bottom: 10px;
-}
-.comp-title {
-    font-family: 'Rajdhani', sans-serif; font-size: 14px; color: #94a3b8; text-transform: uppercase; letter-spacing: 1px;
-}
-.comp-value {
-    font-family: 'Orbitron', sans-serif; font-size: 28px; font-weight: 700; color: #f8fafc; margin: 5px 0;
-}
-.comp-delta-pos { color: #4ade80; font-family: 'Rajdhani', font-weight: bold; font-size: 16px; }
-.comp-delta-neg { color: #f87171; font-family: 'Rajdhani', font-weight: bold; font-size: 16px; }
-.comp-delta-neutral { color: #94a3b8; font-family: 'Rajdhani', font-weight: bold; font-size: 16px; }
-
-.vs-badge {
-    background-color: #334155; color: #22d3ee; padding: 5px 15px; border-radius: 20px;
-    font-family: 'Orbitron'; font-weight: bold; font-size: 12px; margin: 0 10px;
-}
-</style>
-""", unsafe_allow_html=True)
+aplicar_tema("comparativo")
 
 # =========================
 # CONEXÃO E UTILS
 # =========================
-def conectar_google():
-    try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds_json = os.environ.get("gcp_service_account") or st.secrets.get("gcp_service_account")
-        if not creds_json: 
-             creds = ServiceAccountCredentials.from_json_keyfile_name("credentials.json", scope)
-             return gspread.authorize(creds)
-        creds_dict = json.loads(creds_json)
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        return gspread.authorize(creds)
-    except:
-        return None
-
 def processar_df(df):
-    def status(row):
-        etapa = str(row.get("Etapa", "")).lower()
-        motivo = str(row.get("Motivo de Perda", "")).strip().lower()
-        if any(x in etapa for x in ["faturado", "ganho", "venda"]): return "Ganho"
-        if motivo not in ["", "nan", "none", "-", "nan", "0", "nada", "n/a"]: return "Perdido"
-        return "Em Andamento"
-    
+    # O Comparativo nunca considerou a coluna Estado
     if "Status" not in df.columns:
-        df["Status"] = df.apply(status, axis=1)
+        df["Status"] = classificar_status(df, usar_estado=False)
     
     # Tratamento de Fonte
     if "Fonte" in df.columns:
@@ -82,6 +40,73 @@ def processar_df(df):
         
     return df
 
+def resumo_do_snapshot(snapshot_id):
+    # Resumo pré-agregado só deste snapshot; sem ele, agrega a faixa dele no db_snapshots
+    df = carregar_resumo(filtros={"snapshot_id": snapshot_id})
+    if df.empty:
+        df = resumir_historico(processar_df(carregar_historico({"snapshot_id": snapshot_id})))
+    return df
+
+def ler_catalogo():
+    # Sem st.* aqui: o cache compartilhado pode chamar de qualquer thread
+    df_catalogo = carregar_catalogo()
+    if df_catalogo.empty:
+        df_resumo = carregar_resumo()
+        if df_resumo.empty:
+            df_resumo = resumir_historico(processar_df(carregar_historico()))
+        df_catalogo = df_resumo[CHAVES] if not df_resumo.empty else df_resumo
+    return df_catalogo
+
+@st.cache_resource
+def cache_snapshots():
+    # Um por processo (sobrevive aos reruns e é dividido entre sessões). Save, backfill
+    # ou carga em lote podem reescrever um snapshot: qualquer gravação nas abas lidas limpa
+    cache = CacheLRU()
+    ao_invalidar(cache.limpar, ABA_SNAPSHOTS, ABA_RESUMO)
+    return cache
+
+@medido("snapshot")
+def buscar_snapshot(snapshot_id):
+    return cache_snapshots().obter(snapshot_id, lambda: resumo_do_snapshot(snapshot_id))
+
+# Gráficos memoizados em core.graficos pela impressão dos dados
+def grafico_funil(df_funil_comp):
+    import plotly.graph_objects as go  # carregado só quando há gráfico para desenhar
+    # Plotly Graph Objects para Barras Agrupadas
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        y=df_funil_comp['Etapa'], x=df_funil_comp['Qtd_A'],
+        name='Atual', orientation='h', marker_color='#22d3ee'
+    ))
+    fig.add_trace(go.Bar(
+        y=df_funil_comp['Etapa'], x=df_funil_comp['Qtd_B'],
+        name='Anterior', orientation='h', marker_color='#475569'
+    ))
+
+    fig.update_layout(
+        barmode='group', 
+        template="plotly_dark", 
+        paper_bgcolor="rgba(0,0,0,0)", 
+        plot_bgcolor="rgba(0,0,0,0)",
+        height=500,
+        legend=dict(orientation="h", y=1.1)
+    )
+    return fig
+
+def grafico_fontes(df_fonte_comp):
+    import plotly.graph_objects as go
+    fig_f = go.Figure()
+    fig_f.add_trace(go.Bar(
+        x=df_fonte_comp['Fonte'], y=df_fonte_comp['Qtd_A'],
+        name='Atual', marker_color='#818cf8'
+    ))
+    fig_f.add_trace(go.Bar(
+        x=df_fonte_comp['Fonte'], y=df_fonte_comp['Qtd_B'],
+        name='Anterior', marker_color='#475569'
+    ))
+    fig_f.update_layout(barmode='group', template="plotly_dark", paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+    return fig_f
+
 # Função para Card com Delta
 def card_comparativo(titulo, valor_a, valor_b, formato="num"):
     delta = valor_a - valor_b
@@ -114,40 +139,41 @@ def card_comparativo(titulo, valor_a, valor_b, formato="num"):
 # =========================
 st.markdown('<div class="futuristic-title">⚔️ Arena Comparativa</div>', unsafe_allow_html=True)
 
-# 1. Carregar Dados
-with st.spinner("Carregando Dados..."):
-    client = conectar_google()
-    df_db = pd.DataFrame()
-    if client:
-        try:
-            sh = client.open("BI_Historico")
-            ws = sh.worksheet("db_snapshots")
-            dados = ws.get_all_values()
-            if len(dados) > 1:
-                df_db = pd.DataFrame(dados[1:], columns=dados[0])
-        except: pass
-
-if df_db.empty:
-    st.warning("Sem dados para comparar. Salve arquivos na Home primeiro.")
+# 1. Carregar Dados (catálogo de snapshots; sem ele, resumo pré-agregado ou db_snapshots bruto)
+with st.spinner("Carregando Dados..."), etapa("catalogo"):
+    df_catalogo = pd.DataFrame()
+    try:
+        # Um carregamento por processo, dividido entre as sessões
+        df_catalogo = dados_compartilhados(("comparativo", "catalogo"), ler_catalogo,
+                                           abas=(ABA_CATALOGO, ABA_RESUMO, ABA_SNAPSHOTS))
+    except Exception as e:
+        avisar_falha(e, "os snapshots")
+
+if df_catalogo.empty:
+    # Falha de carga já foi avisada: não dizer que não há dados
+    if not falhou(): st.warning("Sem dados para comparar. Salve arquivos na Home primeiro.")
     st.stop()
 
-# 2. Configurar Filtros
-df_db['Label'] = df_db['semana_ref'] + " | " + df_db['marca_ref'] + " (" + df_db['data_salvamento'] + ")"
-opcoes = df_db[['snapshot_id', 'Label']].drop_duplicates().sort_values('snapshot_id', ascending=False)
-lista_opcoes = opcoes['Label'].tolist()
+# 2. Configurar Filtros (um rótulo por snapshot; o selectbox devolve o próprio snapshot_id)
+opcoes = df_catalogo[CHAVES].drop_duplicates('snapshot_id').sort_values('snapshot_id', ascending=False)
+rotulos = dict(zip(opcoes['snapshot_id'], opcoes['semana_ref'].astype(str) + " | " + opcoes['marca_ref'].astype(str) + " (" + opcoes['data_salvamento'].dt.strftime('%d/%m/%Y %H:%M').fillna("") + ")"))
+lista_ids = list(rotulos)
 
 # Layout de Seleção
 st.sidebar.header("🎛️ Configuração do Duelo")
-sel_a = st.sidebar.selectbox("Periodo A (Principal)", lista_opcoes, index=0)
-sel_b = st.sidebar.selectbox("Periodo B (Referência)", lista_opcoes, index=1 if len(lista_opcoes) > 1 else 0)
+id_a = st.sidebar.selectbox("Periodo A (Principal)", lista_ids, index=0, format_func=rotulos.get)
+id_b = st.sidebar.selectbox("Periodo B (Referência)", lista_ids, index=1 if len(lista_ids) > 1 else 0, format_func=rotulos.get)
 
-if sel_a and sel_b:
-    id_a = opcoes[opcoes['Label'] == sel_a]['snapshot_id'].values[0]
-    id_b = opcoes[opcoes['Label'] == sel_b]['snapshot_id'].values[0]
+if id_a is not None and id_b is not None:
+    sel_a, sel_b = rotulos[id_a], rotulos[id_b]
 
-    # Filtrar Dataframes
-    df_a = processar_df(df_db[df_db['snapshot_id'] == id_a].copy())
-    df_b = processar_df(df_db[df_db['snapshot_id'] == id_b].copy())
+    # Só os dois períodos escolhidos, via cache LRU: alternar entre recentes não vai à origem
+    try:
+        res_a, res_b = buscar_snapshot(id_a), buscar_snapshot(id_b)
+    except Exception as e:
+        avisar_falha(e, "os períodos escolhidos")
+        st.stop()
+    status_a, status_b = contagens(res_a, "Status"), contagens(res_b, "Status")
 
     st.divider()
     
@@ -164,19 +190,19 @@ if sel_a and sel_b:
 
     # --- 1. CARDS DE KPI ---
     # Calculos
-    total_a, total_b = len(df_a), len(df_b)
+    total_a, total_b = resumo_total(res_a), resumo_total(res_b)
     
-    andamento_a = len(df_a[df_a['Status'] == 'Em Andamento'])
-    andamento_b = len(df_b[df_b['Status'] == 'Em Andamento'])
+    andamento_a = int(status_a.get('Em Andamento', 0))
+    andamento_b = int(status_b.get('Em Andamento', 0))
     
-    perdidos_a = len(df_a[df_a['Status'] == 'Perdido'])
-    perdidos_b = len(df_b[df_b['Status'] == 'Perdido'])
+    perdidos_a = int(status_a.get('Perdido', 0))
+    perdidos_b = int(status_b.get('Perdido', 0))
     
     # Conversão (Estimada)
     # Consideramos "Venda/Ganho" qualquer coisa que não seja "Perdido" ou "Em Andamento" se existir status explicito
     # Ou usamos uma lógica de funil. Vamos usar a quantidade de leads qualificados/faturados
-    vendas_a = len(df_a[df_a['Status'] == 'Ganho'])
-    vendas_b = len(df_b[df_b['Status'] == 'Ganho'])
+    vendas_a = int(status_a.get('Ganho', 0))
+    vendas_b = int(status_b.get('Ganho', 0))
     
     # Render Cards
     c1, c2, c3, c4 = st.columns(4)
@@ -187,66 +213,30 @@ if sel_a and sel_b:
     
     st.divider()
 
-    # --- 2. GRÁFICO COMPARATIVO DE FUNIL ---
-    st.subheader("📊 Comparativo de Funil")
-    
-    # Agrupar Dados
-    ETAPAS = ["Sem contato", "Aguardando Resposta", "Confirmou Interesse", "Qualificado", "Reunião Agendada", "Reunião Realizada", "Follow-up", "negociação", "em aprovação", "faturado"]
-    
-    funil_a = df_a.groupby("Etapa").size().reindex(ETAPAS).fillna(0).reset_index(name="Qtd_A")
-    funil_b = df_b.groupby("Etapa").size().reindex(ETAPAS).fillna(0).reset_index(name="Qtd_B")
-    
-    df_funil_comp = pd.merge(funil_a, funil_b, on="Etapa")
-    
-    # Plotly Graph Objects para Barras Agrupadas
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        y=df_funil_comp['Etapa'], x=df_funil_comp['Qtd_A'],
-        name='Atual', orientation='h', marker_color='#22d3ee'
-    ))
-    fig.add_trace(go.Bar(
-        y=df_funil_comp['Etapa'], x=df_funil_comp['Qtd_B'],
-        name='Anterior', orientation='h', marker_color='#475569'
-    ))
+    with etapa("graficos"):
+        # --- 2. GRÁFICO COMPARATIVO DE FUNIL ---
+        st.subheader("📊 Comparativo de Funil")
     
-    fig.update_layout(
-        barmode='group', 
-        template="plotly_dark", 
-        paper_bgcolor="rgba(0,0,0,0)", 
-        plot_bgcolor="rgba(0,0,0,0)",
-        height=500,
-        legend=dict(orientation="h", y=1.1)
-    )
-    st.plotly_chart(fig, use_container_width=True)
+        # Agrupar Dados
+        ETAPAS = etapas_da_marca(res_a['marca_ref'].iloc[0] if not res_a.empty else None)
     
-    # --- 3. COMPARATIVO DE FONTES ---
-    st.subheader("📡 Variação de Fontes")
+        df_funil_comp = comparar_funil(res_a, res_b, ETAPAS)
     
-    top_fontes = df_a['Fonte'].value_counts().head(5).index.tolist()
+        st.plotly_chart(figura(grafico_funil, df_funil_comp), use_container_width=True)
     
-    # Filtrar apenas top 5 fontes do período atual para não poluir
-    df_fonte_a = df_a[df_a['Fonte'].isin(top_fontes)].groupby('Fonte').size().reset_index(name='Qtd_A')
-    df_fonte_b = df_b[df_b['Fonte'].isin(top_fontes)].groupby('Fonte').size().reset_index(name='Qtd_B')
+        # --- 3. COMPARATIVO DE FONTES ---
+        st.subheader("📡 Variação de Fontes")
     
-    df_fonte_comp = pd.merge(df_fonte_a, df_fonte_b, on="Fonte", how='outer').fillna(0)
+        # Apenas as top 5 fontes do período atual, para não poluir
+        df_fonte_comp = comparar_fontes(res_a, res_b, top=5)
     
-    col_gf1, col_gf2 = st.columns(2)
+        col_gf1, col_gf2 = st.columns(2)
     
-    with col_gf1:
-        fig_f = go.Figure()
-        fig_f.add_trace(go.Bar(
-            x=df_fonte_comp['Fonte'], y=df_fonte_comp['Qtd_A'],
-            name='Atual', marker_color='#818cf8'
-        ))
-        fig_f.add_trace(go.Bar(
-            x=df_fonte_comp['Fonte'], y=df_fonte_comp['Qtd_B'],
-            name='Anterior', marker_color='#475569'
-        ))
-        fig_f.update_layout(barmode='group', template="plotly_dark", paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
-        st.plotly_chart(fig_f, use_container_width=True)
+        with col_gf1:
+            st.plotly_chart(figura(grafico_fontes, df_fonte_comp), use_container_width=True)
         
-    with col_gf2:
-        # Tabela de Delta
-        df_fonte_comp['Delta'] = df_fonte_comp['Qtd_A'] - df_fonte_comp['Qtd_B']
-        df_fonte_comp['Status'] = df_fonte_comp['Delta'].apply(lambda x: "🟢 Cresceu" if x > 0 else ("🔴 Caiu" if x < 0 else "🟡 Igual"))
-        st.dataframe(df_fonte_comp[['Fonte', 'Qtd_A', 'Qtd_B', 'Delta', 'Status']], use_container_width=True, hide_index=True)
+        with col_gf2:
+            # Tabela de Delta
+            st.dataframe(df_fonte_comp[['Fonte', 'Qtd_A', 'Qtd_B', 'Delta', 'Status']], use_container_width=True, hide_index=True)
+
+painel_debug()
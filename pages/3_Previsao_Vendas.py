@@ -1,127 +1,87 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import json
-import os
 from datetime import datetime
+from core.aquecimento import iniciar_aquecimento
+from core.armazenamento import obter_armazenamento
+from core.carregadores import aba_previsao
+from core.medicao import avisar_falha, falhou, iniciar, medido, painel_debug
+from core.previsao import (COLUNA_ID, COLUNAS_PADRAO, atualizar, completar_ids, garantir_ids, indexar,
+                           linhas_alteradas, mover, novo_id)
+from core.tema import aplicar_tema
 
 # =========================
 # CONFIGURAÇÃO DA PÁGINA
 # =========================
 st.set_page_config(page_title="Previsão de Vendas", layout="wide")
+iniciar("previsao")
+iniciar_aquecimento()  # só com BI_CRM_AQUECER=1; uma vez por processo
 
 # =========================
-# ESTILIZAÇÃO CSS (PREMIUM & UI IMPROVEMENTS)
+# ESTILIZAÇÃO CSS (static/css/previsao.css)
 # =========================
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@400;500;700;900&family=Rajdhani:wght@500;600;700&display=swap');
-.stApp { background-color: #0b0f1a; color: #e0e0e0; }
-
-/* Títulos */
-.futuristic-header {
-    font-family: 'Orbitron', sans-serif; font-size: 36px; font-weight: 900; text-transform: uppercase;
-    background: linear-gradient(90deg, #22d3ee 0%, #a855f7 100%);
-    -webkit-background-clip: text; -webkit-text-fill-color: transparent;
-    text-shadow: 0 0 20px rgba(34, 211, 238, 0.4); margin-bottom: 20px;
-}
-
-/* Mini Cards por Marca */
-.brand-mini-card {
-    background: #1e293b; border-left: 4px solid; padding: 15px; 
-    border-radius: 0 8px 8px 0; margin-bottom: 10px; display: flex; justify-content: space-between; align-items: center;
-}
-.bmc-label { font-family: 'Rajdhani'; font-weight: bold; font-size: 18px; color: #fff; }
-.bmc-val { font-family: 'Orbitron'; font-weight: bold; font-size: 20px; }
-
-/* Cores por contexto */
-.wait-color { border-color: #fbbf24; }
-.wait-text { color: #fbbf24; }
-.loss-color { border-color: #f87171; }
-.loss-text { color: #f87171; }
-
-/* Ajuste na Tabela Editável para ficar mais larga e limpa */
-div[data-testid="stDataEditor"] { 
-    border: 1px solid #334155; border-radius: 8px; overflow: hidden;
-}
-</style>
-""", unsafe_allow_html=True)
+aplicar_tema("previsao")
 
 # =========================
-# CONEXÃO GOOGLE SHEETS
+# CONSTANTES
 # =========================
-COLUNAS_PADRAO = ["Consultor", "Lead", "Cidade", "Campanha", "Marca", "Valor", "Data_Registro"]
-PLANILHA_NOME = "BI_Historico"
-
-def conectar_google():
-    try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds_json = os.environ.get("gcp_service_account") or st.secrets.get("gcp_service_account")
-        if not creds_json: 
-             creds = ServiceAccountCredentials.from_json_keyfile_name("credentials.json", scope)
-             return gspread.authorize(creds)
-        creds_dict = json.loads(creds_json)
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        return gspread.authorize(creds)
-    except: return None
+COLUNAS_ATIVOS = COLUNAS_PADRAO + [COLUNA_ID]
+COLUNAS_MOVIMENTO = COLUNAS_PADRAO + ["Data_Movimento", COLUNA_ID]
+armazenamento = obter_armazenamento()
 
 # =========================
 # FUNÇÕES DE BANCO DE DADOS
 # =========================
+@medido("carregar_aba")
 def carregar_aba(nome_aba):
-    client = conectar_google()
-    if not client: return pd.DataFrame(columns=COLUNAS_PADRAO)
     try:
-        sh = client.open(PLANILHA_NOME)
-        try: ws = sh.worksheet(nome_aba)
-        except: 
-            ws = sh.add_worksheet(nome_aba, 1000, 20)
-            ws.append_row(COLUNAS_PADRAO)
+        lido = aba_previsao(nome_aba)
+        if lido is None:
+            st.session_state.pop(f"_aba_{nome_aba}", None)
             return pd.DataFrame(columns=COLUNAS_PADRAO)
-
-        dados = ws.get_all_values()
-        if not dados: return pd.DataFrame(columns=COLUNAS_PADRAO)
-
-        header = [h.strip() for h in dados[0]]
-        if "Consultor" in header and "Valor" in header:
-            df = pd.DataFrame(dados[1:], columns=header)
-        else:
-            if len(dados[0]) >= len(COLUNAS_PADRAO):
-                 if dados[0][0] == "Consultor": 
-                     df = pd.DataFrame(dados[1:], columns=COLUNAS_PADRAO)
-                 else:
-                     df = pd.DataFrame(dados, columns=COLUNAS_PADRAO)
-            else:
-                 return pd.DataFrame(columns=COLUNAS_PADRAO)
-
-        if 'Valor' in df.columns:
-            df['Valor'] = df['Valor'].astype(str).str.replace('R$', '', regex=False).str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
-            df['Valor'] = pd.to_numeric(df['Valor'], errors='coerce').fillna(0.0)
-            
-        return df
-    except: return pd.DataFrame(columns=COLUNAS_PADRAO)
-
-def salvar_full(nome_aba, df):
-    client = conectar_google()
-    sh = client.open(PLANILHA_NOME)
-    try: ws = sh.worksheet(nome_aba)
-    except: ws = sh.add_worksheet(nome_aba, 1000, 20)
-    ws.clear()
-    df_save = df.copy().astype(str)
-    ws.update([df_save.columns.values.tolist()] + df_save.values.tolist())
-
+        df, primeira_linha, cabecalho_ok = lido
+
+        # Estado carregado (indexado pela linha da planilha) para o salvar_abas enviar só o diff.
+        # Guardado antes do garantir_ids: linhas sem ID na aba contam como alteradas e o ID é gravado.
+        st.session_state[f"_aba_{nome_aba}"] = (df.set_axis(range(primeira_linha, primeira_linha + len(df))), cabecalho_ok)
+        # O frame é o mesmo para todas as sessões: cada uma trabalha numa cópia
+        return garantir_ids(df.copy())
+    except Exception as e:
+        # Sem o estado antigo: um diff contra ele poderia apagar a aba a partir de um frame vazio
+        st.session_state.pop(f"_aba_{nome_aba}", None)
+        avisar_falha(e, f"a aba {nome_aba}")
+        return pd.DataFrame(columns=COLUNAS_PADRAO)
+
+@medido("salvar_abas")
+def salvar_abas(abas):
+    """Grava {aba: frame} numa transação só (na planilha, o diff de todas as abas
+    vai num único values_batch_update), então o movimento entre abas entra inteiro ou não entra."""
+    estados = armazenamento.gravar_abas(abas, {nome_aba: st.session_state.get(f"_aba_{nome_aba}") for nome_aba in abas})
+    # Linhas mantidas não mudam de lugar na planilha: guarda onde cada uma ficou de fato
+    for nome_aba, estado in estados.items():
+        st.session_state[f"_aba_{nome_aba}"] = estado
+
+@medido("adicionar_lead")
 def adicionar_lead(dados):
-    client = conectar_google()
-    sh = client.open(PLANILHA_NOME)
-    try: ws = sh.worksheet("previsao_ativa")
-    except: ws = sh.add_worksheet("previsao_ativa", 1000, 20)
-    
-    vals = ws.get_all_values()
-    if not vals: ws.append_row(COLUNAS_PADRAO)
-    elif vals[0][0] != "Consultor": ws.insert_row(COLUNAS_PADRAO, 1)
-    
-    ws.append_row(dados)
+    armazenamento.acrescentar("previsao_ativa", COLUNAS_ATIVOS, [dados + [novo_id()]])
+
+def vista_estavel(chave_editor, df):
+    # Enquanto o editor tiver edições pendentes, reexibe as mesmas linhas: o
+    # data_editor aplica as edições por posição, e a aba pode ter mudado em outra sessão
+    pendente = st.session_state.get(chave_editor) or {}
+    guardada = st.session_state.get(f"_vista_{chave_editor}")
+    if guardada is not None and any(pendente.get(k) for k in ("edited_rows", "added_rows", "deleted_rows")):
+        return guardada.copy()
+    st.session_state[f"_vista_{chave_editor}"] = df
+    return df.copy()
+
+def limpar_editores(prefixo):
+    for chave in [k for k in st.session_state if str(k).startswith(prefixo)]:
+        del st.session_state[chave]
+
+def avisar_conflitos(conflitos):
+    # Mostrado depois do st.rerun(), no topo do painel
+    if conflitos:
+        st.session_state["_aviso_previsao"] = f"{len(conflitos)} lead(s) já tinham sido movidos por outra sessão e foram ignorados."
 
 # =========================
 # UI - CADASTRO
@@ -149,6 +109,8 @@ with st.sidebar.form("form_add"):
 # PAINEL PRINCIPAL
 # =========================
 st.markdown('<div class="futuristic-header">🔮 Painel de Previsão de Vendas</div>', unsafe_allow_html=True)
+if "_aviso_previsao" in st.session_state:
+    st.warning(st.session_state.pop("_aviso_previsao"))
 
 # 1. Filtro Global
 col_filter, _ = st.columns([1, 3])
@@ -159,6 +121,14 @@ with col_filter:
 df_ativos = carregar_aba("previsao_ativa")
 df_prorrog = carregar_aba("prorrogacao")
 df_desist = carregar_aba("desistencia")
+# Aba que não carregou aparece vazia: mover/restaurar a partir dela gravaria o vazio por cima
+escrita_bloqueada = falhou()
+if escrita_bloqueada:
+    st.info("Gravação desativada até as abas carregarem. Recarregue a página em instantes.")
+
+# Índice por ID das três abas: mover/restaurar mexe só nas linhas escolhidas,
+# sem reconstruir as abas a partir do que está (ou não) visível no filtro
+loja = {"previsao_ativa": indexar(df_ativos), "prorrogacao": indexar(df_prorrog), "desistencia": indexar(df_desist)}
 
 def filtrar_dados(df):
     if filtro_marca != "TODAS" and not df.empty and "Marca" in df.columns:
@@ -184,7 +154,7 @@ with tab1:
 
     if not df_ativos.empty:
         # Garante a coluna Ação antes de exibir
-        df_view_edit = df_view.copy()
+        df_view_edit = vista_estavel(f"editor_ativos_v2_{filtro_marca}", df_view)
         df_view_edit['Ação'] = "Manter" 
 
         # CONFIGURAÇÃO AMIGÁVEL DA TABELA
@@ -204,7 +174,8 @@ with tab1:
             "Cidade": st.column_config.TextColumn("Cidade", width="small"),
             "Campanha": st.column_config.TextColumn("Campanha", width="small"),
             # Esconde colunas técnicas para deixar amigável
-            "Data_Registro": st.column_config.Column(None, width="small", disabled=True) 
+            "Data_Registro": st.column_config.Column(None, width="small", disabled=True),
+            COLUNA_ID: None,
         }
 
         # Ordem amigável das colunas
@@ -217,49 +188,38 @@ with tab1:
             num_rows="dynamic",
             use_container_width=True,
             hide_index=True,
-            key="editor_ativos_v2"
+            key=f"editor_ativos_v2_{filtro_marca}"
         )
         
         col_act, _ = st.columns([1, 4])
-        if col_act.button("⚡ Processar Alterações", type="primary"):
+        if col_act.button("⚡ Processar Alterações", type="primary", disabled=escrita_bloqueada):
             with st.spinner("Movendo leads..."):
-                # Separa os grupos baseado na edição
-                prorrogados = df_editado[df_editado['Ação'] == 'Prorrogar']
-                desistentes = df_editado[df_editado['Ação'] == 'Desistência']
-                # Quem fica: quem está marcado como Manter
-                mantidos = df_editado[df_editado['Ação'] == 'Manter']
-
-                # Lógica de Salvamento dos Ativos (Preservando quem estava oculto pelo filtro)
-                cols_save = COLUNAS_PADRAO
-                
-                if filtro_marca != "TODAS":
-                    # Recupera o que estava escondido
-                    df_hidden = df_ativos[df_ativos['Marca'] != filtro_marca]
-                    df_final_ativos = pd.concat([df_hidden, mantidos[cols_save]])
-                else:
-                    df_final_ativos = mantidos[cols_save]
-                
-                salvar_full("previsao_ativa", df_final_ativos)
-
-                # Append Prorrogações
-                if not prorrogados.empty:
-                    df_p = carregar_aba("prorrogacao")
-                    prorrogados = prorrogados.assign(Data_Movimento=datetime.now().strftime("%d/%m/%Y"))
-                    cols_p = COLUNAS_PADRAO + ['Data_Movimento']
-                    # Garante que as colunas existem no concat
-                    if df_p.empty: df_p = pd.DataFrame(columns=cols_p)
-                    df_p_new = pd.concat([df_p, prorrogados[cols_p]])
-                    salvar_full("prorrogacao", df_p_new)
-
-                # Append Desistências
-                if not desistentes.empty:
-                    df_d = carregar_aba("desistencia")
-                    desistentes = desistentes.assign(Data_Movimento=datetime.now().strftime("%d/%m/%Y"))
-                    cols_d = COLUNAS_PADRAO + ['Data_Movimento']
-                    if df_d.empty: df_d = pd.DataFrame(columns=cols_d)
-                    df_d_new = pd.concat([df_d, desistentes[cols_d]])
-                    salvar_full("desistencia", df_d_new)
+                hoje = datetime.now().strftime("%d/%m/%Y")
+                df_editado = completar_ids(df_editado)
+                vistos = df_view_edit[COLUNA_ID].astype(str)
+                conhecidos = df_editado[COLUNA_ID].astype(str).isin(vistos)
 
+                prorrogados = df_editado[df_editado['Ação'] == 'Prorrogar'].assign(Data_Movimento=hoje)
+                desistentes = df_editado[df_editado['Ação'] == 'Desistência'].assign(Data_Movimento=hoje)
+                mantidos = df_editado[df_editado['Ação'] == 'Manter']
+                alterados = linhas_alteradas(mantidos, df_view_edit, COLUNAS_PADRAO)
+
+                conflitos = mover(loja, prorrogados, "previsao_ativa", "prorrogacao", COLUNAS_MOVIMENTO)
+                conflitos += mover(loja, desistentes, "previsao_ativa", "desistencia", COLUNAS_MOVIMENTO)
+                # Linhas apagadas no editor saem da aba; as ocultas pelo filtro nem são tocadas
+                apagados = vistos[~vistos.isin(df_editado[COLUNA_ID].astype(str))]
+                loja["previsao_ativa"] = loja["previsao_ativa"].drop(apagados, errors="ignore")
+                conflitos += atualizar(loja, "previsao_ativa",
+                                       mantidos[conhecidos.loc[mantidos.index] & alterados],
+                                       mantidos[~conhecidos.loc[mantidos.index]], COLUNAS_ATIVOS)
+
+                abas = {"previsao_ativa": loja["previsao_ativa"][COLUNAS_ATIVOS]}
+                if not prorrogados.empty: abas["prorrogacao"] = loja["prorrogacao"][COLUNAS_MOVIMENTO]
+                if not desistentes.empty: abas["desistencia"] = loja["desistencia"][COLUNAS_MOVIMENTO]
+                salvar_abas(abas)
+
+                limpar_editores("editor_ativos_v2")
+                avisar_conflitos(conflitos)
                 st.success("Painel atualizado!")
                 st.rerun()
     else:
@@ -290,7 +250,7 @@ with tab2:
         
         for m in marcas_presentes:
             # Sub-dataframe da marca
-            df_m = df_p_filtrado[df_p_filtrado['Marca'] == m].copy()
+            df_m = vista_estavel(f"editor_prorrog_{m}", df_p_filtrado[df_p_filtrado['Marca'] == m])
             total_m = df_m['Valor'].sum()
             
             # MINI CARD DA MARCA
@@ -307,9 +267,10 @@ with tab2:
                 column_config={
                     "Resgatar": st.column_config.CheckboxColumn("Voltar?", width="small", default=False),
                     "Valor": st.column_config.NumberColumn(format="R$ %.2f"),
-                    "Data_Movimento": st.column_config.TextColumn("Data Prorrog.", width="small")
+                    "Data_Movimento": st.column_config.TextColumn("Data Prorrog.", width="small"),
+                    COLUNA_ID: None,
                 },
-                disabled=COLUNAS_PADRAO + ["Data_Movimento"],
+                disabled=COLUNAS_MOVIMENTO,
                 hide_index=True,
                 key=f"editor_prorrog_{m}"
             )
@@ -317,35 +278,16 @@ with tab2:
         
         # Botão Único de Ação no Final
         st.divider()
-        if st.button("🔄 Restaurar Leads Selecionados (Todas as Marcas acima)"):
-            leads_para_resgatar = pd.DataFrame()
-            leads_para_ficar = pd.DataFrame()
-            
-            # Junta tudo que foi editado
-            for m in marcas_presentes:
-                df_edited_m = edicoes_p[m]
-                resgatar = df_edited_m[df_edited_m['Resgatar'] == True]
-                ficar = df_edited_m[df_edited_m['Resgatar'] == False]
-                
-                leads_para_resgatar = pd.concat([leads_para_resgatar, resgatar])
-                leads_para_ficar = pd.concat([leads_para_ficar, ficar])
-            
-            # Executa Movimento
+        if st.button("🔄 Restaurar Leads Selecionados (Todas as Marcas acima)", disabled=escrita_bloqueada):
+            # Só os marcados: o resto da aba (inclusive outras marcas) fica como está
+            leads_para_resgatar = pd.concat([e[e['Resgatar'] == True] for e in edicoes_p.values()])
+
             if not leads_para_resgatar.empty:
-                # 1. Adiciona em Ativos
-                df_a = carregar_aba("previsao_ativa")
-                df_a_new = pd.concat([df_a, leads_para_resgatar[COLUNAS_PADRAO]])
-                salvar_full("previsao_ativa", df_a_new)
-                
-                # 2. Atualiza Prorrogação
-                # Precisamos manter os leads de marcas que NÃO apareceram na tela (se houve filtro)
-                if filtro_marca != "TODAS":
-                    outras_marcas = df_prorrog[df_prorrog['Marca'] != filtro_marca]
-                    df_p_final = pd.concat([outras_marcas, leads_para_ficar]).drop(columns=['Resgatar'])
-                else:
-                    df_p_final = leads_para_ficar.drop(columns=['Resgatar'])
-                
-                salvar_full("prorrogacao", df_p_final)
+                conflitos = mover(loja, leads_para_resgatar, "prorrogacao", "previsao_ativa", COLUNAS_ATIVOS)
+                salvar_abas({"previsao_ativa": loja["previsao_ativa"][COLUNAS_ATIVOS],
+                             "prorrogacao": loja["prorrogacao"][COLUNAS_MOVIMENTO]})
+                limpar_editores("editor_prorrog_")
+                avisar_conflitos(conflitos)
                 st.success("Leads restaurados!")
                 st.rerun()
             else:
@@ -366,7 +308,7 @@ with tab3:
         edicoes_d = {}
         
         for m in marcas_presentes_d:
-            df_m_d = df_d_filtrado[df_d_filtrado['Marca'] == m].copy()
+            df_m_d = vista_estavel(f"editor_desist_{m}", df_d_filtrado[df_d_filtrado['Marca'] == m])
             total_m_d = df_m_d['Valor'].sum()
             
             # MINI CARD DA MARCA
@@ -382,41 +324,30 @@ with tab3:
                 column_config={
                     "Recuperar": st.column_config.CheckboxColumn("Recuperar?", width="small", default=False),
                     "Valor": st.column_config.NumberColumn(format="R$ %.2f"),
-                    "Data_Movimento": st.column_config.TextColumn("Data Perda", width="small")
+                    "Data_Movimento": st.column_config.TextColumn("Data Perda", width="small"),
+                    COLUNA_ID: None,
                 },
-                disabled=COLUNAS_PADRAO + ["Data_Movimento"],
+                disabled=COLUNAS_MOVIMENTO,
                 hide_index=True,
                 key=f"editor_desist_{m}"
             )
             st.write("")
 
         st.divider()
-        if st.button("♻️ Resgatar Leads Perdidos (Todas as Marcas acima)"):
-            resgatar_d_total = pd.DataFrame()
-            ficar_d_total = pd.DataFrame()
-            
-            for m in marcas_presentes_d:
-                df_e = edicoes_d[m]
-                resgatar_d_total = pd.concat([resgatar_d_total, df_e[df_e['Recuperar'] == True]])
-                ficar_d_total = pd.concat([ficar_d_total, df_e[df_e['Recuperar'] == False]])
-            
+        if st.button("♻️ Resgatar Leads Perdidos (Todas as Marcas acima)", disabled=escrita_bloqueada):
+            resgatar_d_total = pd.concat([e[e['Recuperar'] == True] for e in edicoes_d.values()])
+
             if not resgatar_d_total.empty:
-                # 1. Add Ativos
-                df_a = carregar_aba("previsao_ativa")
-                df_a_new = pd.concat([df_a, resgatar_d_total[COLUNAS_PADRAO]])
-                salvar_full("previsao_ativa", df_a_new)
-                
-                # 2. Remove Desistencia
-                if filtro_marca != "TODAS":
-                    outras = df_desist[df_desist['Marca'] != filtro_marca]
-                    final = pd.concat([outras, ficar_d_total]).drop(columns=['Recuperar'])
-                else:
-                    final = ficar_d_total.drop(columns=['Recuperar'])
-                
-                salvar_full("desistencia", final)
+                conflitos = mover(loja, resgatar_d_total, "desistencia", "previsao_ativa", COLUNAS_ATIVOS)
+                salvar_abas({"previsao_ativa": loja["previsao_ativa"][COLUNAS_ATIVOS],
+                             "desistencia": loja["desistencia"][COLUNAS_MOVIMENTO]})
+                limpar_editores("editor_desist_")
+                avisar_conflitos(conflitos)
                 st.success("Leads resgatados do cemitério!")
                 st.rerun()
             else:
                 st.warning("Selecione alguém para resgatar.")
     else:
         st.info("Nenhuma desistência registrada.")
+
+painel_debug()
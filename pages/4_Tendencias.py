@@ -0,0 +1,148 @@
+import streamlit as st
+import pandas as pd
+from core.aquecimento import iniciar_aquecimento
+from core import carregadores
+from core.armazenamento import carregar_historico
+from core.cache_snapshots import ABA_SNAPSHOTS
+from core.compartilhado import dados_compartilhados
+from core.graficos import figura
+from core.medicao import avisar_falha, etapa, falhou, iniciar, medido, painel_debug
+from core.resumo import resumir_historico
+from core.status import classificar_status
+from core.tendencias import KPIS, tendencias
+from core.tema import aplicar_tema
+
+# =========================
+# CONFIGURAÇÃO DA PÁGINA
+# =========================
+st.set_page_config(page_title="BI CRM Expansão - Tendências", layout="wide")
+iniciar("tendencias")
+iniciar_aquecimento()  # só com BI_CRM_AQUECER=1; uma vez por processo
+
+# =========================
+# ESTILIZAÇÃO CSS (static/css/tendencias.css)
+# =========================
+aplicar_tema("tendencias")
+
+# =========================
+# FUNÇÕES DE UI
+# =========================
+def subheader_futurista(icon, text):
+    st.markdown(f'<div class="futuristic-sub"><span class="sub-icon">{icon}</span>{text}</div>', unsafe_allow_html=True)
+
+def card(title, value):
+    st.markdown(f'<div class="card"><div class="card-title">{title}</div><div class="card-value">{value}</div></div>', unsafe_allow_html=True)
+
+# =========================
+# LÓGICA DE DADOS
+# =========================
+def resumir_historico_bruto():
+    # Sem st.* aqui: o cache compartilhado pode chamar de qualquer thread
+    df_hist = carregar_historico()
+    if not df_hist.empty and "Status" not in df_hist.columns:
+        df_hist["Status"] = classificar_status(df_hist)
+    return resumir_historico(df_hist)
+
+@medido("resumo")
+def get_resumo():
+    # Resumo pré-agregado gravado pela Home; sem ele, agrega o histórico bruto
+    try:
+        df_resumo = carregadores.resumo()
+    except Exception as e:
+        avisar_falha(e, "o resumo")
+        df_resumo = pd.DataFrame()
+    if df_resumo.empty:
+        try:
+            df_resumo = dados_compartilhados(("tendencias", "resumo_do_historico"), resumir_historico_bruto,
+                                             abas=(ABA_SNAPSHOTS,))
+        except Exception as e:
+            avisar_falha(e, "o histórico")
+            df_resumo = pd.DataFrame()
+    return df_resumo
+
+def em_linhas(df, colunas, nome):
+    # Largo (uma coluna por métrica) -> longo, para o plotly colorir por métrica/marca
+    return df.reset_index().melt(id_vars=["snapshot_id", "marca_ref", "semana_ref", "data_salvamento"],
+                                 value_vars=colunas, var_name=nome, value_name="Qtd")
+
+# =========================
+# GRÁFICOS (memoizados em core.graficos pela impressão dos dados)
+# =========================
+def grafico_kpi(kpis, indicador):
+    import plotly.express as px  # carregado só quando há gráfico para desenhar
+    fig_kpi = px.line(kpis.reset_index(), x="data_salvamento", y=indicador, color="marca_ref", markers=True,
+                      hover_data=["semana_ref"])
+    fig_kpi.update_layout(template="plotly_dark", paper_bgcolor="rgba(0,0,0,0)", legend_title_text="Marca")
+    return fig_kpi
+
+def grafico_funil(funil_m, etapas):
+    import plotly.express as px
+    fig_funil = px.line(em_linhas(funil_m, etapas, "Etapa"), x="data_salvamento", y="Qtd", color="Etapa", markers=True)
+    fig_funil.update_layout(template="plotly_dark", paper_bgcolor="rgba(0,0,0,0)")
+    return fig_funil
+
+def grafico_fontes(fontes_m, nomes_fonte):
+    import plotly.express as px
+    fig_fonte = px.bar(em_linhas(fontes_m, nomes_fonte, "Fonte"), x="data_salvamento", y="Qtd", color="Fonte",
+                       color_discrete_sequence=px.colors.sequential.Blues_r)
+    fig_fonte.update_layout(template="plotly_dark", paper_bgcolor="rgba(0,0,0,0)", barmode="stack")
+    return fig_fonte
+
+# =========================
+# APP MAIN
+# =========================
+st.markdown('<div class="futuristic-title">📈 TENDÊNCIAS</div>', unsafe_allow_html=True)
+
+df_resumo = get_resumo()
+
+if df_resumo.empty:
+    # Falha de carga já foi avisada: não dizer que o histórico está vazio
+    if not falhou(): st.warning("⚠️ O histórico está vazio. Salve arquivos na Home primeiro.")
+    st.stop()
+
+marcas_disponiveis = sorted(df_resumo['marca_ref'].astype(str).unique())
+marcas_sel = st.sidebar.multiselect("Marcas", marcas_disponiveis, default=marcas_disponiveis)
+semanas_disponiveis = sorted(df_resumo['semana_ref'].astype(str).unique())
+semanas_sel = st.sidebar.multiselect("Semanas Ref.", semanas_disponiveis, default=semanas_disponiveis)
+
+df_sel = df_resumo[df_resumo['marca_ref'].astype(str).isin(marcas_sel) & df_resumo['semana_ref'].astype(str).isin(semanas_sel)]
+if df_sel.empty:
+    st.info("Nenhum snapshot para os filtros escolhidos.")
+    st.stop()
+
+# Uma passada sobre o resumo para todos os snapshots; os gráficos só fatiam o resultado
+with etapa("tendencias", linhas=len(df_sel)):
+    kpis, funil, fontes = tendencias(df_sel)
+
+with etapa("graficos"):
+    # --- 1. KPIs DO ÚLTIMO SNAPSHOT DE CADA MARCA ---
+    ultimos = kpis.groupby(kpis['marca_ref'].astype(str), sort=False).tail(1)
+    colunas = st.columns(len(KPIS))
+    for coluna, nome in zip(colunas, KPIS):
+        with coluna: card(f"{nome} (último)", int(ultimos[nome].sum()))
+
+    # --- 2. EVOLUÇÃO DOS INDICADORES ---
+    subheader_futurista("📊", "EVOLUÇÃO DOS INDICADORES")
+    indicador = st.radio("Indicador", list(KPIS), horizontal=True)
+    st.plotly_chart(figura(grafico_kpi, kpis, indicador), use_container_width=True)
+
+    # --- 3. FUNIL E FONTES DE UMA MARCA ---
+    marca_foco = st.selectbox("Marca em foco (funil e fontes)", marcas_sel)
+    col_funil, col_fonte = st.columns(2)
+
+    with col_funil:
+        subheader_futurista("📉", "FUNIL ACUMULADO POR ETAPA")
+        funil_m = funil[funil['marca_ref'].astype(str) == marca_foco].dropna(axis=1, how="all")
+        etapas = [c for c in funil_m.columns if c not in ("marca_ref", "semana_ref", "data_salvamento")]
+        st.plotly_chart(figura(grafico_funil, funil_m, etapas), use_container_width=True)
+
+    with col_fonte:
+        subheader_futurista("📡", "TOP FONTES")
+        fontes_m = fontes[fontes['marca_ref'].astype(str) == marca_foco]
+        nomes_fonte = [c for c in fontes_m.columns if c not in ("marca_ref", "semana_ref", "data_salvamento")]
+        if nomes_fonte:
+            st.plotly_chart(figura(grafico_fontes, fontes_m, nomes_fonte), use_container_width=True)
+        else:
+            st.info("Sem dados de Fonte nos snapshots desta marca.")
+
+painel_debug()
@@ -0,0 +1,11 @@
+import pytest
+
+from core import agendador
+
+
+@pytest.fixture(autouse=True)
+def cota_folgada(monkeypatch):
+    # Os baldes do agendador são do processo: sem isso, a cota de 60/min gasta por um
+    # teste faria os seguintes dormirem. Os testes do balde usam instâncias próprias.
+    monkeypatch.setattr(agendador, "_baldes", {"leitura": agendador.BaldeDeFichas(60_000),
+                                               "escrita": agendador.BaldeDeFichas(60_000)})
@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+
+from core import agendador
+
+
+class ErroHttp(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.response = type("Resposta", (), {"status_code": status})()
+
+
+class AbaFalsa:
+    """Métodos com os nomes do gspread; `erros` é a fila de exceções das próximas chamadas."""
+
+    def __init__(self, erros=()):
+        self.erros = list(erros)
+        self.chamadas = 0
+
+    def _responder(self, valor):
+        self.chamadas += 1
+        if self.erros: raise self.erros.pop(0)
+        return valor
+
+    def get(self, faixa):
+        return self._responder([[faixa]])
+
+    def update(self, values, range_name):
+        return self._responder(range_name)
+
+    def append_rows(self, linhas):
+        return self._responder(len(linhas))
+
+
+@pytest.fixture
+def pausas(monkeypatch):
+    dormidas = []
+    monkeypatch.setattr(agendador.time, "sleep", dormidas.append)
+    monkeypatch.setattr(agendador.random, "random", lambda: 0.5)  # sem jitter: pausa = base * 2**tentativa
+    return dormidas
+
+
+def test_balde_atende_a_rajada_e_depois_espera_a_reposicao(pausas):
+    balde = agendador.BaldeDeFichas(60, capacidade=2)
+    assert balde.retirar() == 0 and balde.retirar() == 0
+    espera = balde.retirar()
+    assert 0.9 < espera <= 1.0  # 60/min: uma ficha por segundo
+    assert pausas == [espera]
+    # Quem chega depois entra na fila atrás da ficha já reservada
+    assert 1.9 < balde.retirar() <= 2.0
+
+
+def test_balde_esvaziado_por_429_segura_a_proxima_chamada(pausas):
+    balde = agendador.BaldeDeFichas(60)
+    balde.esvaziar()
+    assert balde.retirar() > 0.9
+
+
+def test_leituras_iguais_em_voo_viram_uma_so():
+    aba, liberar = AbaFalsa(), threading.Event()
+    original = aba.get
+
+    def get(faixa):
+        liberar.wait(5)
+        return original(faixa)
+    get.__self__ = aba  # mesmo dono e nome que o método do gspread
+    aba.get = get
+
+    antes = agendador.CONTADORES["coalescidas"]
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(agendador.executar(aba.get, "A1:B2")))
+               for _ in range(4)]
+    for t in threads: t.start()
+    while agendador.CONTADORES["coalescidas"] - antes < 3:
+        threading.Event().wait(0.01)
+    liberar.set()
+    for t in threads: t.join(5)
+    assert aba.chamadas == 1
+    assert len(resultados) == 4 and all(r is resultados[0] for r in resultados)
+    # Terminada a leitura, a próxima vai de novo à origem
+    agendador.executar(aba.get, "A1:B2")
+    assert aba.chamadas == 2
+
+
+def test_erro_transitorio_repete_com_backoff_exponencial(pausas):
+    aba = AbaFalsa([ErroHttp(503), ErroHttp(500), ErroHttp(502)])
+    assert agendador.executar(aba.get, "A1", espera_base=1.0) == [["A1"]]
+    assert aba.chamadas == 4
+    assert pausas == [1.0, 2.0, 4.0]
+
+
+def test_backoff_respeita_a_espera_maxima(pausas):
+    aba = AbaFalsa([ErroHttp(503)] * 4)
+    agendador.executar(aba.get, "A1", espera_base=1.0, espera_max=3.0)
+    assert pausas == [1.0, 2.0, 3.0, 3.0]
+
+
+def test_429_em_todas_as_tentativas_vira_cota_esgotada(pausas):
+    aba = AbaFalsa([ErroHttp(429)] * 3)
+    with pytest.raises(agendador.CotaEsgotada):
+        agendador.executar(aba.get, "A1", tentativas=3)
+    assert aba.chamadas == 3
+    # Cada 429 esvazia o balde: além do backoff, a chamada seguinte espera a reposição
+    assert agendador._baldes["leitura"].fichas <= 0
+
+
+def test_erro_permanente_sobe_sem_repetir(pausas):
+    aba = AbaFalsa([ErroHttp(400)])
+    with pytest.raises(ErroHttp):
+        agendador.executar(aba.get, "A1")
+    assert aba.chamadas == 1
+
+
+def test_escrita_idempotente_repete_em_5xx(pausas):
+    aba = AbaFalsa([ErroHttp(503)])
+    assert agendador.executar(aba.update, values=[[1]], range_name="A1") == "A1"
+    assert aba.chamadas == 2
+
+
+def test_append_nao_repete_em_5xx_mas_repete_em_429(pausas):
+    aba = AbaFalsa([ErroHttp(503)])
+    with pytest.raises(ErroHttp):
+        agendador.executar(aba.append_rows, [[1], [2]])
+    assert aba.chamadas == 1
+
+    # 429: a API recusou antes de gravar, então repetir não duplica
+    aba = AbaFalsa([ErroHttp(429)])
+    assert agendador.executar(aba.append_rows, [[1], [2]]) == 2
+    assert aba.chamadas == 2
@@ -0,0 +1,56 @@
+import re
+
+import pytest
+
+from core import cache_snapshots
+
+
+class PlanilhaFalsa:
+    """Só o que o _sincronizar usa de um gspread.Worksheet."""
+
+    def __init__(self, header):
+        self.linhas = [list(header)]
+
+    def row_values(self, n):
+        return list(self.linhas[n - 1]) if len(self.linhas) >= n else []
+
+    def get_all_values(self):
+        return [list(l) for l in self.linhas]
+
+    def get(self, faixa):
+        inicio = int(re.match(r"A(\d+):", faixa).group(1))
+        return [list(l) for l in self.linhas[inicio - 1:]]
+
+
+@pytest.fixture
+def planilha(tmp_path, monkeypatch):
+    ws = PlanilhaFalsa(["snapshot_id", "Marca", "Etapa"])
+    monkeypatch.setattr(cache_snapshots, "CAMINHO_CACHE", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(cache_snapshots, "abrir_aba", lambda aba: ws)
+    return ws
+
+
+def _salvar(ws, snapshot_id, de, ate):
+    ws.linhas += [[snapshot_id, "Microlins", f"etapa {i}"] for i in range(de, ate)]
+
+
+def test_sync_no_meio_do_save_completa_o_snapshot_depois(planilha):
+    _salvar(planilha, "20260101_100000", 0, 3)
+    assert len(cache_snapshots.carregar_aba_cacheada("db_snapshots", ttl=0)) == 3
+
+    # Sincroniza entre um envio e outro do save seguinte (ou antes de ele ser retomado)
+    _salvar(planilha, "20260102_100000", 0, 2)
+    assert len(cache_snapshots.carregar_aba_cacheada("db_snapshots", ttl=0)) == 5
+
+    _salvar(planilha, "20260102_100000", 2, 9)
+    df = cache_snapshots.carregar_aba_cacheada("db_snapshots", ttl=0)
+    assert len(df) == len(planilha.linhas) - 1 == 12
+    assert (df["snapshot_id"] == "20260102_100000").sum() == 9
+    assert sorted(df["Etapa"][df["snapshot_id"] == "20260102_100000"]) == sorted(f"etapa {i}" for i in range(9))
+
+
+def test_sync_sem_linhas_novas_nao_duplica(planilha):
+    _salvar(planilha, "20260101_100000", 0, 4)
+    cache_snapshots.carregar_aba_cacheada("db_snapshots", ttl=0)
+    df = cache_snapshots.carregar_aba_cacheada("db_snapshots", ttl=0)
+    assert len(df) == 4
@@ -0,0 +1,120 @@
+import threading
+
+import pytest
+
+from core import compartilhado
+from core.compartilhado import CacheCompartilhado
+
+
+class Carregador:
+    """carregar() que conta as chamadas e pode segurar até `liberar` ser setado."""
+
+    def __init__(self, segurar=False):
+        self.chamadas = 0
+        self.liberar = threading.Event()
+        if not segurar: self.liberar.set()
+        self.erro = None
+
+    def __call__(self):
+        self.chamadas += 1
+        self.liberar.wait(5)
+        if self.erro is not None: raise self.erro
+        return {"versao": self.chamadas}
+
+
+@pytest.fixture
+def cache():
+    # Renovador parado na prática: os testes chamam renovar() quando querem uma passada
+    return CacheCompartilhado(ttl=60, intervalo=3600)
+
+
+def _em_paralelo(cache, chave, carregar, n, abas=()):
+    resultados, erros = [], []
+
+    def obter():
+        try:
+            resultados.append(cache.obter(chave, carregar, abas=abas))
+        except Exception as e:
+            erros.append(e)
+    threads = [threading.Thread(target=obter) for _ in range(n)]
+    for t in threads: t.start()
+    return threads, resultados, erros
+
+
+def _esperar_fila(cache, n):
+    while cache.contadores["esperas"] < n:
+        threading.Event().wait(0.01)
+
+
+def test_faltas_simultaneas_carregam_uma_vez_so(cache):
+    carregar = Carregador(segurar=True)
+    threads, resultados, _ = _em_paralelo(cache, "k", carregar, 5)
+    _esperar_fila(cache, 4)
+    carregar.liberar.set()
+    for t in threads: t.join(5)
+    assert carregar.chamadas == 1
+    assert len(resultados) == 5 and all(r is resultados[0] for r in resultados)
+    assert cache.contadores["faltas"] == 1 and cache.contadores["esperas"] == 4
+    assert cache.obter("k", carregar) is resultados[0]
+    assert cache.contadores["acertos"] == 1
+
+
+def test_erro_chega_a_todos_e_a_proxima_leitura_tenta_de_novo(cache):
+    carregar = Carregador(segurar=True)
+    carregar.erro = RuntimeError("cota")
+    threads, resultados, erros = _em_paralelo(cache, "k", carregar, 3)
+    _esperar_fila(cache, 2)
+    carregar.liberar.set()
+    for t in threads: t.join(5)
+    assert carregar.chamadas == 1 and resultados == [] and len(erros) == 3
+
+    carregar.erro = None
+    assert cache.obter("k", carregar) == {"versao": 2}
+
+
+def test_invalidar_recarrega_so_quem_depende_da_aba(cache):
+    snapshots, previsao = Carregador(), Carregador()
+    cache.obter("historico", snapshots, abas=("db_snapshots",))
+    cache.obter("previsao", previsao, abas=("Previsão",))
+    cache.invalidar("db_snapshots")
+    assert cache.obter("historico", snapshots, abas=("db_snapshots",)) == {"versao": 2}
+    assert cache.obter("previsao", previsao, abas=("Previsão",)) == {"versao": 1}
+
+
+def test_invalidado_no_meio_da_carga_recarrega_na_proxima_leitura(cache):
+    carregar = Carregador(segurar=True)
+    threads, resultados, _ = _em_paralelo(cache, "k", carregar, 1, abas=("db_snapshots",))
+    while carregar.chamadas == 0:
+        threading.Event().wait(0.01)
+    cache.invalidar("db_snapshots")  # gravação enquanto a leitura estava em voo
+    carregar.liberar.set()
+    for t in threads: t.join(5)
+    assert resultados == [{"versao": 1}]
+    assert cache.obter("k", carregar, abas=("db_snapshots",)) == {"versao": 2}
+
+
+def test_renovar_recarrega_entradas_em_uso_perto_de_vencer():
+    cache = CacheCompartilhado(ttl=0, intervalo=3600)
+    carregar = Carregador()
+    cache.obter("k", carregar)
+    cache.renovar()
+    assert carregar.chamadas == 2 and cache.contadores["renovacoes"] == 1
+
+
+def test_renovacao_que_falha_mantem_o_valor_e_nao_insiste_sem_acesso():
+    cache = CacheCompartilhado(ttl=0, intervalo=3600)
+    carregar = Carregador()
+    valor = cache.obter("k", carregar)
+    carregar.erro = RuntimeError("fora do ar")
+    cache.renovar()
+    cache.renovar()
+    assert carregar.chamadas == 2 and cache.contadores["falhas_renovacao"] == 1
+    assert cache._entradas["k"].valor is valor
+
+
+def test_entrada_ociosa_e_vencida_e_descartada(monkeypatch):
+    monkeypatch.setattr(compartilhado, "OCIOSO_SEGUNDOS", -1)
+    cache = CacheCompartilhado(ttl=0, intervalo=3600)
+    cache.obter("k", Carregador())
+    cache.renovar()
+    assert len(cache) == 0
@@ -0,0 +1,19 @@
+import pandas as pd
+
+from core.esquema import para_planilha, tipar
+
+
+def test_snapshot_id_tem_o_mesmo_dtype_com_ou_sem_ids_de_lote():
+    so_data_hora = tipar(pd.DataFrame({"snapshot_id": ["20260102_100000", "20260101_100000"]}))
+    com_lote = tipar(pd.DataFrame({"snapshot_id": ["20260101_100000_2", "20260101_100000", "20260101_100000_10"]}))
+    for df in (so_data_hora, com_lote):
+        assert isinstance(df["snapshot_id"].dtype, pd.CategoricalDtype) and df["snapshot_id"].cat.ordered
+    assert so_data_hora["snapshot_id"].sort_values().tolist() == ["20260101_100000", "20260102_100000"]
+    assert com_lote["snapshot_id"].sort_values().tolist() == ["20260101_100000", "20260101_100000_2",
+                                                              "20260101_100000_10"]
+
+
+def test_snapshot_id_volta_igual_para_a_planilha():
+    ids = ["20260101_100000_2", "20260101_100000", ""]
+    df = para_planilha(tipar(pd.DataFrame({"snapshot_id": ids, "Lead": ["a", "b", "c"]})))
+    assert df["snapshot_id"].tolist() == ids
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from core.compartilhado import CacheCompartilhado
+from core.lru import CacheLRU
+
+
+def _frame(n):
+    return pd.DataFrame({"Lead": range(n)})
+
+
+def test_descarta_os_menos_usados_ao_passar_do_limite():
+    cache = CacheLRU(limite_bytes=250, medir=len)
+    for chave in "abc":
+        cache.obter(chave, lambda: _frame(100))
+    assert "a" not in cache and cache.bytes == 200
+    cache.obter("b", lambda: _frame(100))  # b passa a ser o mais recente
+    cache.obter("d", lambda: _frame(100))
+    assert "c" not in cache and "b" in cache and "d" in cache
+    assert cache.bytes <= cache.limite_bytes
+    assert cache.contadores == {"acertos": 1, "faltas": 4, "descartes": 2}
+
+
+def test_item_maior_que_o_limite_fica_sozinho():
+    cache = CacheLRU(limite_bytes=50, medir=len)
+    cache.obter("a", lambda: _frame(10))
+    cache.obter("b", lambda: _frame(80))
+    assert len(cache) == 1 and "b" in cache
+
+
+def test_frame_vazio_nao_e_guardado():
+    cache = CacheLRU()
+    cache.obter("a", lambda: _frame(0))
+    assert "a" not in cache
+
+
+def test_gravacao_na_aba_limpa_o_cache_inscrito():
+    compartilhado = CacheCompartilhado()
+    cache = CacheLRU()
+    compartilhado.ao_invalidar(cache.limpar, "db_snapshots")
+    cache.obter("a", lambda: _frame(3))
+    compartilhado.invalidar("db_previsao")
+    assert "a" in cache
+    compartilhado.invalidar("db_snapshots")
+    assert len(cache) == 0 and cache.bytes == 0
+
+
+def test_carga_iniciada_antes_de_limpar_nao_e_guardada():
+    cache = CacheLRU()
+
+    def carregar_durante_gravacao():
+        cache.limpar()
+        return _frame(3)
+
+    assert len(cache.obter("a", carregar_durante_gravacao)) == 3
+    assert "a" not in cache
+    cache.obter("a", lambda: _frame(4))
+    assert len(cache.obter("a", lambda: _frame(5))) == 4
@@ -0,0 +1,39 @@
+import random
+import re
+
+import pandas as pd
+
+from core.previsao import linhas_para_planilha, planejar_escrita
+
+COLUNAS = ["Lead", "Valor"]
+
+
+def _aplicar(planilha, operacoes):
+    # planilha: {linha: [valores]}; aplica as operações como o values_batch_update
+    for op in operacoes:
+        inicio = int(re.match(r"[A-Z]+(\d+):", op["range"]).group(1))
+        for deslocamento, valores in enumerate(op["values"]):
+            planilha[inicio + deslocamento] = valores
+
+
+def _conteudo(planilha):
+    return sorted(tuple(v) for linha, v in planilha.items() if linha > 1 and any(v))
+
+
+def test_rodadas_seguidas_partem_do_layout_gravado():
+    sorteio = random.Random(7)
+    for _ in range(300):
+        leads = [f"L{i}" for i in range(sorteio.randint(0, 8))]
+        df = pd.DataFrame({"Lead": leads, "Valor": [float(sorteio.randint(0, 3)) for _ in leads]})
+        planilha = {1: COLUNAS, **{2 + i: v for i, v in enumerate(linhas_para_planilha(df))}}
+        estado = df.set_axis(range(2, 2 + len(df)))
+        for _ in range(2):
+            # Remove, duplica e reordena linhas, como mover/restaurar/editar na página
+            novo = df.sample(frac=1, random_state=sorteio.randint(0, 999))
+            novo = novo.iloc[:sorteio.randint(0, len(novo))]
+            novo = pd.concat([novo, df.sample(n=min(2, len(df)), random_state=1)], ignore_index=True)
+            operacoes, linhas = planejar_escrita(estado, novo)
+            _aplicar(planilha, operacoes)
+            assert _conteudo(planilha) == sorted(map(tuple, linhas_para_planilha(novo)))
+            assert [planilha[l] for l in linhas] == linhas_para_planilha(novo)
+            estado, df = novo.set_axis(linhas).sort_index(), novo
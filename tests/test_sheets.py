@@ -0,0 +1,41 @@
+import pandas as pd
+
+from core import sheets
+from core.previsao import planejar_escrita
+
+
+class PlanilhaFalsa:
+    def __init__(self):
+        self.envios = []
+
+    def values_batch_update(self, corpo):
+        self.envios.append(corpo)
+        return {"totalUpdatedRows": sum(len(d["values"]) for d in corpo["data"])}
+
+
+def _planilha(monkeypatch):
+    sh = PlanilhaFalsa()
+    monkeypatch.setattr(sheets, "abrir_planilha", lambda planilha: sh)
+    return sh
+
+
+def test_mover_entre_abas_vai_num_unico_values_batch_update(monkeypatch):
+    sh = _planilha(monkeypatch)
+    ativa = pd.DataFrame({"Lead": ["a", "b", "c"], "Valor": ["1", "2", "3"]})
+    estado = ativa.set_axis(range(2, 5))
+    # "b" sai da previsão ativa e entra no histórico (que ainda não tinha linhas)
+    operacoes = {"previsao_ativa": planejar_escrita(estado, ativa[ativa["Lead"] != "b"])[0],
+                 "historico_d'oeste": planejar_escrita(pd.DataFrame(columns=ativa.columns), ativa[ativa["Lead"] == "b"],
+                                                       cabecalho_ok=False)[0]}
+    sheets.gravar_em_lote(operacoes)
+    assert len(sh.envios) == 1
+    corpo = sh.envios[0]
+    assert corpo["valueInputOption"] == "RAW"
+    abas = {d["range"].split("!")[0] for d in corpo["data"]}
+    assert abas == {"'previsao_ativa'", "'historico_d''oeste'"}
+
+
+def test_sem_operacoes_nao_chama_a_api(monkeypatch):
+    sh = _planilha(monkeypatch)
+    assert sheets.gravar_em_lote({"previsao_ativa": []}) is None
+    assert sh.envios == []
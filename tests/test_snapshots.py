@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+
+from core import snapshots
+
+
+class ErroHttp(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.response = type("Resposta", (), {"status_code": status})()
+
+
+class PlanilhaFalsa:
+    """Só o que o salvar_snapshots usa de um gspread.Worksheet. `falhas` é uma fila de
+    (grava_antes_de_falhar, erro) aplicada aos próximos append_rows."""
+
+    col_count = 26
+
+    def __init__(self):
+        self.linhas = []
+        self.falhas = []
+        self.envios = 0
+
+    def row_values(self, n):
+        return list(self.linhas[n - 1]) if len(self.linhas) >= n else []
+
+    def append_row(self, linha):
+        self.linhas.append(list(linha))
+
+    def col_values(self, n):
+        return [l[n - 1] if len(l) >= n else "" for l in self.linhas]
+
+    def append_rows(self, linhas, value_input_option=None):
+        self.envios += 1
+        if self.falhas:
+            grava, erro = self.falhas.pop(0)
+            if grava: self.linhas += [list(l) for l in linhas]
+            raise erro
+        self.linhas += [list(l) for l in linhas]
+
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    monkeypatch.setattr(snapshots.time, "sleep", lambda segundos: None)
+
+
+def _snapshot(snapshot_id, n):
+    return pd.DataFrame({"snapshot_id": snapshot_id, "Lead": [f"{snapshot_id}-{i}" for i in range(n)]})
+
+
+def _leads(ws):
+    return [l[1] for l in ws.linhas[1:]]
+
+
+def test_bloco_gravado_mas_reportado_como_falha_nao_duplica_nem_perde():
+    ws = PlanilhaFalsa()
+    ws.falhas = [(True, ErroHttp(503))]
+    df = _snapshot("20260101_100000", 10)
+    enviadas = snapshots.salvar_snapshots(ws, {"20260101_100000": df}, linhas_por_envio=3)
+    assert _leads(ws) == df["Lead"].tolist()
+    assert enviadas == 10
+
+
+def test_timeout_repetido_em_varios_blocos_de_varios_snapshots():
+    ws = PlanilhaFalsa()
+    ws.falhas = [(False, ErroHttp(500)), (True, ErroHttp(503)), (True, ErroHttp(504)), (False, ErroHttp(429))]
+    lotes = {"20260101_100000": _snapshot("20260101_100000", 7), "20260102_100000": _snapshot("20260102_100000", 5)}
+    snapshots.salvar_snapshots(ws, lotes, linhas_por_envio=2)
+    esperado = lotes["20260101_100000"]["Lead"].tolist() + lotes["20260102_100000"]["Lead"].tolist()
+    assert _leads(ws) == esperado
+
+
+def test_erro_permanente_sobe_e_o_save_repetido_completa_so_o_que_faltou():
+    ws = PlanilhaFalsa()
+    df = _snapshot("20260101_100000", 6)
+    # Save anterior interrompido: só as 2 primeiras linhas entraram
+    snapshots.salvar_snapshots(ws, {"20260101_100000": df.iloc[:2]})
+    ws.falhas = [(False, ValueError("recusado"))]
+    with pytest.raises(ValueError):
+        snapshots.salvar_snapshots(ws, {"20260101_100000": df}, linhas_por_envio=2)
+    assert len(_leads(ws)) == 2
+
+    assert snapshots.salvar_snapshots(ws, {"20260101_100000": df}, linhas_por_envio=2) == 4
+    assert _leads(ws) == df["Lead"].tolist()
+    # Repetir o save (duplo clique) não envia nada
+    assert snapshots.salvar_snapshots(ws, {"20260101_100000": df}) == 0
+    assert _leads(ws) == df["Lead"].tolist()
+
+
+def test_desiste_depois_de_falhas_seguidas_sem_progresso():
+    ws = PlanilhaFalsa()
+    ws.falhas = [(False, ErroHttp(503))] * snapshots.TENTATIVAS
+    with pytest.raises(ErroHttp):
+        snapshots.salvar_snapshots(ws, {"20260101_100000": _snapshot("20260101_100000", 3)})
+    assert ws.envios == snapshots.TENTATIVAS
+    assert _leads(ws) == []